@@ -0,0 +1,250 @@
+import os
+import time
+import argparse
+import tempfile
+import boto3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import nlp
+from items import post_item, keyphrase_item, time_bucket, PHRASES_WRITTEN
+from language_filter import classify_title, EN
+from checkpoint import Checkpoint
+from ledger import Ledger, new_entry
+from s3_records import iter_file_records
+from bulk_fetch import BUCKET_NAME, DEFAULT_CONCURRENCY, list_archives, fetch_archives
+
+# Full-history reprocessing: re-score every archived raw post (VADER, language
+# filter, key phrases and sentiment) across a process pool and rewrite both
+# DynamoDB tables with batched writers.
+#
+# Each archive is one partition. The ledger records finished partitions and
+# the checkpoint records how many posts of a partition are already written, so
+# a crashed or interrupted run picks up where it stopped when started again
+# with the same --run name. Rewrites are idempotent puts on the table keys.
+#
+# Days the compact Lambda already moved to the cold tier (listed in
+# _state/ledger/cold_manifest.json) are left out of RedditPosts: a put would
+# bring them back into the table without an expire_at, for good. Their key
+# phrases are still rewritten. Rollups and phrase sketches are derived data,
+# so rebuild them after a backfill.
+
+# Create boto3 clients
+s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
+
+POSTS_TABLE = 'RedditPosts'
+KEYPHRASE_TABLE = 'KeyPhraseIdentificationTableV2'
+
+CHUNK_POSTS = 500  # Posts per unit of work sent to a scoring process
+CHUNKS_PER_WORKER = 2  # Scored chunks allowed to queue up ahead of the writer
+CHECKPOINT_EVERY = 10  # Write out and checkpoint after this many scored chunks
+REPORT_EVERY_SECONDS = 10
+
+# Per-process scoring state, set up once by the pool initializer
+_engine = None
+_analyzer = None
+_comprehend = None
+
+
+def init_worker(engine):
+    global _engine, _analyzer, _comprehend
+    _engine = engine
+    _analyzer = SentimentIntensityAnalyzer()
+    if engine == 'comprehend':
+        _comprehend = boto3.client('comprehend')
+
+
+def is_valid_post(post):
+    return 'title' in post and 'created_utc' in post
+
+
+def score_chunk(posts):
+    # Runs in a worker process: the process_in and send stages for a chunk.
+    # Returns (rows, seconds spent) so the parent can report throughput.
+    started = time.perf_counter()
+    posts = [post for post in posts if is_valid_post(post)]
+    for post in posts:
+        post.update(_analyzer.polarity_scores(post['title']))
+
+    languages = {post['title'].strip(): classify_title(post['title']) for post in posts}
+    titles = [title for title, language in languages.items() if language == EN]
+    key_phrases = dict(zip(titles, nlp.detect_key_phrases(titles, _engine, _comprehend)))
+
+    rows = []
+    for post in posts:
+        title = post['title'].strip()
+        phrases = key_phrases.get(title)
+        sentiment = None
+        if phrases is not None:
+            sentiment = nlp.detect_sentiment(title, post, _engine, _comprehend)
+        rows.append((post, languages[title], phrases, sentiment))
+    return rows, time.perf_counter() - started
+
+
+class StageMeter:
+    # Rows through one stage and the time spent in it. parallelism scales the
+    # rate for stages whose time is summed over several workers.
+    def __init__(self, name, parallelism=1):
+        self.name = name
+        self.parallelism = parallelism
+        self.rows = 0
+        self.seconds = 0.0
+
+    def add(self, rows, seconds):
+        self.rows += rows
+        self.seconds += seconds
+
+    def rate(self):
+        return self.rows / self.seconds * self.parallelism if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.name} {self.rows:,} rows @ {self.rate():,.0f}/s"
+
+
+def report(meters, started):
+    overall = meters[-1].rows / max(time.monotonic() - started, 1e-6)
+    print("📊 " + " | ".join(str(meter) for meter in meters) + f" | overall {overall:,.0f} rows/s")
+
+
+def read_chunks(path, start, meter):
+    # Yields (begin, posts) chunks of a downloaded archive after the first start posts
+    chunk, begin, index = [], start, 0
+    tick = time.perf_counter()
+    for index, post in enumerate(iter_file_records(path)):
+        if index < start:
+            continue
+        chunk.append(post)
+        if len(chunk) == CHUNK_POSTS:
+            meter.add(len(chunk), time.perf_counter() - tick)
+            yield begin, chunk
+            chunk, begin = [], index + 1
+            tick = time.perf_counter()
+    if chunk:
+        meter.add(len(chunk), time.perf_counter() - tick)
+        yield begin, chunk
+
+
+def write_rows(rows, cold_days=frozenset()):
+    # One batch writer pair per call: leaving the block flushes everything, so
+    # the checkpoint saved afterwards never runs ahead of DynamoDB. Returns the
+    # number of posts left out because their day is in the cold tier.
+    skipped = 0
+    with dynamodb.Table(POSTS_TABLE).batch_writer(overwrite_by_pkeys=['title', 'created_utc']) as posts_writer, \
+            dynamodb.Table(KEYPHRASE_TABLE).batch_writer(overwrite_by_pkeys=['post_id', 'created_utc']) as phrases_writer:
+        for post, language, key_phrases, sentiment in rows:
+            with_phrases = language == EN and key_phrases is not None
+            if time_bucket(post['created_utc']) in cold_days:
+                skipped += 1
+            else:
+                # If either write fails the whole chunk is redone from the checkpoint
+                item = post_item(post, language)
+                if with_phrases:
+                    item[PHRASES_WRITTEN] = True
+                posts_writer.put_item(Item=item)
+            if with_phrases:
+                phrases_writer.put_item(Item=keyphrase_item(post, key_phrases, sentiment))
+    return skipped
+
+
+def backfill_partition(key, path, pool, workers, checkpoint, meters, cold_days=frozenset()):
+    # Scores one archive in the pool and writes it in order. Returns the number
+    # of posts handled, including any a previous run already wrote.
+    read_meter, score_meter, write_meter = meters
+    start = checkpoint.offset(key)
+    if start:
+        print(f"↪️ Resuming {key} at post {start}")
+
+    in_flight = deque()  # (begin, count, future), oldest first
+    pending = []  # Scored rows not yet written
+    done = start
+    chunks = 0
+    cold_skipped = 0
+
+    def flush(until):
+        nonlocal cold_skipped
+        tick = time.perf_counter()
+        cold_skipped += write_rows(pending, cold_days)
+        write_meter.add(len(pending), time.perf_counter() - tick)
+        pending.clear()
+        checkpoint.advance(key, until)
+        checkpoint.save()
+
+    def collect():
+        nonlocal done, chunks
+        begin, count, future = in_flight.popleft()
+        rows, seconds = future.result()
+        score_meter.add(count, seconds)
+        pending.extend(rows)
+        done = begin + count
+        chunks += 1
+        if chunks % CHECKPOINT_EVERY == 0:
+            flush(done)
+
+    # Keep a bounded window of chunks in the pool; results are collected in
+    # order so the checkpoint always covers a contiguous prefix of the archive
+    for begin, chunk in read_chunks(path, start, read_meter):
+        in_flight.append((begin, len(chunk), pool.submit(score_chunk, chunk)))
+        if len(in_flight) >= workers * CHUNKS_PER_WORKER:
+            collect()
+    while in_flight:
+        collect()
+    flush(done)
+    print(f"✅ {key}: {done - start} post(s) rewritten"
+          + (f", {cold_skipped} on cold-tier days kept out of {POSTS_TABLE}" if cold_skipped else ""))
+    return done
+
+
+def run_backfill(args):
+    name = f"backfill_{args.run}"
+    ledger = Ledger(s3, BUCKET_NAME, name).load()
+    checkpoint = Checkpoint(s3, BUCKET_NAME, name).load()
+    cold_days = frozenset(Ledger(s3, BUCKET_NAME, 'cold_manifest').load().entries)
+
+    archives = [
+        (key, size) for key, size in list_archives('raw', args.since, args.until)
+        if not ledger.is_complete(key)
+    ]
+    if not archives:
+        print("Nothing to backfill: every archive in range is already done for this run.")
+        return 0
+    print(f"🚚 Backfilling {len(archives)} archive(s) with {args.workers} scoring process(es), engine={args.engine}")
+
+    meters = [StageMeter('read'), StageMeter('score', args.workers), StageMeter('write')]
+    started = time.monotonic()
+    last_report = started
+    max_bandwidth = int(args.max_mbps * 1e6) if args.max_mbps else None
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.engine,)) as pool:
+        downloads = fetch_archives(archives, workdir, max_bandwidth, args.concurrency, args.download_processes)
+        for key, path in downloads:
+            posts = backfill_partition(key, path, pool, args.workers, checkpoint, meters, cold_days)
+            ledger.update({key: new_entry(None, posts, True)})
+            checkpoint.complete(key)
+            checkpoint.save()
+
+            if time.monotonic() - last_report >= REPORT_EVERY_SECONDS:
+                report(meters, started)
+                last_report = time.monotonic()
+
+    report(meters, started)
+    print("👉 Now rebuild the derived data: python rebuild_rollups.py and python rebuild_phrase_sketches.py")
+    return len(archives)
+
+
+if __name__ == "__main__":
+    # python backfill.py --since 2025-06-01 --workers 8 --engine local
+    parser = argparse.ArgumentParser(description="Re-score archived Reddit posts and rewrite the DynamoDB tables")
+    parser.add_argument('--run', default='default', help="Run name; reuse it to resume, change it to start over")
+    parser.add_argument('--since', help="First archive period (YYYY-MM-DD or YYYY-MM-DD_HH)")
+    parser.add_argument('--until', help="Last archive period (YYYY-MM-DD or YYYY-MM-DD_HH)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Scoring processes")
+    parser.add_argument('--engine', default='local', choices=['local', 'comprehend'],
+                        help="Key phrase and sentiment engine (Comprehend bills per request)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Concurrent downloads")
+    parser.add_argument('--max-mbps', type=float, help="Download bandwidth limit in MB/s")
+    parser.add_argument('--download-processes', action='store_true', help="Download with worker processes")
+    args = parser.parse_args()
+
+    run_backfill(args)
@@ -0,0 +1,239 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import boto3
+from s3transfer.manager import TransferManager, TransferConfig
+from s3transfer.processpool import ProcessPoolDownloader, ProcessTransferConfig
+from s3transfer.subscribers import BaseSubscriber
+from ledger import Ledger
+
+# Bulk download of compacted archives for backfills. Downloads run concurrently
+# (threads through a TransferManager, or worker processes through a
+# ProcessPoolDownloader) and each archive is handed to the caller as soon as it
+# lands, so processing overlaps with the rest of the transfer.
+
+# Create a boto3 S3 client
+s3 = boto3.client('s3')
+
+# Set your bucket name
+BUCKET_NAME = "reddit-sentiment-dashboard-2025"
+
+ARCHIVE_PREFIX = 'archive/'
+
+DEFAULT_CONCURRENCY = 10
+REPORT_EVERY_SECONDS = 5
+
+# Downloaded-but-unconsumed archives allowed per download slot, so a slow
+# consumer doesn't let the whole history pile up on disk
+LOOKAHEAD_PER_SLOT = 2
+
+
+class TransferProgress:
+    # Bytes and files landed so far, reported as throughput every few seconds
+
+    def __init__(self, total_files, total_bytes):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._reported = self.started
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def file_done(self):
+        with self._lock:
+            self.files += 1
+        self.report()
+
+    def rate(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return self.bytes / elapsed
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._reported < REPORT_EVERY_SECONDS:
+            return
+        self._reported = now
+        print(f"⬇️ {self.files}/{self.total_files} archives, "
+              f"{self.bytes / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB, {self.rate() / 1e6:.2f} MB/s")
+
+
+class _Landed(BaseSubscriber):
+    # Hands a finished download to the consumer queue
+    def __init__(self, key, path, progress, landed):
+        self.key = key
+        self.path = path
+        self.progress = progress
+        self.landed = landed
+
+    def on_progress(self, future, bytes_transferred, **kwargs):
+        self.progress.add_bytes(bytes_transferred)
+
+    def on_done(self, future, **kwargs):
+        try:
+            future.result()
+            self.landed.put((self.key, self.path, None))
+        except Exception as e:
+            self.landed.put((self.key, self.path, e))
+
+
+class _ThreadTransfer:
+    # TransferManager enforces max_bandwidth itself with a shared leaky bucket
+    def __init__(self, concurrency, max_bandwidth, progress, landed):
+        config = TransferConfig(max_request_concurrency=concurrency, max_bandwidth=max_bandwidth)
+        self.manager = TransferManager(s3, config)
+        self.progress = progress
+        self.landed = landed
+
+    def submit(self, bucket, key, path, size):
+        self.manager.download(bucket, key, path, subscribers=[_Landed(key, path, self.progress, self.landed)])
+
+    def close(self):
+        self.manager.shutdown()
+
+
+class _ProcessTransfer:
+    # ProcessPoolDownloader has no bandwidth limiter and no subscribers, so
+    # submissions are paced against the limit and a watcher thread polls the
+    # futures to hand off whatever has finished
+    def __init__(self, concurrency, max_bandwidth, progress, landed):
+        self.downloader = ProcessPoolDownloader(
+            client_kwargs={'region_name': s3.meta.region_name},
+            config=ProcessTransferConfig(max_request_processes=concurrency)
+        )
+        self.max_bandwidth = max_bandwidth
+        self.progress = progress
+        self.landed = landed
+        self.submitted_bytes = 0
+        self.started = time.monotonic()
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def submit(self, bucket, key, path, size):
+        if self.max_bandwidth:
+            # Hold back until the bytes already submitted fit under the limit
+            allowed_at = self.started + self.submitted_bytes / self.max_bandwidth
+            delay = allowed_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.submitted_bytes += size
+        future = self.downloader.download_file(bucket, key, path, expected_size=size)
+        with self._lock:
+            self.pending[future] = (key, path, size)
+
+    def _watch(self):
+        while not self._closed.is_set() or self.pending:
+            with self._lock:
+                finished = [future for future in self.pending if future.done()]
+                entries = [self.pending.pop(future) for future in finished]
+            for future, (key, path, size) in zip(finished, entries):
+                try:
+                    future.result()
+                    self.progress.add_bytes(size)
+                    self.landed.put((key, path, None))
+                except Exception as e:
+                    self.landed.put((key, path, e))
+            time.sleep(0.05)
+
+    def close(self):
+        self._closed.set()
+        self._watcher.join()
+        self.downloader.shutdown()
+
+
+def list_archives(kind='raw', since=None, until=None, bucket=BUCKET_NAME):
+    # Archive keys from the compaction manifest, with their sizes, oldest first.
+    # since/until compare against the archive period (YYYY-MM-DD[_HH]).
+    manifest = Ledger(s3, bucket, 'archive_manifest').load()
+    wanted = {
+        key for key, entry in manifest.entries.items()
+        if entry.get('kind') == kind
+        and (since is None or entry['period'] >= since)
+        and (until is None or entry['period'][:len(until)] <= until)
+    }
+
+    sizes = {}
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{ARCHIVE_PREFIX}{kind}/"):
+        for obj in page.get('Contents', []):
+            if obj['Key'] in wanted:
+                sizes[obj['Key']] = obj['Size']
+
+    missing = wanted - set(sizes)
+    if missing:
+        print(f"⚠️ {len(missing)} archive(s) in the manifest are missing from S3, skipping them")
+    return [(key, sizes[key]) for key in sorted(sizes)]
+
+
+def fetch_archives(archives, dest_dir, max_bandwidth=None, concurrency=DEFAULT_CONCURRENCY,
+                   processes=False, keep=False, bucket=BUCKET_NAME):
+    # Yields (key, local_path) for each archive as its download completes.
+    # archives is a list of (key, size); max_bandwidth is in bytes per second.
+    # Unless keep is set, each file is removed once the consumer moves on.
+    progress = TransferProgress(len(archives), sum(size for _, size in archives))
+    landed = queue.Queue()
+    backend = (_ProcessTransfer if processes else _ThreadTransfer)(concurrency, max_bandwidth, progress, landed)
+    window = concurrency * LOOKAHEAD_PER_SLOT
+
+    remaining = list(archives)
+    outstanding = 0
+    failed = []
+    try:
+        while remaining or outstanding:
+            while remaining and outstanding < window:
+                key, size = remaining.pop(0)
+                path = os.path.join(dest_dir, key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                backend.submit(bucket, key, path, size)
+                outstanding += 1
+
+            key, path, error = landed.get()
+            outstanding -= 1
+            if error is not None:
+                print(f"❌ Failed to download {key}: {str(error)}")
+                failed.append(key)
+                continue
+
+            progress.file_done()
+            yield key, path
+            if not keep and os.path.exists(path):
+                os.remove(path)
+    finally:
+        backend.close()
+        progress.report(force=True)
+
+    if failed:
+        print(f"⚠️ {len(failed)} archive(s) failed to download: {', '.join(failed[:5])}")
+
+
+if __name__ == "__main__":
+    # Download a range of archives to local disk:
+    # python bulk_fetch.py --kind raw --since 2025-06-01 --dest ./archives --max-mbps 50
+    parser = argparse.ArgumentParser(description="Bulk download compacted archives")
+    parser.add_argument('--kind', default='raw', choices=['raw', 'processed', 'scores'],
+                        help="Archive kind; 'scores' holds the score-only sidecars (archive/scores/)")
+    parser.add_argument('--since', help="First period to fetch (YYYY-MM-DD or YYYY-MM-DD_HH)")
+    parser.add_argument('--until', help="Last period to fetch (YYYY-MM-DD or YYYY-MM-DD_HH)")
+    parser.add_argument('--dest', default='archives')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--max-mbps', type=float, help="Bandwidth limit in MB/s")
+    parser.add_argument('--processes', action='store_true', help="Download with worker processes instead of threads")
+    args = parser.parse_args()
+
+    archives = list_archives(args.kind, args.since, args.until)
+    if not archives:
+        print("No archives found for that range.")
+        sys.exit(0)
+
+    max_bandwidth = int(args.max_mbps * 1e6) if args.max_mbps else None
+    for key, path in fetch_archives(archives, args.dest, max_bandwidth, args.concurrency, args.processes, keep=True):
+        print(f"✅ {key} → {path}")
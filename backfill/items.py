@@ -0,0 +1,96 @@
+import time
+import hashlib
+from decimal import Decimal
+from datetime import datetime, timezone
+
+# DynamoDB items for one scored post, shared by the send Lambda and the
+# backfill runner so both write exactly the same shape.
+
+
+# Attributes that can change between snapshots of the same post; a write only
+# happens when their fingerprint differs from the stored one
+MUTABLE_FIELDS = ('score', 'num_comments', 'pos', 'neu', 'neg', 'compound')
+
+KEY_FIELDS = ('title', 'created_utc')
+
+# Set on a RedditPosts item once its key phrases are in the key phrase table
+PHRASES_WRITTEN = 'phrases_written'
+
+# Time bucket written on every post; (day, created_utc) is the time range index
+TIME_BUCKET_FORMAT = '%Y-%m-%d'
+TIME_INDEX = 'day-created_utc-index'
+
+
+def time_bucket(created_utc):
+    # UTC day the post was created
+    return datetime.fromtimestamp(float(created_utc), tz=timezone.utc).strftime(TIME_BUCKET_FORMAT)
+
+
+def fingerprint(post, language):
+    values = [str(post.get(field)) for field in MUTABLE_FIELDS] + [language]
+    return hashlib.blake2b('|'.join(values).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def post_item(post, language):
+    # RedditPosts: title (partition key) + created_utc (sort key)
+    return {
+        'title': post['title'],  # Partition Key
+        'created_utc': Decimal(str(post['created_utc'])),  # Sort Key
+        'score': Decimal(str(post['score'])),
+        'num_comments': Decimal(str(post['num_comments'])),
+        'subreddit': post['subreddit'],
+        'url': post['url'],
+        'day': time_bucket(post['created_utc']),
+        'positive_sentiment': Decimal(str(post.get('pos', 0.0))),
+        'neutral_sentiment': Decimal(str(post.get('neu', 0.0))),
+        'negative_sentiment': Decimal(str(post.get('neg', 0.0))),
+        'compound_sentiment': Decimal(str(post.get('compound', 0.0))),
+        'language_filter': language,
+        'fingerprint': fingerprint(post, language),
+        'updated_at': int(time.time()),
+    }
+
+
+def update_args(item, stored):
+    # UpdateItem arguments that write item only if the stored copy is still
+    # the one read (stored: the item as read, {} for a new post). Only fields
+    # of item are set, so phrases_written survives.
+    names, values, assignments = {'#fp': 'fingerprint'}, {}, []
+    for index, (name, value) in enumerate(field for field in item.items() if field[0] not in KEY_FIELDS):
+        names[f"#a{index}"] = name
+        values[f":v{index}"] = value
+        assignments.append(f"#a{index} = :v{index}")
+    if 'fingerprint' in stored:
+        condition = '#fp = :old_fp'
+        values[':old_fp'] = stored['fingerprint']
+    else:
+        condition = 'attribute_not_exists(#fp)'
+    return {
+        'Key': {name: item[name] for name in KEY_FIELDS},
+        'UpdateExpression': 'SET ' + ', '.join(assignments),
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+    }
+
+
+def phrases_written_args(item):
+    # Marks the post's key phrases as stored; set only after the put succeeds
+    return {
+        'Key': {name: item[name] for name in KEY_FIELDS},
+        'UpdateExpression': 'SET #written = :true',
+        'ExpressionAttributeNames': {'#written': PHRASES_WRITTEN},
+        'ExpressionAttributeValues': {':true': True},
+    }
+
+
+def keyphrase_item(post, key_phrases, sentiment):
+    # KeyPhraseIdentificationTableV2: one item per English post
+    title = post['title'].strip()
+    return {
+        'post_id': title,
+        'created_utc': int(post['created_utc']),
+        'title': title,
+        'key_phrases': key_phrases,
+        'sentiment': sentiment
+    }
@@ -0,0 +1,110 @@
+import re
+
+# Local key phrase extraction (RAKE-style) so the send Lambda can tag titles
+# without a round trip to Comprehend. Output matches Comprehend's shape: a list
+# of phrase strings per title, in order of appearance.
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are aren't as at be because
+been before being below between both but by can can't cannot could couldn't did
+didn't do does doesn't doing don't down during each few for from further had
+hadn't has hasn't have haven't having he he'd he'll he's her here here's hers
+herself him himself his how how's i i'd i'll i'm i've if in into is isn't it it's
+its itself just let's me more most mustn't my myself no nor not now of off on once
+only or other ought our ours ourselves out over own same shan't she she'd she'll
+she's should shouldn't so some such than that that's the their theirs them
+themselves then there there's these they they'd they'll they're they've this
+those through to too under until up very was wasn't we we'd we'll we're we've
+were weren't what what's when when's where where's which while who who's whom why
+why's will with won't would wouldn't you you'd you'll you're you've your yours
+yourself yourselves also get gets got just like new one ones says said still
+thing things via vs want wants way yet
+""".split())
+
+# Anything that is not part of a word ends the current candidate phrase
+TOKEN_RE = re.compile(r"[\w][\w'’\-\.&]*|[^\w\s]", re.UNICODE)
+
+MAX_PHRASE_WORDS = 4
+MAX_PHRASES = 6
+
+
+def _tokenize(title):
+    tokens = []
+    for token in TOKEN_RE.findall(title):
+        # Trailing dots belong to the sentence, not the word ("U.S." keeps its own)
+        if len(token) > 1 and token.endswith('.') and token.count('.') == 1:
+            tokens.append(token[:-1])
+            tokens.append('.')
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _is_word(token):
+    return token[0].isalnum() or token[0] == '_'
+
+
+def _is_number(token):
+    return token.replace(',', '').replace('.', '').isdigit()
+
+
+def _is_useful(phrase):
+    # Drop short lowercase fragments ("cm") but keep acronyms ("AI")
+    if len(phrase) > 1:
+        return True
+    word = phrase[0]
+    return len(word) > 2 or word.isupper()
+
+
+def _candidate_phrases(title):
+    # Split the title on stopwords, numbers and punctuation into runs of content words
+    phrases = []
+    current = []
+    for token in _tokenize(title):
+        normalized = token.lower().replace('’', "'")
+        if not _is_word(token) or normalized in STOPWORDS or _is_number(token):
+            if current:
+                phrases.append(current)
+            current = []
+            continue
+        current.append(token)
+        if len(current) == MAX_PHRASE_WORDS:
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+
+    return [p for p in phrases if _is_useful(p)]
+
+
+def extract_key_phrases(title, max_phrases=MAX_PHRASES):
+    candidates = _candidate_phrases(title)
+    if not candidates:
+        return []
+
+    # RAKE word scores: degree / frequency, computed over this title's candidates
+    freq = {}
+    degree = {}
+    for phrase in candidates:
+        for word in phrase:
+            key = word.lower()
+            freq[key] = freq.get(key, 0) + 1
+            degree[key] = degree.get(key, 0) + len(phrase)
+
+    scored = []
+    seen = set()
+    for position, phrase in enumerate(candidates):
+        text = ' '.join(phrase)
+        if text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        score = sum(degree[w.lower()] / freq[w.lower()] for w in phrase)
+        scored.append((score, position, text))
+
+    # Keep the best phrases, then return them in title order like Comprehend does
+    best = sorted(scored, key=lambda s: (-s[0], s[1]))[:max_phrases]
+    return [text for _, _, text in sorted(best, key=lambda s: s[1])]
+
+
+def extract_key_phrases_batch(titles, max_phrases=MAX_PHRASES):
+    return [extract_key_phrases(title, max_phrases) for title in titles]
@@ -0,0 +1,87 @@
+import os
+import argparse
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from items import PHRASES_WRITTEN
+from language_filter import EN
+
+# One-off migration for the phrases_written flag: the send stage now only
+# skips the key phrase step for posts that carry it, so posts written before
+# the flag existed would have their key phrases extracted, stored and counted
+# in the sketches a second time. This sets the flag on every English post
+# whose key phrase item already exists. Only unflagged posts are touched, so
+# an interrupted run can simply be started again.
+
+POSTS_TABLE = 'RedditPosts'
+KEYPHRASE_TABLE = 'KeyPhraseIdentificationTableV2'
+BATCH_GET_SIZE = 100
+
+
+def phrase_keys(resource, items):
+    # (post_id, created_utc) of the key phrase items that exist for these posts
+    keys = {(item['title'].strip(), int(item['created_utc'])) for item in items if item['title'].strip()}
+    pending = [{'post_id': post_id, 'created_utc': created_utc} for post_id, created_utc in keys]
+    found = set()
+    for start in range(0, len(pending), BATCH_GET_SIZE):
+        request = {KEYPHRASE_TABLE: {
+            'Keys': pending[start:start + BATCH_GET_SIZE],
+            'ProjectionExpression': 'post_id, created_utc',
+        }}
+        while request:
+            response = resource.batch_get_item(RequestItems=request)
+            found.update((item['post_id'], int(item['created_utc'])) for item in response['Responses'].get(KEYPHRASE_TABLE, []))
+            request = response.get('UnprocessedKeys') or {}
+    return found
+
+
+def migrate_segment(segment, total_segments):
+    resource = boto3.session.Session().resource('dynamodb')
+    table = resource.Table(POSTS_TABLE)
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': Attr(PHRASES_WRITTEN).not_exists() & Attr('language_filter').eq(EN),
+        'ProjectionExpression': '#title, #created',
+        'ExpressionAttributeNames': {'#title': 'title', '#created': 'created_utc'},
+    }
+    updated = 0
+    while True:
+        response = table.scan(**kwargs)
+        items = response.get('Items', [])
+        found = phrase_keys(resource, items)
+        for item in items:
+            if (item['title'].strip(), int(item['created_utc'])) not in found:
+                continue
+            try:
+                table.update_item(
+                    Key={'title': item['title'], 'created_utc': item['created_utc']},
+                    UpdateExpression='SET #written = :true',
+                    # Never recreate an item deleted since the scan read it
+                    ConditionExpression='attribute_exists(#title)',
+                    ExpressionAttributeNames={'#written': PHRASES_WRITTEN, '#title': 'title'},
+                    ExpressionAttributeValues={':true': True},
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in response:
+            return updated
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def migrate(segments):
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        counts = list(pool.map(lambda segment: migrate_segment(segment, segments), range(segments)))
+    print(f"✅ Flagged {sum(counts):,} post(s) whose key phrases are already stored")
+    return sum(counts)
+
+
+if __name__ == "__main__":
+    # python migrate_phrases_written.py --segments 16   (before deploying the send stage)
+    parser = argparse.ArgumentParser(description="Set phrases_written on RedditPosts items that already have key phrases")
+    parser.add_argument('--segments', type=int, default=(os.cpu_count() or 2) * 4, help="Parallel scan segments")
+    args = parser.parse_args()
+    migrate(args.segments)
@@ -0,0 +1,113 @@
+import os
+import time
+import argparse
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from items import TIME_INDEX, time_bucket
+
+# One-off migration for the time range index: creates the (day, created_utc)
+# GSI on RedditPosts if it is missing and fills in the "day" bucket on items
+# written before the send stage started setting it. Only items without a day
+# are touched, so an interrupted run can simply be started again.
+
+POSTS_TABLE = 'RedditPosts'
+INDEX_THROUGHPUT = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+POLL_SECONDS = 15
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def ensure_index(table_name, wait=True):
+    client = dynamodb.meta.client
+    description = client.describe_table(TableName=table_name)['Table']
+    indexes = {index['IndexName']: index for index in description.get('GlobalSecondaryIndexes', [])}
+
+    if TIME_INDEX not in indexes:
+        index = {
+            'IndexName': TIME_INDEX,
+            'KeySchema': [
+                {'AttributeName': 'day', 'KeyType': 'HASH'},
+                {'AttributeName': 'created_utc', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }
+        billing = description.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+        if billing != 'PAY_PER_REQUEST':
+            index['ProvisionedThroughput'] = INDEX_THROUGHPUT
+        print(f"🛠️ Creating index {TIME_INDEX} on {table_name}")
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {'AttributeName': 'day', 'AttributeType': 'S'},
+                {'AttributeName': 'created_utc', 'AttributeType': 'N'},
+            ],
+            GlobalSecondaryIndexUpdates=[{'Create': index}],
+        )
+
+    # New items already carry a day, so the backfill can run while the index builds
+    while wait:
+        description = client.describe_table(TableName=table_name)['Table']
+        status = next(
+            (index.get('IndexStatus') for index in description.get('GlobalSecondaryIndexes', [])
+             if index['IndexName'] == TIME_INDEX),
+            None
+        )
+        if status in (None, 'ACTIVE'):
+            break
+        print(f"⏳ {TIME_INDEX} is {status}, waiting")
+        time.sleep(POLL_SECONDS)
+
+
+def migrate_segment(table_name, segment, total_segments):
+    # Sets day on every item in one scan segment that does not have it yet
+    table = boto3.session.Session().resource('dynamodb').Table(table_name)
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': Attr('day').not_exists(),
+        'ProjectionExpression': '#title, #created',
+        'ExpressionAttributeNames': {'#title': 'title', '#created': 'created_utc'},
+    }
+    updated = 0
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get('Items', []):
+            try:
+                table.update_item(
+                    Key={'title': item['title'], 'created_utc': item['created_utc']},
+                    UpdateExpression='SET #day = :day',
+                    # Never recreate an item deleted since the scan read it
+                    ConditionExpression='attribute_exists(#title)',
+                    ExpressionAttributeNames={'#day': 'day', '#title': 'title'},
+                    ExpressionAttributeValues={':day': time_bucket(item['created_utc'])},
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in response:
+            return updated
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def migrate(table_name, segments):
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        counts = list(pool.map(lambda segment: migrate_segment(table_name, segment, segments), range(segments)))
+    print(f"✅ Set the day bucket on {sum(counts):,} item(s) in {table_name}")
+    return sum(counts)
+
+
+if __name__ == "__main__":
+    # python migrate_time_bucket.py --segments 16
+    parser = argparse.ArgumentParser(description="Add the day bucket and time range index to RedditPosts")
+    parser.add_argument('--table', default=POSTS_TABLE)
+    parser.add_argument('--segments', type=int, default=(os.cpu_count() or 2) * 4, help="Parallel scan segments")
+    parser.add_argument('--no-wait', action='store_true', help="Don't wait for the index to become active")
+    parser.add_argument('--skip-index', action='store_true', help="Only backfill the day attribute")
+    args = parser.parse_args()
+
+    if not args.skip_index:
+        ensure_index(args.table, wait=not args.no_wait)
+    migrate(args.table, args.segments)
@@ -0,0 +1,53 @@
+import os
+import argparse
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from phrase_sketch import DailyPhraseCounts
+from bulk_fetch import BUCKET_NAME, s3
+
+# Rebuilds the per-day key phrase sketches in _state/sketches/phrases/ from
+# KeyPhraseIdentificationTableV2. Run it once to seed them, and again after a
+# backfill, which rewrites key phrases without counting them. Each day found
+# in the table is overwritten with exact counts.
+
+KEYPHRASE_TABLE = 'KeyPhraseIdentificationTableV2'
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def scan_segment(table_name, segment, total_segments, counts):
+    table = boto3.session.Session().resource('dynamodb').Table(table_name)
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'ProjectionExpression': '#created, #phrases',
+        'ExpressionAttributeNames': {'#created': 'created_utc', '#phrases': 'key_phrases'},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get('Items', []):
+            if isinstance(item.get('key_phrases'), list):
+                counts.add_post(item['created_utc'], item['key_phrases'])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rebuild(table_name, segments):
+    counts = DailyPhraseCounts()
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        list(pool.map(lambda segment: scan_segment(table_name, segment, segments, counts), range(segments)))
+    posts = sum(counts.posts.values())
+    days = counts.save(s3, BUCKET_NAME, replace=True)
+    print(f"✅ Rebuilt key phrase sketches for {days} day(s) from {posts:,} post(s)")
+    return days
+
+
+if __name__ == "__main__":
+    # python rebuild_phrase_sketches.py --segments 16
+    parser = argparse.ArgumentParser(description="Rebuild the per-day key phrase sketches from DynamoDB")
+    parser.add_argument('--table', default=KEYPHRASE_TABLE)
+    parser.add_argument('--segments', type=int, default=(os.cpu_count() or 2) * 4, help="Parallel scan segments")
+    args = parser.parse_args()
+
+    rebuild(args.table, args.segments)
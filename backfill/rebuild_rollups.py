@@ -0,0 +1,137 @@
+import os
+import argparse
+import boto3
+from decimal import Decimal
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from rollups import ROLLUP_INDEX, DAY_FORMAT, SUMMED_FIELDS, LEADER_FIELDS, hour_bucket
+
+# Builds SubredditHourlyRollups from the posts already in RedditPosts: creates
+# the table (with its day-hour index) if needed, scans every post and writes
+# each (subreddit, hour) row with absolute totals. Run it once before turning
+# on the dashboards' rollup pages, and again after a backfill, which rewrites
+# posts without touching the rollups. Rows are overwritten, so increments the
+# send stage makes while this runs can be lost; pause it for an exact rebuild.
+
+POSTS_TABLE = 'RedditPosts'
+ROLLUP_TABLE = 'SubredditHourlyRollups'
+POST_ATTRIBUTES = ('title', 'created_utc', 'subreddit', 'url') + tuple(SUMMED_FIELDS)
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def ensure_table(table_name):
+    client = dynamodb.meta.client
+    if table_name in client.list_tables()['TableNames']:
+        return
+    print(f"🛠️ Creating {table_name}")
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'subreddit', 'KeyType': 'HASH'},
+            {'AttributeName': 'hour', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'subreddit', 'AttributeType': 'S'},
+            {'AttributeName': 'hour', 'AttributeType': 'N'},
+            {'AttributeName': 'day', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': ROLLUP_INDEX,
+            'KeySchema': [
+                {'AttributeName': 'day', 'KeyType': 'HASH'},
+                {'AttributeName': 'hour', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    client.get_waiter('table_exists').wait(TableName=table_name)
+
+
+def scan_segment(table_name, segment, total_segments):
+    # Partial rollups for one scan segment: (subreddit, hour) -> row
+    table = boto3.session.Session().resource('dynamodb').Table(table_name)
+    names = {f"#p{i}": name for i, name in enumerate(POST_ATTRIBUTES)}
+    kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+    rows = {}
+    while True:
+        response = table.scan(**kwargs)
+        for post in response.get('Items', []):
+            if 'subreddit' not in post:
+                continue
+            add_post(rows, post)
+        if 'LastEvaluatedKey' not in response:
+            return rows
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def new_row(subreddit, hour):
+    row = {
+        'subreddit': subreddit,
+        'hour': hour,
+        'day': datetime.fromtimestamp(hour, tz=timezone.utc).strftime(DAY_FORMAT),
+        'posts': 0,
+    }
+    row.update({counter: Decimal(0) for counter in SUMMED_FIELDS.values()})
+    return row
+
+
+def set_leader(row, post, field, name):
+    if f"top_{name}" not in row or post[field] > row[f"top_{name}"]:
+        row[f"top_{name}"] = post[field]
+        row[f"top_{name}_post"] = {key: post.get(key, '') for key in LEADER_FIELDS}
+
+
+def add_post(rows, post):
+    hour = hour_bucket(post['created_utc'])
+    row = rows.setdefault((post['subreddit'], hour), new_row(post['subreddit'], hour))
+    row['posts'] += 1
+    for field, counter in SUMMED_FIELDS.items():
+        row[counter] += Decimal(str(post.get(field, 0)))
+    set_leader(row, post, 'score', 'score')
+    set_leader(row, post, 'num_comments', 'comments')
+
+
+def merge(rows, part):
+    for key, row in part.items():
+        if key not in rows:
+            rows[key] = row
+            continue
+        total = rows[key]
+        total['posts'] += row['posts']
+        for counter in SUMMED_FIELDS.values():
+            total[counter] += row[counter]
+        for name in ('score', 'comments'):
+            if row[f"top_{name}"] > total[f"top_{name}"]:
+                total[f"top_{name}"], total[f"top_{name}_post"] = row[f"top_{name}"], row[f"top_{name}_post"]
+
+
+def rebuild(posts_table, rollup_table, segments):
+    ensure_table(rollup_table)
+    rows = {}
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        for part in pool.map(lambda segment: scan_segment(posts_table, segment, segments), range(segments)):
+            merge(rows, part)
+
+    with dynamodb.Table(rollup_table).batch_writer() as writer:
+        for row in rows.values():
+            writer.put_item(Item=row)
+    print(f"✅ Wrote {len(rows):,} hourly rollup row(s) for {sum(row['posts'] for row in rows.values()):,} post(s)")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # python rebuild_rollups.py --segments 16
+    parser = argparse.ArgumentParser(description="Rebuild the hourly subreddit rollups from RedditPosts")
+    parser.add_argument('--posts-table', default=POSTS_TABLE)
+    parser.add_argument('--rollup-table', default=ROLLUP_TABLE)
+    parser.add_argument('--segments', type=int, default=(os.cpu_count() or 2) * 4, help="Parallel scan segments")
+    args = parser.parse_args()
+
+    rebuild(args.posts_table, args.rollup_table, args.segments)
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+import boto3
+
+# Deadline tracking, per-post checkpoints and self-continuation shared by the
+# processing Lambdas. Checkpoints live in S3 under _state/ so the next
+# invocation (scheduled or self-triggered) resumes where this one stopped.
+
+STATE_PREFIX = '_state/'
+
+# Stop starting new work once less than this much of the invocation is left
+STOP_MARGIN_MS = int(os.environ.get('STOP_MARGIN_MS', '15000'))
+
+# How many times a handler may re-invoke itself in a row before waiting for the schedule
+MAX_CONTINUATIONS = int(os.environ.get('MAX_CONTINUATIONS', '5'))
+
+lambda_client = boto3.client('lambda')
+
+
+class Deadline:
+    # budget_ms optionally caps the time further, e.g. for a worker whose
+    # coordinator has to collect its result before its own timeout
+    def __init__(self, context, margin_ms=STOP_MARGIN_MS, budget_ms=None):
+        self.context = context
+        self.margin_ms = margin_ms
+        self.budget_ends = time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+    def remaining_ms(self):
+        remaining = float('inf')  # Local runs have no deadline
+        if self.context is not None:
+            remaining = self.context.get_remaining_time_in_millis()
+        if self.budget_ends is not None:
+            remaining = min(remaining, (self.budget_ends - time.monotonic()) * 1000)
+        return remaining
+
+    def expired(self, margin_ms=None):
+        return self.remaining_ms() < (self.margin_ms if margin_ms is None else margin_ms)
+
+
+class Checkpoint:
+    # Number of posts already handled per input file, for one handler
+
+    def __init__(self, s3, bucket, name):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = f"{STATE_PREFIX}checkpoints/{name}.json"
+        self.offsets = {}
+        self.changes = {}  # file -> new offset, or None once the file is complete
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+            self.offsets = json.loads(obj['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            self.offsets = {}
+        return self
+
+    def offset(self, file_key):
+        with self._lock:
+            return self.offsets.get(file_key, 0)
+
+    def advance(self, file_key, posts_done):
+        with self._lock:
+            self.offsets[file_key] = posts_done
+            self.changes[file_key] = posts_done
+            self.dirty = True
+
+    def complete(self, file_key):
+        with self._lock:
+            self.changes[file_key] = None
+            if self.offsets.pop(file_key, None) is not None:
+                self.dirty = True
+
+    def apply(self, changes):
+        # Merge changes recorded by another invocation (e.g. a shard worker)
+        for file_key, posts_done in changes.items():
+            if posts_done is None:
+                self.complete(file_key)
+            else:
+                self.advance(file_key, posts_done)
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=json.dumps(self.offsets))
+            self.dirty = False
+
+
+def is_state_key(key):
+    return key.startswith(STATE_PREFIX)
+
+
+def continue_in_background(event, context):
+    # Re-invoke this function asynchronously to pick up from the checkpoint
+    depth = (event or {}).get('continuation', 0)
+    if context is None or depth >= MAX_CONTINUATIONS:
+        print(f"Not re-invoking (continuation {depth}); the next scheduled run will resume")
+        return False
+
+    payload = dict(event or {}, continuation=depth + 1)
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps(payload).encode('utf-8')
+    )
+    print(f"🔁 Re-invoked {context.function_name} (continuation {depth + 1})")
+    return True
@@ -0,0 +1,222 @@
+import io
+import json
+import mmap
+import struct
+import numpy as np
+
+# Compact columnar file for archived posts, so readers can fetch only the
+# columns and time ranges they need (S3 byte-range GETs or a local mmap).
+#
+# Layout:
+#   MAGIC
+#   chunk 0: column buffers, one after another
+#   chunk 1: ...
+#   footer (UTF-8 JSON): schema, string dictionaries, and per chunk the row
+#                        count, min/max created_utc and each column's byte range
+#   footer length (uint32, little endian)
+#   MAGIC
+#
+# Column types:
+#   float64 / int64 - raw little-endian NumPy buffer
+#   dict            - int32 codes into a file-level string dictionary
+#   dict_list       - int32 offsets (rows + 1) then int32 codes (e.g. key phrases)
+#   str             - int32 offsets (rows + 1) then the UTF-8 bytes
+
+MAGIC = b'RCOL'
+VERSION = 1
+CHUNK_ROWS = 8192
+TAIL_READ = 64 * 1024  # One suffix GET usually covers the whole footer
+COALESCE_GAP = 256 * 1024  # Merge range reads separated by less than this
+
+POST_SCHEMA = {
+    'created_utc': 'float64',
+    'score': 'int64',
+    'num_comments': 'int64',
+    'subreddit': 'dict',
+    'pos': 'float64',
+    'neu': 'float64',
+    'neg': 'float64',
+    'compound': 'float64',
+    'title': 'str',
+    'url': 'str',
+}
+
+_DEFAULTS = {'float64': 0.0, 'int64': 0, 'dict': '', 'str': ''}
+
+
+def _encode_offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype='<i4')
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _encode_column(values, kind, dictionary):
+    if kind in ('float64', 'int64'):
+        return np.asarray(values, dtype='<f8' if kind == 'float64' else '<i8').tobytes()
+    if kind == 'dict':
+        return np.array([dictionary.setdefault(v, len(dictionary)) for v in values], dtype='<i4').tobytes()
+    if kind == 'dict_list':
+        codes = [dictionary.setdefault(v, len(dictionary)) for row in values for v in row]
+        return _encode_offsets([len(row) for row in values]).tobytes() + np.array(codes, dtype='<i4').tobytes()
+    if kind == 'str':
+        encoded = [v.encode('utf-8') for v in values]
+        return _encode_offsets([len(v) for v in encoded]).tobytes() + b''.join(encoded)
+    raise ValueError(f"Unknown column type: {kind}")
+
+
+def _decode_column(data, kind, rows, dictionary):
+    if kind in ('float64', 'int64'):
+        return np.frombuffer(data, dtype='<f8' if kind == 'float64' else '<i8', count=rows)
+    if kind == 'dict':
+        return np.asarray(dictionary, dtype=object)[np.frombuffer(data, dtype='<i4', count=rows)]
+    offsets = np.frombuffer(data, dtype='<i4', count=rows + 1)
+    payload = data[(rows + 1) * 4:]
+    if kind == 'dict_list':
+        codes = np.frombuffer(payload, dtype='<i4')
+        words = np.asarray(dictionary, dtype=object)
+        return [list(words[codes[offsets[i]:offsets[i + 1]]]) for i in range(rows)]
+    if kind == 'str':
+        payload = bytes(payload)
+        return np.array([payload[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)], dtype=object)
+    raise ValueError(f"Unknown column type: {kind}")
+
+
+def write_columnar(records, schema=POST_SCHEMA, chunk_rows=CHUNK_ROWS):
+    # Rows are sorted by created_utc so each chunk covers a narrow time range
+    records = sorted(records, key=lambda r: float(r.get('created_utc', 0)))
+    dictionaries = {name: {} for name, kind in schema.items() if kind in ('dict', 'dict_list')}
+
+    out = io.BytesIO()
+    out.write(MAGIC)
+    chunks = []
+    for start in range(0, len(records), chunk_rows):
+        rows = records[start:start + chunk_rows]
+        created = [float(r.get('created_utc', 0)) for r in rows]
+        chunk = {'rows': len(rows), 'min_created_utc': min(created), 'max_created_utc': max(created), 'columns': {}}
+        for name, kind in schema.items():
+            default = [] if kind == 'dict_list' else _DEFAULTS[kind]
+            values = [r.get(name) if r.get(name) is not None else default for r in rows]
+            data = _encode_column(values, kind, dictionaries.get(name))
+            chunk['columns'][name] = [out.tell(), len(data)]
+            out.write(data)
+        chunks.append(chunk)
+
+    footer = json.dumps({
+        'version': VERSION,
+        'rows': len(records),
+        'schema': schema,
+        'dictionaries': {name: list(d) for name, d in dictionaries.items()},
+        'chunks': chunks,
+    }, separators=(',', ':')).encode('utf-8')
+    out.write(footer)
+    out.write(struct.pack('<I', len(footer)))
+    out.write(MAGIC)
+    return out.getvalue()
+
+
+class ColumnarArchive:
+    # read_range(offset, length) -> bytes; size is the file size in bytes
+
+    def __init__(self, read_range, size, tail=None):
+        self.read_range = read_range
+        self.size = size
+        self.footer = self._read_footer(tail)
+
+    @classmethod
+    def open_local(cls, path):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        return cls(lambda offset, length: view[offset:offset + length], len(mapped))
+
+    @classmethod
+    def open_s3(cls, s3, bucket, key):
+        # A suffix range GET returns the tail and, via ContentRange, the file size
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{TAIL_READ}")
+        tail = response['Body'].read()
+        size = int(response.get('ContentRange', f"/{len(tail)}").rsplit('/', 1)[1])
+
+        def read_range(offset, length):
+            part = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+            return part['Body'].read()
+
+        return cls(read_range, size, tail)
+
+    def _read_footer(self, tail):
+        if tail is None:
+            tail = bytes(self.read_range(max(self.size - TAIL_READ, 0), min(TAIL_READ, self.size)))
+        if tail[-4:] != MAGIC:
+            raise ValueError("Not a columnar archive")
+        footer_length = struct.unpack('<I', tail[-8:-4])[0]
+        if footer_length + 8 <= len(tail):
+            footer = tail[-8 - footer_length:-8]
+        else:
+            footer = bytes(self.read_range(self.size - 8 - footer_length, footer_length))
+        return json.loads(bytes(footer))
+
+    @property
+    def columns(self):
+        return list(self.footer['schema'])
+
+    def chunks_for(self, start_utc=None, end_utc=None):
+        # Footer index lookup: skip chunks entirely outside [start_utc, end_utc]
+        return [
+            chunk for chunk in self.footer['chunks']
+            if (start_utc is None or chunk['max_created_utc'] >= start_utc)
+            and (end_utc is None or chunk['min_created_utc'] <= end_utc)
+        ]
+
+    def _fetch(self, ranges):
+        # Read byte ranges, merging ones that sit close together into one request
+        blobs = {}
+        groups = []
+        for offset, length in sorted(set(ranges)):
+            if groups and offset - groups[-1][1] <= COALESCE_GAP:
+                groups[-1][1] = max(groups[-1][1], offset + length)
+                groups[-1][2].append((offset, length))
+            else:
+                groups.append([offset, offset + length, [(offset, length)]])
+
+        for first, last, members in groups:
+            data = self.read_range(first, last - first)
+            for offset, length in members:
+                blobs[(offset, length)] = data[offset - first:offset - first + length]
+        return blobs
+
+    def read(self, columns=None, start_utc=None, end_utc=None):
+        # Returns {column: values} for the requested columns and time range
+        columns = columns or self.columns
+        schema = self.footer['schema']
+        wanted = list(dict.fromkeys(list(columns) + ['created_utc']))
+        chunks = self.chunks_for(start_utc, end_utc)
+        blobs = self._fetch([tuple(chunk['columns'][name]) for chunk in chunks for name in wanted])
+
+        parts = {name: [] for name in wanted}
+        for chunk in chunks:
+            decoded = {
+                name: _decode_column(blobs[tuple(chunk['columns'][name])], schema[name], chunk['rows'],
+                                     self.footer['dictionaries'].get(name))
+                for name in wanted
+            }
+            created = decoded['created_utc']
+            mask = np.ones(chunk['rows'], dtype=bool)
+            if start_utc is not None:
+                mask &= created >= start_utc
+            if end_utc is not None:
+                mask &= created <= end_utc
+            for name in wanted:
+                values = decoded[name]
+                if isinstance(values, list):
+                    parts[name].extend(v for v, keep in zip(values, mask) if keep)
+                else:
+                    parts[name].append(values[mask])
+
+        result = {}
+        for name in columns:
+            if schema[name] == 'dict_list':
+                result[name] = parts[name]
+            elif parts[name]:
+                result[name] = np.concatenate(parts[name])
+            else:
+                result[name] = np.array([], dtype={'float64': '<f8', 'int64': '<i8'}.get(schema[name], object))
+        return result
@@ -0,0 +1,177 @@
+import os
+import time
+import boto3
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from colarchive import ColumnarArchive, write_columnar
+from ledger import Ledger
+
+# Cold tier for RedditPosts. Posts stop changing a couple of days after they
+# are created, so once a whole UTC day is older than COLD_AFTER_DAYS its posts
+# are exported to one columnar partition, archive/cold/posts/<day>/reddit_posts_<day>.rcol,
+# and only then given an expire_at so DynamoDB's TTL removes them from the
+# table (usually within a day or two). The hourly rollups keep every post's
+# counts; the dashboard stitches the partitions back in for All Time views.
+#
+# Per day the manifest (_state/ledger/cold_manifest.json) records the export
+# and, separately, that every exported item was marked to expire. A run that
+# dies in between exports the day again, merged with what the partition
+# already holds, and marks the rest.
+
+POSTS_TABLE = 'RedditPosts'
+COLD_PREFIX = 'archive/cold/posts/'
+TTL_ATTRIBUTE = 'expire_at'
+COLD_AFTER_DAYS = int(os.environ.get('COLD_AFTER_DAYS', '120'))
+MARK_WORKERS = int(os.environ.get('COLD_MARK_WORKERS', '16'))
+
+# Must match what the send stage writes (see items.py there)
+TIME_INDEX = 'day-created_utc-index'
+DAY_FORMAT = '%Y-%m-%d'
+
+COLD_SCHEMA = {
+    'created_utc': 'float64',
+    'score': 'int64',
+    'num_comments': 'int64',
+    'subreddit': 'dict',
+    'positive_sentiment': 'float64',
+    'neutral_sentiment': 'float64',
+    'negative_sentiment': 'float64',
+    'compound_sentiment': 'float64',
+    'title': 'str',
+    'url': 'str',
+}
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def cold_key(day):
+    return f"{COLD_PREFIX}{day}/reddit_posts_{day}.rcol"
+
+
+def merge_cold_entry(old, new):
+    return dict(old or {}, **new)
+
+
+def ensure_ttl(table_name):
+    client = dynamodb.meta.client
+    description = client.describe_time_to_live(TableName=table_name)['TimeToLiveDescription']
+    status = description.get('TimeToLiveStatus')
+    if status in ('ENABLED', 'ENABLING'):
+        if description.get('AttributeName') != TTL_ATTRIBUTE:
+            raise RuntimeError(f"{table_name} already expires items on {description.get('AttributeName')}")
+        return
+    print(f"🛠️ Enabling TTL on {table_name}.{TTL_ATTRIBUTE}")
+    client.update_time_to_live(
+        TableName=table_name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE},
+    )
+
+
+def query_day(table, day):
+    items = []
+    kwargs = {'IndexName': TIME_INDEX, 'KeyConditionExpression': Key('day').eq(day)}
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def oldest_day(table):
+    # First run only: the day of the oldest post, from a key-only scan
+    oldest = None
+    kwargs = {'ProjectionExpression': '#created', 'ExpressionAttributeNames': {'#created': 'created_utc'}}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get('Items', []):
+            oldest = item['created_utc'] if oldest is None else min(oldest, item['created_utc'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if oldest is None:
+        return None
+    return datetime.fromtimestamp(float(oldest), tz=timezone.utc).strftime(DAY_FORMAT)
+
+
+def read_partition(s3, bucket, day):
+    # {(title, created_utc): record} already exported for the day
+    try:
+        body = s3.get_object(Bucket=bucket, Key=cold_key(day))['Body'].read()
+    except s3.exceptions.NoSuchKey:
+        return {}
+    columns = ColumnarArchive(lambda offset, length: body[offset:offset + length], len(body)).read()
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    return {(r['title'], float(r['created_utc'])): r for r in records}
+
+
+def mark_expiring(table_name, items, expire_at):
+    # Hands the exported items to TTL; never recreates one deleted meanwhile
+    def mark(chunk):
+        table = boto3.session.Session().resource('dynamodb').Table(table_name)
+        for item in chunk:
+            try:
+                table.update_item(
+                    Key={'title': item['title'], 'created_utc': item['created_utc']},
+                    UpdateExpression='SET #ttl = :expire_at',
+                    ConditionExpression='attribute_exists(#title)',
+                    ExpressionAttributeNames={'#ttl': TTL_ATTRIBUTE, '#title': 'title'},
+                    ExpressionAttributeValues={':expire_at': expire_at},
+                )
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+
+    chunks = [items[i::MARK_WORKERS] for i in range(MARK_WORKERS)]
+    with ThreadPoolExecutor(max_workers=MARK_WORKERS) as pool:
+        list(pool.map(mark, [chunk for chunk in chunks if chunk]))
+
+
+def export_day(s3, bucket, table, day, manifest):
+    items = query_day(table, day)
+    records = read_partition(s3, bucket, day)
+    for item in items:
+        records[(item['title'], float(item['created_utc']))] = {name: item.get(name) for name in COLD_SCHEMA}
+
+    if records:
+        s3.put_object(Bucket=bucket, Key=cold_key(day), Body=write_columnar(list(records.values()), COLD_SCHEMA),
+                      Metadata={'records': str(len(records))})
+    manifest.update({day: {
+        'records': len(records),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+        'expired': False,
+    }})
+
+    # The partition is the commit point; only now let the items go
+    mark_expiring(table.name, items, Decimal(int(time.time())))
+    manifest.update({day: {'expired': True}})
+    print(f"🧊 {day}: {len(records):,} post(s) in {cold_key(day)}, {len(items):,} set to expire")
+    return len(items)
+
+
+def export_cold(s3, bucket, deadline, cold_after_days=COLD_AFTER_DAYS, start=None):
+    # Exports every day older than cold_after_days that is not done yet;
+    # returns (days exported, finished)
+    table = dynamodb.Table(POSTS_TABLE)
+    ensure_ttl(POSTS_TABLE)
+    manifest = Ledger(s3, bucket, 'cold_manifest', merge=merge_cold_entry).load()
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=cold_after_days)).date()
+    first = start or (min(manifest.entries) if manifest.entries else oldest_day(table))
+    if first is None:
+        return 0, True
+
+    exported = 0
+    day = datetime.strptime(first, DAY_FORMAT).date()
+    while day < cutoff:
+        name = day.strftime(DAY_FORMAT)
+        if not manifest.entries.get(name, {}).get('expired'):
+            if deadline.expired():
+                return exported, False
+            export_day(s3, bucket, table, name, manifest)
+            exported += 1
+        day += timedelta(days=1)
+    return exported, True
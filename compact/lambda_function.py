@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import boto3
+from botocore.exceptions import ClientError
+from datetime import datetime, timezone
+from checkpoint import Deadline
+from ledger import Ledger
+from s3_records import stream_records, post_key, S3RecordWriter
+
+# Create a boto3 S3 client
+s3 = boto3.client('s3')
+
+# Set your bucket name
+BUCKET_NAME = "reddit-sentiment-dashboard-2025"
+
+# Merge small files into one archive per 'hour' or per 'day'
+GRANULARITY = os.environ.get('COMPACT_GRANULARITY', 'hour')
+
+# Archives are backups: only files every stage has finished are merged, so
+# process_in and send never list archive/. Backfills read them through the
+# manifest (backfill/bulk_fetch.py), the dashboard reads the columnar ones.
+ARCHIVE_PREFIX = 'archive/'
+
+# Also write scored posts in the columnar format (needs numpy, e.g. from a layer)
+COLUMNAR_ARCHIVES = os.environ.get('COLUMNAR_ARCHIVES', 'false').lower() == 'true'
+
+# Move RedditPosts days older than COLD_AFTER_DAYS to the cold tier (see cold_tier.py)
+COLD_TIER = os.environ.get('COLD_TIER', 'false').lower() == 'true'
+
+# The small files each stage writes, with the timestamp captured from the name
+SOURCES = {
+    'raw': {
+        'prefix': 'raw_reddit_',
+        'pattern': re.compile(r'^raw_reddit_(\d{4}-\d{2}-\d{2})_(\d{2})-\d{2}-\d{2}\.json$'),
+        'archive_name': 'raw_reddit',
+    },
+    'processed': {
+        'prefix': 'processed/reddit_sentiment_',
+        'pattern': re.compile(r'^processed/reddit_sentiment_(\d{4}-\d{2}-\d{2})_(\d{2})-\d{2}-\d{2}(?:_part\d+)?(?:\.json|\.ndjson\.gz)$'),
+        'archive_name': 'reddit_sentiment',
+    },
+    'scores': {
+        'prefix': 'processed/reddit_scores_',
+        'pattern': re.compile(r'^processed/reddit_scores_(\d{4}-\d{2}-\d{2})_(\d{2})-\d{2}-\d{2}(?:_part\d+)?\.ndjson\.gz$'),
+        'archive_name': 'reddit_scores',
+    },
+}
+
+# archive key -> the small files it replaced
+def merge_archive_entry(old, new):
+    if not old:
+        return new
+    merged = dict(new)
+    merged['members'] = old['members'] + [m for m in new['members'] if m not in old['members']]
+    return merged
+
+def period_of(day, hour, granularity):
+    return day if granularity == 'day' else f"{day}_{hour}"
+
+def archive_key(kind, period):
+    return f"{ARCHIVE_PREFIX}{kind}/{period[:10]}/{SOURCES[kind]['archive_name']}_{period}.ndjson.gz"
+
+def columnar_key(period):
+    return f"{ARCHIVE_PREFIX}columnar/{period[:10]}/reddit_sentiment_{period}.rcol"
+
+def write_columnar_archive(period, records):
+    # Imported here so deployments without numpy can still compact
+    from colarchive import write_columnar
+    target = columnar_key(period)
+    s3.put_object(Bucket=BUCKET_NAME, Key=target, Body=write_columnar(records), Metadata={'records': str(len(records))})
+    return target
+
+def sidecar_prefix(raw_key):
+    # process_in names a raw file's sidecars (and their _partN pieces) after its timestamp
+    return f"{SOURCES['scores']['prefix']}{raw_key[len(SOURCES['raw']['prefix']):-len('.json')]}"
+
+def live_sidecars(raw_key):
+    # [(key, metadata)] for the sidecars made from raw_key still waiting under processed/
+    sidecars = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=BUCKET_NAME, Prefix=sidecar_prefix(raw_key)):
+        for obj in page.get('Contents', []):
+            metadata = s3.head_object(Bucket=BUCKET_NAME, Key=obj['Key']).get('Metadata', {})
+            if metadata.get('source') == raw_key:
+                sidecars.append((obj['Key'], metadata))
+    return sidecars
+
+def sidecar_scores(raw_keys, manifest):
+    # post id -> VADER scores from the sidecars made from these raw files, read
+    # from the scores archive when a sidecar was compacted already
+    archived_in = {member: target for target, entry in manifest.entries.items()
+                   if entry['kind'] == 'scores' for member in entry['members']}
+    sources = []
+    for key in raw_keys:
+        prefix = sidecar_prefix(key)
+        found = [target for member, target in archived_in.items() if member.startswith(prefix)]
+        found += [sidecar for sidecar, _ in live_sidecars(key)]
+        sources += [source for source in found if source not in sources]
+
+    scores = {}
+    for source in sources:
+        try:
+            for record in stream_records(s3, BUCKET_NAME, source):
+                scores[record.pop('post_id')] = record
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey'):
+                raise
+            print(f"⚠️ Score sidecar {source} is gone; its posts are left out of the columnar archive")
+    return scores
+
+def is_finished(kind, key):
+    # Only compact files every downstream stage is done with
+    metadata = s3.head_object(Bucket=BUCKET_NAME, Key=key).get('Metadata', {})
+    if kind != 'raw':
+        return metadata.get('status') == 'done'
+    if metadata.get('processed') != 'true':
+        return False
+    # The send stage joins score sidecars back onto their raw file, so it has
+    # to stay until every sidecar made from it is done. process_in uploads a
+    # file's sidecars before flagging it, so once it is flagged a sidecar that
+    # is no longer listed here was sent and archived.
+    return all(metadata.get('status') == 'done' for _, metadata in live_sidecars(key))
+
+def list_periods(kind, granularity):
+    # Group the small files of one kind by period, leaving the current period alone
+    now = datetime.now(timezone.utc)
+    current = period_of(now.strftime("%Y-%m-%d"), now.strftime("%H"), granularity)
+    periods = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=SOURCES[kind]['prefix']):
+        for obj in page.get('Contents', []):
+            match = SOURCES[kind]['pattern'].match(obj['Key'])
+            if not match:
+                continue
+            period = period_of(*match.groups(), granularity)
+            if period < current:
+                periods.setdefault(period, []).append(obj['Key'])
+    return periods
+
+def delete_keys(keys):
+    for start in range(0, len(keys), 1000):
+        chunk = keys[start:start + 1000]
+        s3.delete_objects(Bucket=BUCKET_NAME, Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True})
+
+def compact_period(kind, period, keys, manifest):
+    target = archive_key(kind, period)
+    entry = manifest.entries.get(target)
+    already_archived = set(entry['members']) if entry else set()
+
+    # A previous run may have archived some of these but died before deleting them
+    leftovers = [key for key in keys if key in already_archived]
+    members = sorted(key for key in keys if key not in already_archived and is_finished(kind, key))
+    if not members:
+        delete_keys(leftovers)
+        return 0
+
+    # Late files for a period that was already compacted get merged into its archive.
+    # Posts stream from the sources into the upload; they are only kept in memory
+    # when the columnar copy needs them.
+    # With score sidecars (process_in's default) there are no processed files,
+    # so the columnar copy is built from the raw posts joined with their scores.
+    sources = ([target] if entry else []) + members
+    columnar = kind in ('processed', 'raw') and COLUMNAR_ARCHIVES
+    scores = sidecar_scores((entry['members'] if entry else []) + members, manifest) if kind == 'raw' and columnar else None
+    records = []
+    with S3RecordWriter(s3, BUCKET_NAME, target) as writer:
+        for key in sources:
+            for record in stream_records(s3, BUCKET_NAME, key):
+                writer.write(record)
+                if scores is not None:
+                    score = scores.get(post_key(record))
+                    if score is not None:
+                        records.append(dict(record, **score))
+                elif columnar:
+                    records.append(record)
+
+    entry = {
+        'kind': kind,
+        'period': period,
+        'members': members,
+        'records': writer.count,
+        'compacted_at': datetime.now(timezone.utc).isoformat(),
+    }
+    if columnar and records:
+        entry['columnar'] = write_columnar_archive(period, records)
+
+    # The manifest switch is the commit point; only then remove the small files
+    manifest.update({target: entry})
+    delete_keys(members + leftovers)
+
+    print(f"🗜️ Compacted {len(members)} file(s), {writer.count} records → {target}")
+    return len(members)
+
+def lambda_handler(event, context):
+    event = event or {}
+    granularity = event.get('granularity', GRANULARITY)
+    kinds = event.get('kinds', list(SOURCES))
+
+    deadline = Deadline(context)
+    manifest = Ledger(s3, BUCKET_NAME, 'archive_manifest', merge=merge_archive_entry).load()
+
+    compacted = 0
+    for kind in kinds:
+        for period, keys in sorted(list_periods(kind, granularity).items()):
+            if deadline.expired():
+                print("Stopping near the deadline; the next run continues")
+                return {"statusCode": 202, "body": json.dumps(f"Compacted {compacted} file(s) before the deadline")}
+            compacted += compact_period(kind, period, keys, manifest)
+
+    if event.get('cold_tier', COLD_TIER):
+        # Imported here since it needs numpy, like the columnar archives
+        from cold_tier import export_cold
+        exported, finished = export_cold(s3, BUCKET_NAME, deadline, start=event.get('cold_start'))
+        if not finished:
+            print("Stopping near the deadline; the next run continues")
+            return {"statusCode": 202, "body": json.dumps(f"Compacted {compacted} file(s), moved {exported} day(s) to the cold tier before the deadline")}
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps(f"Compacted {compacted} file(s) into {'daily' if granularity == 'day' else 'hourly'} archives")
+    }
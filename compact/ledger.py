@@ -0,0 +1,124 @@
+import re
+import json
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from checkpoint import STATE_PREFIX
+
+# Which raw files have been scored, and into which processed files. A ledger
+# is a single S3 object so each update replaces it atomically; writers use
+# conditional puts (If-Match on the ETag they read) and retry on a conflict, so
+# concurrent updates never drop each other's entries.
+
+LEDGER_RETRIES = 5
+
+# The UTC day in a timestamped key, e.g. raw_reddit_2025-01-01_13-00-00.json
+KEY_DAY = re.compile(r'(\d{4}-\d{2}-\d{2})_\d{2}-\d{2}-\d{2}')
+
+
+def merge_entry(old, new):
+    if not old:
+        return new
+    return {
+        'outputs': old.get('outputs', []) + [o for o in new.get('outputs', []) if o not in old.get('outputs', [])],
+        'posts': old.get('posts', 0) + new.get('posts', 0),
+        'complete': old.get('complete', False) or new.get('complete', False),
+        'updated_at': new.get('updated_at', old.get('updated_at')),
+    }
+
+
+def new_entry(output_key, posts, complete):
+    return {
+        'outputs': [output_key] if output_key else [],
+        'posts': posts,
+        'complete': complete,
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class Ledger:
+    # merge(old, new) combines an existing entry with an update; the default
+    # suits the raw file -> processed outputs ledger
+    def __init__(self, s3, bucket, name, merge=merge_entry):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = f"{STATE_PREFIX}ledger/{name}.json"
+        self.merge = merge
+        self.entries = {}
+        self.etag = None
+
+    def load(self):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+            self.entries = json.loads(obj['Body'].read())
+            self.etag = obj['ETag']
+        except self.s3.exceptions.NoSuchKey:
+            self.entries, self.etag = {}, None
+        return self
+
+    def is_complete(self, raw_key):
+        return self.entries.get(raw_key, {}).get('complete', False)
+
+    def update(self, changes):
+        # Read-merge-write until our conditional put wins
+        if not changes:
+            return
+        for _ in range(LEDGER_RETRIES):
+            self.load()
+            for key, entry in changes.items():
+                self.entries[key] = self.merge(self.entries.get(key), entry)
+
+            condition = {'IfMatch': self.etag} if self.etag else {'IfNoneMatch': '*'}
+            try:
+                response = self.s3.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=json.dumps(self.entries), **condition
+                )
+                self.etag = response.get('ETag')
+                return
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    raise
+                print(f"Ledger {self.key} changed underneath us, retrying")
+        raise RuntimeError(f"Could not update ledger {self.key} after {LEDGER_RETRIES} attempts")
+
+
+class DailyLedger:
+    # A Ledger split into one object per UTC day of the key's timestamp
+    # (<name>/<day>.json), so a run only reads and rewrites the days of the
+    # files it sees. Once compaction removes a day's files nothing reads that
+    # day again. Keys without a timestamp share an 'undated' object.
+    def __init__(self, s3, bucket, name, merge=merge_entry):
+        self.s3 = s3
+        self.bucket = bucket
+        self.name = name
+        self.merge = merge
+        self.days = {}
+        self.loaded = set()
+
+    def load(self):
+        # Days are read on first use
+        self.days, self.loaded = {}, set()
+        return self
+
+    def day(self, key):
+        match = KEY_DAY.search(key)
+        day = match.group(1) if match else 'undated'
+        if day not in self.days:
+            self.days[day] = Ledger(self.s3, self.bucket, f"{self.name}/{day}", self.merge)
+        return day
+
+    def is_complete(self, key):
+        day = self.day(key)
+        if day not in self.loaded:
+            self.days[day].load()
+            self.loaded.add(day)
+        return self.days[day].is_complete(key)
+
+    def update(self, changes):
+        # Each day's object is updated on its own, with the same retries
+        by_day = {}
+        for key, entry in changes.items():
+            by_day.setdefault(self.day(key), {})[key] = entry
+        for day, day_changes in sorted(by_day.items()):
+            self.days[day].update(day_changes)
+            self.loaded.add(day)
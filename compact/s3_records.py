@@ -0,0 +1,278 @@
+import io
+import gzip
+import json
+import zlib
+import queue
+import codecs
+import threading
+from boto3.s3.transfer import TransferConfig
+
+# Reading and writing lists of posts in S3. A key ending in .json holds one JSON
+# array (what ingest writes); .ndjson / .ndjson.gz hold one post per line
+# (what process_in and the compaction job write). Readers accept either form.
+
+READ_CHUNK = 64 * 1024
+
+# Streaming writer: below the threshold the object goes up in one PUT, above it
+# s3transfer switches to a multipart upload of MULTIPART_CHUNK parts
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNK = 8 * 1024 * 1024
+PIPE_DEPTH = 16  # Buffered writes between the encoder and the upload thread
+
+
+def is_ndjson(key):
+    return key.endswith('.ndjson') or key.endswith('.ndjson.gz')
+
+
+def post_key(post):
+    # Join key between raw posts and score sidecars; raw files written before
+    # ingest recorded Reddit's id fall back to the table key
+    return post.get('id') or f"{post.get('title', '')}|{post.get('created_utc', '')}"
+
+
+def decode_records(data, key):
+    if key.endswith('.gz'):
+        data = gzip.decompress(data)
+    if is_ndjson(key):
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+    return json.loads(data)
+
+
+def encode_ndjson_gz(records):
+    lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    return gzip.compress(lines.encode('utf-8'))
+
+
+def read_records(s3, bucket, key):
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    return decode_records(obj['Body'].read(), key)
+
+
+# === Streaming readers: one post at a time, memory bounded by the largest post ===
+
+def _iter_chunks(raw_chunks, gzipped):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    for chunk in raw_chunks:
+        if decompressor is None:
+            yield chunk
+            continue
+        while chunk:
+            yield decompressor.decompress(chunk)
+            # Concatenated gzip members each need a fresh decompressor
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def iter_ndjson(chunks):
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def iter_json_array(chunks):
+    # Incrementally decode the elements of a top-level JSON array
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    started = False
+    chunks = iter(chunks)
+    exhausted = False
+
+    def more():
+        nonlocal buffer, position, exhausted
+        try:
+            buffer = buffer[position:] + text_decoder.decode(next(chunks))
+        except StopIteration:
+            buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+            exhausted = True
+        position = 0
+
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            if exhausted:
+                raise ValueError("Unexpected end of JSON array")
+            more()
+            continue
+
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError("Expected a top-level JSON array")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            more()
+            continue
+        if end == len(buffer) and not exhausted:
+            # A number at the very end of the buffer may continue in the next chunk
+            more()
+            continue
+        position = end
+        yield value
+
+
+def _decode_chunks(raw_chunks, key):
+    chunks = _iter_chunks(raw_chunks, key.endswith('.gz'))
+    if is_ndjson(key):
+        return iter_ndjson(chunks)
+    return iter_json_array(chunks)
+
+
+def iter_records(body, key):
+    # body is a botocore StreamingBody (anything with iter_chunks works)
+    return _decode_chunks(body.iter_chunks(READ_CHUNK), key)
+
+
+def iter_file_records(path):
+    # Same as iter_records for a copy already downloaded to local disk
+    with open(path, 'rb') as f:
+        yield from _decode_chunks(iter(lambda: f.read(READ_CHUNK), b''), path)
+
+
+def stream_records(s3, bucket, key):
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    return iter_records(obj['Body'], key)
+
+
+# === Streaming writer: encode, gzip and upload posts as they are produced ===
+
+class _Pipe(io.RawIOBase):
+    # Bounded in-memory pipe: the writer side blocks when the uploader falls
+    # behind, the read side is the file object s3transfer uploads from
+    def __init__(self):
+        self._chunks = queue.Queue(maxsize=PIPE_DEPTH)
+        self._pending = b''
+        self._eof = False
+        self.failed = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def read(self, size=-1):
+        # s3transfer sizes parts from one read() call, so fill the request
+        # completely unless the stream ends first
+        if size is None or size < 0:
+            return self.readall()
+        data = bytearray()
+        while len(data) < size:
+            chunk = bytearray(size - len(data))
+            count = self.readinto(chunk)
+            if not count:
+                break
+            data += chunk[:count]
+        return bytes(data)
+
+    def put(self, chunk, uploader):
+        # Give up instead of blocking forever if the upload thread has died
+        while True:
+            if self.failed:
+                raise self.failed
+            try:
+                self._chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                if not uploader.is_alive():
+                    raise RuntimeError("S3 upload stopped unexpectedly")
+
+
+class _PipeWriter(io.RawIOBase):
+    def __init__(self, pipe, uploader):
+        self.pipe = pipe
+        self.uploader = uploader
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self.pipe.put(bytes(data), self.uploader)
+        return len(data)
+
+
+class S3RecordWriter:
+    # Writes posts to S3 as gzip NDJSON without holding the whole object in
+    # memory. Use as a context manager; an exception inside the block aborts the
+    # upload so no partial object is left behind.
+    def __init__(self, s3, bucket, key, metadata=None):
+        self.key = key
+        self.count = 0
+        self._pipe = _Pipe()
+        config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNK)
+        extra_args = {'ContentType': 'application/x-ndjson', 'Metadata': metadata or {}}
+        self._uploader = threading.Thread(
+            target=self._upload, args=(s3, bucket, key, extra_args, config), daemon=True
+        )
+        self._uploader.start()
+        self._buffer = io.BufferedWriter(_PipeWriter(self._pipe, self._uploader), buffer_size=READ_CHUNK)
+        self._gzip = gzip.GzipFile(fileobj=self._buffer, mode='wb')
+
+    def _upload(self, s3, bucket, key, extra_args, config):
+        try:
+            s3.upload_fileobj(self._pipe, bucket, key, ExtraArgs=extra_args, Config=config)
+        except Exception as e:
+            self._pipe.failed = e
+
+    def write(self, record):
+        self._gzip.write((json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8'))
+        self.count += 1
+
+    def close(self):
+        self._gzip.close()
+        self._buffer.flush()
+        self._pipe.put(None, self._uploader)
+        self._uploader.join()
+        if self._pipe.failed:
+            raise self._pipe.failed
+
+    def abort(self):
+        # Fail the reader side so s3transfer aborts (and cleans up) the upload
+        try:
+            self._pipe.put(RuntimeError("Upload aborted"), self._uploader)
+        except Exception:
+            pass
+        self._uploader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
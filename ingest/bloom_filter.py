@@ -0,0 +1,164 @@
+import io
+import json
+import math
+import time
+import struct
+import hashlib
+from botocore.exceptions import ClientError
+
+# Persisted Bloom filter of post fingerprints, so ingest can drop posts it has
+# already uploaded unchanged. Bloom filters cannot forget, so the filter keeps
+# two generations: lookups check both, new fingerprints go into the current
+# one, and every rebuild period (or once it is full) the current generation
+# becomes the previous one and a fresh one starts. A post therefore stays known
+# for at least one full period without the false-positive rate creeping up.
+#
+# The S3 object carries a version number and is replaced with conditional puts;
+# when another run won the race its filter is reloaded, this run's additions
+# are replayed into it and the put is retried.
+
+STATE_PREFIX = '_state/'
+FORMAT_VERSION = 1
+SAVE_RETRIES = 5
+
+
+def fingerprint(post):
+    # A changed score or comment count is new information, not a duplicate
+    post_id = post.get('id') or f"{post.get('title', '')}|{post.get('created_utc', '')}"
+    return f"{post_id}:{post.get('score')}:{post.get('num_comments')}"
+
+
+class BloomFilter:
+    def __init__(self, capacity, fp_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        # Optimal size and hash count for capacity items at fp_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first, second = struct.unpack('<QQ', digest)
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class SeenPosts:
+    # Two-generation filter stored at _state/bloom/<name>.bin
+
+    def __init__(self, s3, bucket, name, capacity, fp_rate, rebuild_seconds):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = f"{STATE_PREFIX}bloom/{name}.bin"
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.rebuild_seconds = rebuild_seconds
+        self.current = BloomFilter(capacity, fp_rate)
+        self.previous = None
+        self.started_at = time.time()
+        self.version = 0
+        self.etag = None
+        self.added = []  # Fingerprints added by this run, replayed after a conflict
+
+    def _encode(self):
+        header = {
+            'format': FORMAT_VERSION,
+            'version': self.version,
+            'capacity': self.capacity,
+            'fp_rate': self.fp_rate,
+            'started_at': self.started_at,
+            'counts': [self.current.count, self.previous.count if self.previous else None],
+        }
+        body = io.BytesIO()
+        encoded = json.dumps(header).encode('utf-8')
+        body.write(struct.pack('<I', len(encoded)))
+        body.write(encoded)
+        body.write(self.current.bits)
+        if self.previous:
+            body.write(self.previous.bits)
+        return body.getvalue()
+
+    def _decode(self, data):
+        header_length = struct.unpack('<I', data[:4])[0]
+        header = json.loads(data[4:4 + header_length])
+        if header['capacity'] != self.capacity or header['fp_rate'] != self.fp_rate:
+            # Settings changed: start over rather than misread the bit arrays
+            print("Bloom filter settings changed, starting a new filter")
+            return False
+        current_count, previous_count = header['counts']
+        offset = 4 + header_length
+        length = (BloomFilter(self.capacity, self.fp_rate).size + 7) // 8
+        self.current = BloomFilter(self.capacity, self.fp_rate, bytearray(data[offset:offset + length]), current_count)
+        self.previous = None
+        if previous_count is not None:
+            bits = bytearray(data[offset + length:offset + 2 * length])
+            self.previous = BloomFilter(self.capacity, self.fp_rate, bits, previous_count)
+        self.started_at = header['started_at']
+        self.version = header['version']
+        return True
+
+    def load(self):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+            self.etag = obj['ETag']
+            if not self._decode(obj['Body'].read()):
+                self.current, self.previous, self.started_at = BloomFilter(self.capacity, self.fp_rate), None, time.time()
+        except self.s3.exceptions.NoSuchKey:
+            self.etag = None
+        self.rotate_if_due()
+        return self
+
+    def rotate_if_due(self):
+        if self.current.full or time.time() - self.started_at >= self.rebuild_seconds:
+            print(f"♻️ Rotating bloom filter {self.key} ({self.current.count} entries)")
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.fp_rate)
+            self.started_at = time.time()
+
+    def seen(self, item):
+        return item in self.current or (self.previous is not None and item in self.previous)
+
+    def add(self, item):
+        self.current.add(item)
+        self.added.append(item)
+
+    def save(self):
+        # Conditional put; on a conflict reload, fold our additions in and retry
+        if not self.added:
+            return
+        for _ in range(SAVE_RETRIES):
+            self.version += 1
+            condition = {'IfMatch': self.etag} if self.etag else {'IfNoneMatch': '*'}
+            try:
+                response = self.s3.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=self._encode(),
+                    Metadata={'version': str(self.version)}, **condition
+                )
+                self.etag = response.get('ETag')
+                self.added = []
+                return
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    raise
+                print(f"Bloom filter {self.key} changed underneath us, reloading and retrying")
+            added = self.added
+            self.load()
+            for item in added:
+                self.current.add(item)
+            self.added = added
+        raise RuntimeError(f"Could not save bloom filter {self.key} after {SAVE_RETRIES} attempts")
@@ -1,7 +1,9 @@
+import os
 import praw
 import boto3
 import json
 from datetime import datetime, timezone
+from bloom_filter import SeenPosts, fingerprint
 
 # Reddit API Credentials (Insert Your Credentials Here)
 reddit = praw.Reddit(
@@ -16,12 +18,33 @@ reddit = praw.Reddit(
 s3 = boto3.client("s3")
 bucket_name = "reddit-sentiment-dashboard-2025"
 
+# De-duplication of posts that have not changed since an earlier run
+DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', 'true').lower() == 'true'
+BLOOM_CAPACITY = int(os.environ.get('BLOOM_CAPACITY', '100000'))
+BLOOM_FP_RATE = float(os.environ.get('BLOOM_FP_RATE', '0.001'))
+BLOOM_REBUILD_HOURS = float(os.environ.get('BLOOM_REBUILD_HOURS', '24'))
+
+def drop_unchanged(posts):
+    # Skip posts whose id, score and comment count were all seen before.
+    # Returns the remaining posts and the filter, to be saved after the upload.
+    seen = SeenPosts(s3, bucket_name, 'ingest', BLOOM_CAPACITY, BLOOM_FP_RATE, BLOOM_REBUILD_HOURS * 3600).load()
+    fresh = []
+    for post in posts:
+        key = fingerprint(post)
+        if seen.seen(key):
+            continue
+        seen.add(key)
+        fresh.append(post)
+    print(f"🧹 Dropped {len(posts) - len(fresh)} unchanged duplicate(s), kept {len(fresh)}")
+    return fresh, seen
+
 def lambda_handler(event, context):
     posts = []
     
     # Grab front page or use specific subreddit if needed
     for submission in reddit.front.hot(limit=10):
         posts.append({
+            'id': submission.id,
             'title': submission.title,
             'score': submission.score,
             'url': submission.url,
@@ -30,6 +53,15 @@ def lambda_handler(event, context):
             'subreddit': submission.subreddit.display_name
         })
 
+    seen = None
+    if DEDUP_ENABLED:
+        posts, seen = drop_unchanged(posts)
+        if not posts:
+            return {
+                'statusCode': 200,
+                'body': "✅ No new or changed posts, nothing uploaded"
+            }
+
     # Convert to JSON
     json_data = json.dumps(posts, indent=2)
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
@@ -38,6 +70,10 @@ def lambda_handler(event, context):
     # Upload to S3
     s3.put_object(Bucket=bucket_name, Key=filename, Body=json_data)
 
+    # Only remember the posts once they are safely in S3
+    if seen is not None:
+        seen.save()
+
     return {
         'statusCode': 200,
         'body': f"✅ Uploaded {filename} to {bucket_name}"
@@ -1,7 +1,14 @@
+import os
+import re
+import sys
 import json
 import boto3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from datetime import datetime
+from checkpoint import Checkpoint, Deadline, is_state_key, continue_in_background, lambda_client
+from ledger import DailyLedger, new_entry
+from s3_records import iter_records, post_key, S3RecordWriter
 
 # Create a boto3 S3 client
 s3 = boto3.client('s3')
@@ -9,49 +16,120 @@ s3 = boto3.client('s3')
 # Set your bucket name
 BUCKET_NAME = "reddit-sentiment-dashboard-2025"
 
-def lambda_handler(event, context):
-    # Initialize the VADER Sentiment analyzer
-    analyzer = SentimentIntensityAnalyzer()
+# Coordinator mode: files per shard and how many workers run at once
+SHARD_SIZE = int(os.environ.get('SHARD_SIZE', '50'))
+MAX_SHARDS = int(os.environ.get('MAX_SHARDS', '10'))
 
-    # 1. List objects in the S3 bucket (raw data)
-    response = s3.list_objects_v2(Bucket=BUCKET_NAME)
-    files = [obj['Key'] for obj in response.get('Contents', []) if obj['Key'].endswith('.json') and 'processed' not in obj['Key']]
+# Time a coordinator keeps for itself to reduce results after its workers return
+COORDINATOR_RESERVE_MS = int(os.environ.get('COORDINATOR_RESERVE_MS', '20000'))
 
-    if not files:
-        return {"statusCode": 404, "body": "No files found in S3"}
+# 'sidecar' (default) writes only the VADER scores keyed by post id, which the
+# send stage joins back onto the raw posts; 'full' writes a scored copy of every post
+PROCESSED_FORMAT = os.environ.get('PROCESSED_FORMAT', 'sidecar').lower()
+
+RAW_TIMESTAMP = re.compile(r'raw_reddit_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})')
+
+def open_processed(filename, part=None):
+    # Stream the processed sentiment results to S3 under /processed/. Outputs
+    # are named after their raw file so two files scored in the same second
+    # never overwrite each other.
+    match = RAW_TIMESTAMP.search(filename)
+    timestamp = match.group(1) if match else datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    suffix = f"_part{part}" if part is not None else ""
+    if PROCESSED_FORMAT == 'full':
+        new_key = f"processed/reddit_sentiment_{timestamp}{suffix}.ndjson.gz"
+        return S3RecordWriter(s3, BUCKET_NAME, new_key, metadata={'processed': 'true'})
+
+    new_key = f"processed/reddit_scores_{timestamp}{suffix}.ndjson.gz"
+    return S3RecordWriter(s3, BUCKET_NAME, new_key, metadata={'processed': 'true', 'source': filename})
+
+def scored_record(post, sentiment):
+    if PROCESSED_FORMAT == 'full':
+        post.update(sentiment)
+        return post
+    return {'post_id': post_key(post), **sentiment}
+
+def list_pending_files(ledger):
+    # 1. List objects in the S3 bucket (raw data), skipping files the ledger has finished
+    files = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=BUCKET_NAME):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if key.endswith('.json') and 'processed' not in key and not is_state_key(key) and not ledger.is_complete(key):
+                files.append(key)
+    return files
+
+def process_files(files, deadline, checkpoint):
+    # Score each file with VADER, stopping at a post boundary near the deadline.
+    # Returns what happened so a caller (or a coordinator) can record it.
+    analyzer = SentimentIntensityAnalyzer()
+    result = {'finished': 0, 'posts': 0, 'stopped_early': False, 'remaining': [], 'ledger': {}}
+
+    for position, filename in enumerate(files):
+        if deadline.expired():
+            result['stopped_early'] = True
+            result['remaining'] = files[position:]
+            break
 
-    for filename in files:
         print(f"📥 Processing: {filename}")
-        
+
         # 2. Get the object and check metadata
         obj = s3.get_object(Bucket=BUCKET_NAME, Key=filename)
         metadata = obj.get('Metadata', {})
-        
+
         # Check if the file has already been processed using metadata
         if metadata.get('processed', 'false') == 'true':
             print(f"⚠️ Skipping already processed file: {filename}")
+            checkpoint.complete(filename)
+            result['ledger'][filename] = new_entry(None, 0, True)
             continue
-        
-        # Read the raw data
-        raw_data = json.loads(obj['Body'].read())
-
-        processed = []
-        for post in raw_data:
-            # Analyze sentiment using VADER
-            sentiment = analyzer.polarity_scores(post['title'])
-            post.update(sentiment)
-            processed.append(post)
-
-        # 3. Save the processed sentiment results to S3 under /processed/
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        new_key = f"processed/reddit_sentiment_{timestamp}.json"
-
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=new_key,
-            Body=json.dumps(processed, indent=2),
-            Metadata={'processed': 'true'}  # Add metadata here
-        )
+
+        # Stream the raw data, resuming after any posts a previous run already saved
+        start = checkpoint.offset(filename)
+        if start:
+            print(f"↪️ Resuming {filename} at post {start}")
+
+        # Scored posts are uploaded as they are produced instead of collected first
+        writer = open_processed(filename, part=start or None)
+        out_of_time = False
+        try:
+            for index, post in enumerate(iter_records(obj['Body'], filename)):
+                if index < start:
+                    continue
+                if deadline.expired():
+                    out_of_time = True
+                    break
+
+                # Analyze sentiment using VADER
+                sentiment = analyzer.polarity_scores(post['title'])
+                writer.write(scored_record(post, sentiment))
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            obj['Body'].close()
+
+        written = writer.count
+        done = start + written
+        result['posts'] += written
+        if out_of_time:
+            # Out of time mid-file: keep what we have and checkpoint the position
+            new_key = None
+            if written:
+                writer.close()
+                new_key = writer.key
+                print(f"⏸️ Saved {written} posts → {new_key}, stopped at post {done}")
+            else:
+                writer.abort()
+            checkpoint.advance(filename, done)
+            result['ledger'][filename] = new_entry(new_key, written, False)
+            result['stopped_early'] = True
+            result['remaining'] = files[position:]
+            break
+
+        # 3. Finish the upload of the processed sentiment results
+        writer.close()
+        new_key = writer.key
 
         # After processing, update the metadata of the original file
         s3.copy_object(
@@ -61,10 +139,114 @@ def lambda_handler(event, context):
             Metadata={'processed': 'true'},
             MetadataDirective='REPLACE'  # This tells S3 to replace the metadata
         )
+        checkpoint.complete(filename)
+        result['ledger'][filename] = new_entry(new_key, written, True)
+        result['finished'] += 1
+
+        print(f"✅ Saved {written} posts → {new_key}")
+
+    result['checkpoint'] = checkpoint.changes
+    return result
+
+def run_worker(keys, budget_ms=None, context=None):
+    # One shard: checkpoint and ledger changes go back to the coordinator,
+    # which is the only writer of the shared state objects
+    checkpoint = Checkpoint(s3, BUCKET_NAME, 'process_in').load()
+    return process_files(keys, Deadline(context, budget_ms=budget_ms), checkpoint)
+
+def invoke_worker(keys, budget_ms, context):
+    response = lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='RequestResponse',
+        Payload=json.dumps({'mode': 'worker', 'keys': keys, 'budget_ms': budget_ms}).encode('utf-8')
+    )
+    payload = json.loads(response['Payload'].read())
+    if response.get('FunctionError'):
+        raise RuntimeError(f"Worker failed: {payload}")
+    return payload['body']
+
+def dispatch_shards(shards, budget_ms, context):
+    # In Lambda each shard is a synchronous worker invocation; locally the
+    # same worker code runs in a process pool
+    if context is None:
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(run_worker, shard, budget_ms) for shard in shards]
+    else:
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(invoke_worker, shard, budget_ms, context) for shard in shards]
+
+    results = []
+    for shard, future in zip(shards, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"❌ Shard starting at {shard[0]} failed: {str(e)}")
+            results.append({'finished': 0, 'posts': 0, 'stopped_early': True, 'remaining': shard, 'ledger': {}, 'checkpoint': {}})
+    return results
+
+def run_coordinator(files, deadline, context):
+    # Partition pending files into shards, fan them out, then reduce
+    shards = [files[i:i + SHARD_SIZE] for i in range(0, len(files), SHARD_SIZE)][:MAX_SHARDS]
+    dispatched = sum(len(shard) for shard in shards)
+    budget_ms = None
+    if context is not None:
+        budget_ms = max(deadline.remaining_ms() - COORDINATOR_RESERVE_MS, 1)
+    print(f"🧩 Dispatching {dispatched} file(s) across {len(shards)} shard(s)")
+
+    results = dispatch_shards(shards, budget_ms, context)
+
+    checkpoint = Checkpoint(s3, BUCKET_NAME, 'process_in').load()
+    total = {'finished': 0, 'posts': 0, 'stopped_early': dispatched < len(files), 'remaining': files[dispatched:], 'ledger': {}}
+    for result in results:
+        total['finished'] += result['finished']
+        total['posts'] += result['posts']
+        total['stopped_early'] = total['stopped_early'] or result['stopped_early']
+        total['remaining'] = result['remaining'] + total['remaining']
+        total['ledger'].update(result['ledger'])
+        checkpoint.apply(result.get('checkpoint', {}))
+    checkpoint.save()
+    return total
+
+def lambda_handler(event, context):
+    event = event or {}
+    mode = event.get('mode', 'single')
+
+    if mode == 'worker':
+        return {"statusCode": 200, "body": run_worker(event['keys'], event.get('budget_ms'), context)}
+
+    deadline = Deadline(context)
+    ledger = DailyLedger(s3, BUCKET_NAME, 'process_in').load()
+    files = list_pending_files(ledger)
+
+    if not files:
+        return {"statusCode": 404, "body": "No files found in S3"}
+
+    if mode == 'coordinator':
+        result = run_coordinator(files, deadline, context)
+    else:
+        checkpoint = Checkpoint(s3, BUCKET_NAME, 'process_in').load()
+        result = process_files(files, deadline, checkpoint)
+        checkpoint.save()
+
+    ledger.update(result['ledger'])
+
+    if result['stopped_early']:
+        continue_in_background(event, context)
+        return {
+            "statusCode": 202,
+            "body": f"Processed {result['finished']} file(s); {len(result['remaining'])} left for the next run, checkpoint saved"
+        }
 
-        print(f"✅ Saved {len(processed)} posts → {new_key}")
-        
     return {
         "statusCode": 200,
         "body": f"Processed {len(files)} file(s) and saved sentiment results"
     }
+
+if __name__ == "__main__":
+    # Local backlog drain: python lambda_function.py [coordinator|single]
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'coordinator'
+    while True:
+        response = lambda_handler({'mode': mode}, None)
+        print(response)
+        if response['statusCode'] != 202:
+            break
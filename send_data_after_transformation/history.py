@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+# Score history per post in PostScoreHistory (partition key post_id), one item
+# per post so a whole trajectory is a single GetItem. The first snapshot is
+# stored as base_ts / base_score / base_comments; every later snapshot is
+# appended as deltas from the one before it:
+#   d_ts       - seconds since the previous snapshot
+#   d_score    - score change
+#   d_comments - comment count change
+# Deltas come from the RedditPosts item the send stage reads before its
+# conditional write, so no extra read is needed.
+
+
+HISTORY_ATTRIBUTES = (
+    'title', 'subreddit', 'created_utc', 'last_ts', 'last_score', 'last_comments',
+    'base_ts', 'base_score', 'base_comments', 'd_ts', 'd_score', 'd_comments',
+)
+
+
+def _number(value):
+    return int(Decimal(str(value)))
+
+
+def snapshot_args(post_id, item, old):
+    # UpdateItem arguments recording item's snapshot, given the attributes the
+    # RedditPosts update replaced ({} for a new post)
+    ts, score, comments = _number(item['updated_at']), _number(item['score']), _number(item['num_comments'])
+    values = {
+        ':ts': ts, ':score': score, ':comments': comments,
+        ':title': item['title'], ':subreddit': item['subreddit'], ':created': item['created_utc'],
+        ':empty': [],
+    }
+    assignments = [
+        '#title = :title', '#subreddit = :subreddit', '#created_utc = :created',
+        '#last_ts = :ts', '#last_score = :score', '#last_comments = :comments',
+    ]
+
+    if old:
+        # A known previous snapshot: append the change since then. If history
+        # started after the post did, the previous snapshot becomes the base.
+        # A field the stored item lacks is taken to be unchanged.
+        old_ts, old_score, old_comments = (_number(old.get(field, item[field])) for field in ('updated_at', 'score', 'num_comments'))
+        values.update({
+            ':old_ts': old_ts, ':old_score': old_score, ':old_comments': old_comments,
+            ':d_ts': [ts - old_ts], ':d_score': [score - old_score], ':d_comments': [comments - old_comments],
+        })
+        assignments += [
+            '#base_ts = if_not_exists(#base_ts, :old_ts)',
+            '#base_score = if_not_exists(#base_score, :old_score)',
+            '#base_comments = if_not_exists(#base_comments, :old_comments)',
+            '#d_ts = list_append(if_not_exists(#d_ts, :empty), :d_ts)',
+            '#d_score = list_append(if_not_exists(#d_score, :empty), :d_score)',
+            '#d_comments = list_append(if_not_exists(#d_comments, :empty), :d_comments)',
+        ]
+    else:
+        # First snapshot we know of
+        assignments += [
+            '#base_ts = if_not_exists(#base_ts, :ts)',
+            '#base_score = if_not_exists(#base_score, :score)',
+            '#base_comments = if_not_exists(#base_comments, :comments)',
+            '#d_ts = if_not_exists(#d_ts, :empty)',
+            '#d_score = if_not_exists(#d_score, :empty)',
+            '#d_comments = if_not_exists(#d_comments, :empty)',
+        ]
+
+    return {
+        'Key': {'post_id': post_id},
+        'UpdateExpression': 'SET ' + ', '.join(assignments),
+        'ExpressionAttributeNames': {f"#{name}": name for name in HISTORY_ATTRIBUTES},
+        'ExpressionAttributeValues': values,
+    }
+
+
+def decode_trajectory(item):
+    # [(timestamp, score, num_comments), ...] oldest first
+    if not item or 'base_ts' not in item:
+        return []
+    ts, score, comments = _number(item['base_ts']), _number(item['base_score']), _number(item['base_comments'])
+    points = [(ts, score, comments)]
+    for d_ts, d_score, d_comments in zip(item.get('d_ts', []), item.get('d_score', []), item.get('d_comments', [])):
+        ts, score, comments = ts + _number(d_ts), score + _number(d_score), comments + _number(d_comments)
+        points.append((ts, score, comments))
+    return points
+
+
+def fetch_trajectory(table, post_id):
+    # One read for a post's full history
+    return decode_trajectory(table.get_item(Key={'post_id': post_id}).get('Item'))
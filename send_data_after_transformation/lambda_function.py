@@ -1,6 +1,20 @@
+import os
 import json
+import threading
 import boto3
+import nlp
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from items import post_item, keyphrase_item, update_args, phrases_written_args, PHRASES_WRITTEN, KEY_FIELDS
+from history import snapshot_args
+from rollups import rollup_args, record_leaders
+from phrase_sketch import DailyPhraseCounts, sketch_day
+from language_filter import classify_title, EN
+from pipeline import ByteBudget, Stage, run_pipeline
+from checkpoint import Checkpoint, Deadline, continue_in_background
+from s3_records import stream_records, post_key
 
 # Initialize boto3 clients for S3, DynamoDB, and Comprehend
 s3 = boto3.client('s3')
@@ -13,125 +27,542 @@ table = dynamodb.Table('RedditPosts')
 # Reference the NEW DynamoDB table for key phrases and sentiment
 keyphrase_table = dynamodb.Table('KeyPhraseIdentificationTableV2')  # === NEW SECTION ===
 
-def lambda_handler(event, context):
-    # The bucket name where your processed files are stored
-    bucket_name = 'reddit-sentiment-dashboard-2025'
-    folder_prefix = 'processed/'
+# Per-post (timestamp, score, num_comments) snapshots, delta encoded
+history_table = dynamodb.Table(os.environ.get('HISTORY_TABLE', 'PostScoreHistory'))
+SCORE_HISTORY = os.environ.get('SCORE_HISTORY', 'true').lower() == 'true'
 
-    # List objects in the 'processed' folder
-    try:
-        response = s3.list_objects_v2(Bucket=bucket_name, Prefix=folder_prefix)
-        files = response.get('Contents', [])
-        if not files:
-            print("No files found to process.")
-            return {
-                'statusCode': 200,
-                'body': json.dumps("No files found to process.")
-            }
-    except Exception as e:
-        print(f"Error listing objects in S3: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f"Error listing objects in S3: {str(e)}")
-        }
+# Hourly per-subreddit counters the dashboards read instead of every post
+rollup_table = dynamodb.Table(os.environ.get('ROLLUP_TABLE', 'SubredditHourlyRollups'))
+HOURLY_ROLLUPS = os.environ.get('HOURLY_ROLLUPS', 'true').lower() == 'true'
+
+# Per-day key phrase sketches in S3 (see phrase_sketch.py) for the trends page
+PHRASE_SKETCHES = os.environ.get('PHRASE_SKETCHES', 'true').lower() == 'true'
+
+BUCKET_NAME = 'reddit-sentiment-dashboard-2025'
+FOLDER_PREFIX = 'processed/'
+RAW_PREFIX = 'raw_reddit_'
+
+# 'processed' joins process_in's output (score sidecars or full scored files)
+# back onto the raw posts; 'fused' reads the raw files directly and scores
+# them here with VADER, with no process_in step in between
+SEND_SOURCE = os.environ.get('SEND_SOURCE', 'processed').lower()
+
+# Pipeline sizing: worker threads per stage and the in-flight memory bound
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', '4'))
+NLP_WORKERS = int(os.environ.get('NLP_WORKERS', '4'))
+WRITE_WORKERS = int(os.environ.get('WRITE_WORKERS', '4'))
+STAGE_QUEUE_SIZE = int(os.environ.get('STAGE_QUEUE_SIZE', '8'))
+MAX_INFLIGHT_BYTES = int(os.environ.get('MAX_INFLIGHT_BYTES', str(64 * 1024 * 1024)))
+
+# Posts per batch; a file is streamed through the pipeline in batches of this size
+BATCH_POSTS = int(os.environ.get('BATCH_POSTS', '100'))
+
+# Fingerprints of recently written posts kept across warm invocations, so
+# unchanged posts are skipped without a round trip to DynamoDB. A post is only
+# remembered once everything for it is stored, key phrases included.
+FINGERPRINT_CACHE_SIZE = int(os.environ.get('FINGERPRINT_CACHE_SIZE', '50000'))
+
+# Reads of a post before giving up when other writers keep changing it
+WRITE_ATTEMPTS = 3
+
+# Stop admitting new files once less than this much of the invocation is left
+DEADLINE_MARGIN_MS = int(os.environ.get('DEADLINE_MARGIN_MS', '30000'))
+
+# boto3 resources are not thread safe, so each pipeline worker gets its own
+_thread_local = threading.local()
+
+def get_resource():
+    if not hasattr(_thread_local, 'resource'):
+        _thread_local.resource = boto3.session.Session().resource('dynamodb')
+    return _thread_local.resource
+
+def get_tables():
+    if not hasattr(_thread_local, 'tables'):
+        resource = get_resource()
+        _thread_local.tables = (
+            resource.Table(table.name), resource.Table(keyphrase_table.name),
+            resource.Table(history_table.name), resource.Table(rollup_table.name)
+        )
+    return _thread_local.tables
+
+# Key phrase engine for this deployment: 'comprehend' (default) or 'local'
+KEYPHRASE_ENGINE = os.environ.get('KEYPHRASE_ENGINE', 'comprehend').lower()
+
+def detect_key_phrases(titles):
+    return nlp.detect_key_phrases(titles, KEYPHRASE_ENGINE, comprehend)
+
+def detect_sentiment(title, post):
+    return nlp.detect_sentiment(title, post, KEYPHRASE_ENGINE, comprehend)
 
-    # Loop through the files and process them
-    for file in files:
-        file_key = file['Key']
-        print(f"Processing file {file_key}")
+class WriteStats:
+    # Written vs skipped RedditPosts items for one invocation
+    def __init__(self):
+        self.counts = {'written': 0, 'skipped_cached': 0, 'skipped_unchanged': 0}
+        self._lock = threading.Lock()
 
-        # Read the file's metadata to check if 'status' is set to 'done'
+    def add(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def summary(self):
+        skipped = self.counts['skipped_cached'] + self.counts['skipped_unchanged']
+        return (f"{self.counts['written']} written, {skipped} skipped unchanged "
+                f"({self.counts['skipped_cached']} from cache)")
+
+class SendRun:
+    # State shared by the pipeline workers of one invocation
+    def __init__(self, context):
+        self.budget = ByteBudget(MAX_INFLIGHT_BYTES)
+        self.deadline = Deadline(context)
+        self.checkpoint = Checkpoint(s3, BUCKET_NAME, 'send_data_after_transformation').load()
+        self.stopped = threading.Event()
+        self.stats = WriteStats()
+        self.phrase_counts = DailyPhraseCounts()
+        self.counted = {}  # day -> {(title, created_utc): item} in phrase_counts, flagged once saved
+        self._counted_lock = threading.Lock()
+
+    def count_phrases(self, item, key_phrases):
+        # A post seen twice in one run is only counted once
+        key = (item['title'], item['created_utc'])
+        with self._counted_lock:
+            counted = self.counted.setdefault(sketch_day(item['created_utc']), {})
+            if key in counted:
+                return
+            counted[key] = item
+        self.phrase_counts.add_post(item['created_utc'], key_phrases)
+
+    def flag_counted(self, day):
+        with self._counted_lock:
+            items = list(self.counted.pop(day, {}).values())
+        flag_phrases_written(items)
+
+_fingerprints = OrderedDict()  # (title, created_utc) -> fingerprint, least recent first
+_fingerprints_lock = threading.Lock()
+
+def remember_fingerprint(key, value):
+    with _fingerprints_lock:
+        _fingerprints[key] = value
+        _fingerprints.move_to_end(key)
+        while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+
+def write_post(posts_table, rollups_table, item, stats):
+    # Writes item if its mutable fields changed, together with the change to
+    # its hourly rollup when those are on: one transaction, conditional on the
+    # stored copy being the one read, so a failure leaves both for a retry.
+    # Returns (written, the item as stored before: {} for a new post), or
+    # (False, None) when the cache shows the post is done.
+    key = (item['title'], item['created_utc'])
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+    if cached == item['fingerprint']:
+        stats.add('skipped_cached')
+        return False, None
+
+    client = posts_table.meta.client
+    for attempt in range(WRITE_ATTEMPTS):
+        # Retries read strongly consistently, after another writer got in first
+        stored = posts_table.get_item(Key={name: item[name] for name in KEY_FIELDS},
+                                      ConsistentRead=attempt > 0).get('Item', {})
+        if stored.get('fingerprint') == item['fingerprint']:
+            stats.add('skipped_unchanged')
+            return False, stored
         try:
-            response = s3.head_object(Bucket=bucket_name, Key=file_key)
-            metadata = response.get('Metadata', {})
-            if metadata.get('status') == 'done':
-                print(f"File {file_key} has already been processed. Skipping.")
-                continue  # Skip this file if already marked as done
+            if HOURLY_ROLLUPS:
+                client.transact_write_items(TransactItems=[
+                    {'Update': dict(update_args(item, stored), TableName=posts_table.name)},
+                    {'Update': dict(rollup_args(item, stored), TableName=rollups_table.name)},
+                ])
+            else:
+                posts_table.update_item(**update_args(item, stored))
+        except client.exceptions.ConditionalCheckFailedException:
+            continue
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if not reasons or reasons[0].get('Code') != 'ConditionalCheckFailed':
+                raise
+            continue
+        stats.add('written')
+        return True, stored
+    raise RuntimeError(f"'{item['title']}' kept changing underneath {WRITE_ATTEMPTS} writes")
+
+def flag_phrases_written(items):
+    # Marks posts whose key phrases are stored (and counted); a post that is
+    # not flagged has them redone the next time it comes through
+    def flag(item):
+        try:
+            get_tables()[0].update_item(**phrases_written_args(item))
+            remember_fingerprint((item['title'], item['created_utc']), item['fingerprint'])
         except Exception as e:
-            print(f"Error reading metadata for {file_key}: {str(e)}")
-            continue  # Skip this file if we can't read metadata
+            print(f"Error flagging key phrases as stored for '{item['title']}': {str(e)}")
+
+    if items:
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+            list(pool.map(flag, items))
+
+def phrases_stored(posts):
+    # (title, created_utc) of the posts whose key phrases are already stored,
+    # so the NLP step can skip them. Posts the cache knows are done count too.
+    keys = {(post['title'], Decimal(str(post['created_utc']))) for post in posts}
+    with _fingerprints_lock:
+        stored = {key for key in keys if key in _fingerprints}
+    pending = [{'title': title, 'created_utc': created_utc} for title, created_utc in keys - stored]
+    for start in range(0, len(pending), 100):
+        request = {table.name: {
+            'Keys': pending[start:start + 100],
+            'ProjectionExpression': '#title, #created, #written',
+            'ExpressionAttributeNames': {'#title': 'title', '#created': 'created_utc', '#written': PHRASES_WRITTEN},
+        }}
+        while request:
+            response = get_resource().batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(table.name, []):
+                if item.get(PHRASES_WRITTEN):
+                    stored.add((item['title'], item['created_utc']))
+            request = response.get('UnprocessedKeys') or {}
+    return stored
+
+class FileProgress:
+    # Batches of one file can finish out of order on different write workers.
+    # This tracks the contiguous prefix of written posts (for the checkpoint)
+    # and whether the whole file is done (for the 'done' marker).
+    def __init__(self, file_key, start, checkpoint):
+        self.file_key = file_key
+        self.checkpoint = checkpoint
+        self.written_until = start
+        self.total = None
+        self.finished = {}  # batch start -> batch end, beyond written_until
+        self.marked = False
+        self._lock = threading.Lock()
+
+    def record(self, begin, end):
+        # Returns True for exactly one caller: the one that completes the file
+        with self._lock:
+            self.finished[begin] = end
+            while self.written_until in self.finished:
+                self.written_until = self.finished.pop(self.written_until)
+            if self.marked:
+                return False
+            if self.total is None or self.written_until < self.total:
+                self.checkpoint.advance(self.file_key, self.written_until)
+                return False
+            self.marked = True
+            return True
+
+def release_batch(batch, budget):
+    # Safe to call more than once; only the first call gives the bytes back
+    budget.release(batch.pop('size', 0))
+
+def post_size(post):
+    # Rough in-memory footprint of a parsed post, for the byte budget
+    return len(json.dumps(post)) * 2
+
+def fetch_file(file_key, run):
+    # Stage 1: skip finished files, then stream the body in batches of posts
+    try:
+        response = s3.head_object(Bucket=BUCKET_NAME, Key=file_key)
+        metadata = response.get('Metadata', {})
+        if metadata.get('status') == 'done':
+            print(f"File {file_key} has already been processed. Skipping.")
+            return None  # Skip this file if already marked as done
+        if metadata.get('status') == 'orphaned':
+            return None  # Its raw file is gone; see mark_orphaned
+        if 'source' in metadata and not source_exists(metadata['source']):
+            mark_orphaned(file_key, metadata)
+            return None
+    except Exception as e:
+        print(f"Error reading metadata for {file_key}: {str(e)}")
+        return None  # Skip this file if we can't read metadata
+
+    return read_batches(file_key, run, metadata)
+
+def source_exists(source_key):
+    try:
+        s3.head_object(Bucket=BUCKET_NAME, Key=source_key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            return False
+        raise
+    return True
+
+def mark_orphaned(file_key, metadata):
+    # A sidecar without its raw file can never be joined; flag it once instead
+    # of failing on every run. It stays under processed/ for someone to look at.
+    print(f"❌ {file_key}: raw file {metadata['source']} no longer exists, so its scores cannot be joined. "
+          f"Marking it 'status: orphaned'; restore the raw file and clear the status to send it.")
+    s3.copy_object(
+        Bucket=BUCKET_NAME,
+        CopySource={'Bucket': BUCKET_NAME, 'Key': file_key},
+        Key=file_key,
+        Metadata=dict(metadata, status='orphaned'),
+        MetadataDirective='REPLACE'
+    )
+
+def join_sidecar(file_key, source_key):
+    # Sidecars hold only post_id plus the VADER scores; attach them to the raw
+    # posts they were computed from, in the raw file's order
+    scores = {record.pop('post_id'): record for record in stream_records(s3, BUCKET_NAME, file_key)}
+    for post in stream_records(s3, BUCKET_NAME, source_key):
+        score = scores.get(post_key(post))
+        if score is not None:
+            post.update(score)
+            yield post
+
+def open_posts(file_key, metadata):
+    if 'source' in metadata:
+        return join_sidecar(file_key, metadata['source'])
+    return stream_records(s3, BUCKET_NAME, file_key)
+
+def read_batches(file_key, run, metadata):
+    # Resume after the posts a previous invocation already wrote
+    start = run.checkpoint.offset(file_key)
+    if start:
+        print(f"Resuming {file_key} at post {start}")
+    progress = FileProgress(file_key, start, run.checkpoint)
+
+    def make_batch(begin, posts):
+        # Batches only take their share of the budget once built, so a reader
+        # never sits on a half-built batch while waiting for budget
+        size = sum(post_size(post) for post in posts)
+        run.budget.acquire(size)
+        return {'file_key': file_key, 'metadata': metadata, 'progress': progress,
+                'start': begin, 'posts': posts, 'size': size, 'nlp': {}}
+
+    posts, begin, count = [], start, start
+    try:
+        for index, post in enumerate(open_posts(file_key, metadata)):
+            if index < start:
+                continue
+            posts.append(post)
+            count = index + 1
+            if len(posts) == BATCH_POSTS:
+                yield make_batch(begin, posts)
+                posts, begin = [], count
+    except Exception as e:
+        print(f"Error reading file {file_key}: {str(e)}")
+        return  # Skip the rest of this file if there is an error reading it
+
+    print(f"Read {count - start} records from {file_key}.")
+    # The final batch (possibly empty) is yielded after the total is known, so
+    # whichever batch is written last sees the file as complete
+    progress.total = count
+    yield make_batch(begin, posts)
+
+def is_valid_post(post):
+    return 'title' in post and 'created_utc' in post
+
+_analyzer = None
+
+def score_posts(posts):
+    # Fused mode: raw posts arrive unscored, so run VADER here (the analyzer is
+    # read-only once built and safe to share between workers)
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    for post in posts:
+        if 'compound' not in post:
+            post.update(_analyzer.polarity_scores(post['title']))
+
+def analyze_batch(batch):
+    # Stage 2: language pre-filter, key phrases and sentiment for one file
+    posts = [post for post in batch['posts'] if is_valid_post(post)]
+    if SEND_SOURCE == 'fused':
+        score_posts(posts)
+
+    # Pre-filter titles locally so only English ones reach the NLP step
+    language_by_title = {post['title'].strip(): classify_title(post['title']) for post in posts}
+    batch['language'] = language_by_title
+
+    # Only posts whose key phrases are not stored yet need the NLP step
+    try:
+        stored = phrases_stored(posts)
+    except Exception as e:
+        print(f"Error checking stored key phrases for {batch['file_key']}: {str(e)}")
+        stored = set()
+    needed = {post['title'].strip() for post in posts
+              if (post['title'], Decimal(str(post['created_utc']))) not in stored}
+
+    # Extract key phrases for the whole file in one batch
+    titles = [title for title, language in language_by_title.items() if language == EN and title in needed]
+    try:
+        key_phrases_by_title = dict(zip(titles, detect_key_phrases(titles)))
+    except Exception as e:
+        print(f"Error extracting key phrases for {batch['file_key']}: {str(e)}")
+        return batch
 
-        # Read the JSON file from S3 if not marked as done
+    for post in posts:
+        title = post['title'].strip()
+        key_phrases = key_phrases_by_title.get(title)
+        if key_phrases is None or title in batch['nlp']:
+            continue
         try:
-            response = s3.get_object(Bucket=bucket_name, Key=file_key)
-            file_data = json.loads(response['Body'].read())
-            print(f"Read {len(file_data)} records from {file_key}.")
+            batch['nlp'][title] = (key_phrases, detect_sentiment(title, post))
         except Exception as e:
-            print(f"Error reading file {file_key}: {str(e)}")
-            continue  # Skip this file if there is an error reading it
+            print(f"Error detecting sentiment for post '{title}': {str(e)}")
+
+    return batch
+
+def done_metadata(metadata):
+    # Keep the existing metadata (e.g. a sidecar's source); in fused mode the
+    # raw file is also marked processed, which is what compaction waits for
+    marked = dict(metadata, status='done')
+    if SEND_SOURCE == 'fused':
+        marked['processed'] = 'true'
+    return marked
+
+def write_batch(batch, run):
+    # Stage 3: write both tables, then mark the file as done once all its batches are
+    file_key = batch['file_key']
+    progress = batch['progress']
+    posts_table, phrases_table, snapshots_table, rollups_table = get_tables()
+    try:
+        for index, post in enumerate(batch['posts']):
+            # Out of time: remember how far this file got and leave it unmarked
+            if run.deadline.expired():
+                progress.record(batch['start'], batch['start'] + index)
+                run.stopped.set()
+                print(f"Stopping {file_key} at post {batch['start'] + index} near the deadline")
+                return None
 
-        # Loop through the data and insert it into DynamoDB
-        for post in file_data:
-            # Log the item before inserting into DynamoDB
-            if 'title' not in post or 'created_utc' not in post:
+            if not is_valid_post(post):
                 print(f"Missing 'title' or 'created_utc' in post: {post}")
                 continue  # Skip this post if it's missing required fields
 
-            # === ORIGINAL SECTION: insert into RedditPosts table ===
-            item = {
-                'title': post['title'],  # Partition Key
-                'created_utc': Decimal(str(post['created_utc'])),  # Sort Key
-                'score': Decimal(str(post['score'])),
-                'num_comments': Decimal(str(post['num_comments'])),
-                'subreddit': post['subreddit'],
-                'url': post['url'],
-                'positive_sentiment': Decimal(str(post.get('pos', 0.0))),
-                'neutral_sentiment': Decimal(str(post.get('neu', 0.0))),
-                'negative_sentiment': Decimal(str(post.get('neg', 0.0))),
-                'compound_sentiment': Decimal(str(post.get('compound', 0.0))),
-            }
+            title = post['title'].strip()
 
-            print(f"Inserting item into DynamoDB: {item}")
+            # === ORIGINAL SECTION: insert into RedditPosts table ===
+            item = post_item(post, batch['language'][title])
 
             try:
-                response = table.put_item(Item=item)
-                print(f"Inserted post with title '{post['title']}' into RedditPosts")
+                written, old = write_post(posts_table, rollups_table, item, run.stats)
             except Exception as e:
                 print(f"Error inserting item into RedditPosts table: {str(e)}")
                 continue
+            if old is None:
+                continue  # Done at this fingerprint, key phrases included
 
-            # === NEW SECTION: Extract key phrases and sentiment with Comprehend ===
-            try:
-                title = post['title'].strip()
-                utc = int(post['created_utc'])
-
-                # 1. Key Phrase Extraction
-                kp_response = comprehend.detect_key_phrases(Text=title, LanguageCode='en')
-                key_phrases = [kp['Text'] for kp in kp_response['KeyPhrases']]
-
-                # 2. Sentiment Detection
-                sentiment_response = comprehend.detect_sentiment(Text=title, LanguageCode='en')
-                sentiment = sentiment_response.get('Sentiment', 'NEUTRAL')
-
-                # 4. Write to separate DynamoDB table
-                keyphrase_table.put_item(Item={
-                    'post_id': title,
-                    'created_utc': utc,
-                    'title': title,
-                    'key_phrases': key_phrases,
-                    'sentiment': sentiment
-                })
+            if written:
+                print(f"Wrote post with title '{post['title']}' to RedditPosts")
+
+                if SCORE_HISTORY:
+                    try:
+                        snapshots_table.update_item(**snapshot_args(post_key(post), item, old))
+                    except Exception as e:
+                        print(f"Error recording score history for '{title}': {str(e)}")
+
+                if HOURLY_ROLLUPS:
+                    try:
+                        record_leaders(rollups_table, item)
+                    except Exception as e:
+                        print(f"Error updating the hour's top posts for '{title}': {str(e)}")
+
+            # === NEW SECTION: Store key phrases and sentiment (Comprehend or local engine) ===
+            # Key phrases depend only on the title, so they are written once per
+            # post; the post is flagged only after the put, so a failure is
+            # retried the next time the post comes through
+            if item['language_filter'] != EN:
+                if written:
+                    print(f"Skipping NLP for '{title}' ({item['language_filter']})")
+                remember_fingerprint((item['title'], item['created_utc']), item['fingerprint'])
+                continue
+            if old.get(PHRASES_WRITTEN):
+                remember_fingerprint((item['title'], item['created_utc']), item['fingerprint'])
+                continue
+            if title not in batch['nlp']:
+                print(f"No key phrases available for '{title}'. Skipping.")
+                continue
 
+            key_phrases, sentiment = batch['nlp'][title]
+            try:
+                phrases_table.put_item(Item=keyphrase_item(post, key_phrases, sentiment))
                 print(f"Inserted key phrases and sentiment for '{title}' into KeyPhraseIdentificationTable")
+                if PHRASE_SKETCHES:
+                    # Flagged once the day's sketch is saved, so an unsaved count is redone too
+                    run.count_phrases(item, key_phrases)
+                else:
+                    posts_table.update_item(**phrases_written_args(item))
+                    remember_fingerprint((item['title'], item['created_utc']), item['fingerprint'])
 
             except Exception as e:
-                print(f"Error extracting/storing key phrases or sentiment for post '{title}': {str(e)}")
+                print(f"Error storing key phrases or sentiment for post '{title}': {str(e)}")
+
+        if not progress.record(batch['start'], batch['start'] + len(batch['posts'])):
+            return batch
 
         # After processing, update the metadata to mark the file as 'done'
         try:
             s3.copy_object(
-                Bucket=bucket_name,
-                CopySource={'Bucket': bucket_name, 'Key': file_key},
+                Bucket=BUCKET_NAME,
+                CopySource={'Bucket': BUCKET_NAME, 'Key': file_key},
                 Key=file_key,
-                Metadata={'status': 'done'},
+                Metadata=done_metadata(batch['metadata']),
                 MetadataDirective='REPLACE'
             )
             print(f"Updated metadata for {file_key} to 'status: done'")
         except Exception as e:
             print(f"Error updating metadata for {file_key}: {str(e)}")
-            continue
+            return None
+        run.checkpoint.complete(file_key)
+    finally:
+        release_batch(batch, run.budget)
+
+    return batch
+
+def lambda_handler(event, context):
+    # List objects in the 'processed' folder
+    try:
+        prefix = RAW_PREFIX if SEND_SOURCE == 'fused' else FOLDER_PREFIX
+        response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
+        files = response.get('Contents', [])
+        if not files:
+            print("No files found to process.")
+            return {
+                'statusCode': 200,
+                'body': json.dumps("No files found to process.")
+            }
+    except Exception as e:
+        print(f"Error listing objects in S3: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f"Error listing objects in S3: {str(e)}")
+        }
+
+    # fetch/parse -> NLP -> write, each with its own worker pool
+    run = SendRun(context)
+    stages = [
+        Stage('fetch', lambda key: fetch_file(key, run), FETCH_WORKERS, STAGE_QUEUE_SIZE),
+        Stage('nlp', analyze_batch, NLP_WORKERS, STAGE_QUEUE_SIZE),
+        Stage('write', lambda batch: write_batch(batch, run), WRITE_WORKERS, STAGE_QUEUE_SIZE),
+    ]
+
+    def release_dropped(item):
+        # A batch that failed mid-pipeline still holds its share of the budget
+        if isinstance(item, dict):
+            release_batch(item, run.budget)
+
+    def near_deadline():
+        return run.deadline.expired(DEADLINE_MARGIN_MS)
+
+    admitted = run_pipeline((file['Key'] for file in files), stages, should_stop=near_deadline, on_drop=release_dropped)
+    run.checkpoint.save()
+    print(f"📝 RedditPosts: {run.stats.summary()}")
+    try:
+        days = run.phrase_counts.save(s3, BUCKET_NAME, on_saved=run.flag_counted)
+        if days:
+            print(f"🔑 Updated key phrase sketches for {days} day(s)")
+    except Exception as e:
+        print(f"Error saving key phrase sketches: {str(e)}")
+
+    if admitted < len(files) or run.stopped.is_set():
+        print(f"Stopping early near the deadline: {len(files) - admitted} file(s) not started")
+        continue_in_background(event, context)
+        return {
+            'statusCode': 202,
+            'body': json.dumps(f"Processed {admitted} of {len(files)} files before the deadline; checkpoint saved. "
+                               f"{run.stats.summary()}")
+        }
 
     return {
         'statusCode': 200,
-        'body': json.dumps("Successfully processed all files.")
+        'body': json.dumps(f"Successfully processed all files. {run.stats.summary()}")
     }
@@ -0,0 +1,62 @@
+import re
+import unicodedata
+
+# Cheap local pre-filter run before the paid NLP step. Each title gets one of:
+#   'en'          - looks like English, send it to NLP
+#   'too_short'   - fewer than MIN_WORDS words, not worth an NLP call
+#   'no_text'     - emoji / punctuation / numbers only
+#   'non_english' - mostly non-Latin script or other-language stopwords
+EN = 'en'
+TOO_SHORT = 'too_short'
+NO_TEXT = 'no_text'
+NON_ENGLISH = 'non_english'
+
+MIN_WORDS = 2
+MAX_NON_LATIN_RATIO = 0.3
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)?", re.UNICODE)
+
+ENGLISH_STOPWORDS = frozenset("""
+the a an and or of to in on for with is are was were be been it this that
+these those my your our their his her its i you he she we they what why how
+when who not no but from at by about after before just will can has have had
+do does did if so than then there here all more most
+""".split())
+
+# Frequent function words of the other languages that show up on r/all
+FOREIGN_STOPWORDS = frozenset("""
+el la los las del por para una uno con que es son pero como muy tambien esta
+der die das und ist nicht ein eine mit auf dem den sich auch wie aber oder
+le les des une est pas avec pour dans sur qui sont mais comme tres aux du
+il di che della gli sono una per non anche nel
+os uma não com para mais como pelo pela são
+het een niet van zijn ook maar voor
+""".split())
+
+
+def _is_latin(char):
+    try:
+        return 'LATIN' in unicodedata.name(char)
+    except ValueError:
+        return False
+
+
+def classify_title(title):
+    words = WORD_RE.findall(title or '')
+    if not words:
+        return NO_TEXT
+    if len(words) < MIN_WORDS:
+        return TOO_SHORT
+
+    letters = [c for word in words for c in word]
+    non_latin = sum(1 for c in letters if not _is_latin(c))
+    if non_latin / len(letters) > MAX_NON_LATIN_RATIO:
+        return NON_ENGLISH
+
+    lowered = [w.lower() for w in words]
+    english_hits = sum(1 for w in lowered if w in ENGLISH_STOPWORDS)
+    foreign_hits = sum(1 for w in lowered if w in FOREIGN_STOPWORDS)
+    if foreign_hits >= 2 and foreign_hits > english_hits:
+        return NON_ENGLISH
+
+    return EN
@@ -0,0 +1,60 @@
+from keyphrase_extractor import extract_key_phrases_batch
+
+# Key phrases and a sentiment label per title, from Amazon Comprehend or from
+# the local extractor plus the VADER score already on the post. engine is
+# 'comprehend' or 'local'; comprehend is a boto3 Comprehend client.
+
+COMPREHEND_BATCH_SIZE = 25  # Comprehend's batch API limit
+
+
+def detect_key_phrases_single(title, comprehend):
+    # One title on its own, so a failure only costs that title
+    try:
+        response = comprehend.detect_key_phrases(Text=title, LanguageCode='en')
+        return [kp['Text'] for kp in response['KeyPhrases']]
+    except Exception as e:
+        print(f"Comprehend key phrase error for '{title}': {str(e)}")
+        return None
+
+
+def detect_key_phrases(titles, engine, comprehend=None):
+    # Returns one list of phrases per title (None where Comprehend failed)
+    if engine == 'local':
+        return extract_key_phrases_batch(titles)
+
+    results = []
+    for start in range(0, len(titles), COMPREHEND_BATCH_SIZE):
+        chunk = titles[start:start + COMPREHEND_BATCH_SIZE]
+        try:
+            response = comprehend.batch_detect_key_phrases(TextList=chunk, LanguageCode='en')
+        except Exception as e:
+            # A failed batch call is retried title by title rather than losing all of them
+            print(f"Comprehend batch key phrase call failed, retrying {len(chunk)} title(s) one by one: {str(e)}")
+            results.extend(detect_key_phrases_single(title, comprehend) for title in chunk)
+            continue
+        phrases = [None] * len(chunk)
+        for result in response.get('ResultList', []):
+            phrases[result['Index']] = [kp['Text'] for kp in result['KeyPhrases']]
+        for error in response.get('ErrorList', []):
+            print(f"Comprehend key phrase error for '{chunk[error['Index']]}': {error.get('ErrorMessage')}, retrying it alone")
+            phrases[error['Index']] = detect_key_phrases_single(chunk[error['Index']], comprehend)
+        results.extend(phrases)
+    return results
+
+
+def sentiment_label(compound):
+    compound = float(compound)
+    if compound >= 0.05:
+        return 'POSITIVE'
+    if compound <= -0.05:
+        return 'NEGATIVE'
+    return 'NEUTRAL'
+
+
+def detect_sentiment(title, post, engine, comprehend=None):
+    if engine == 'local':
+        # Derive the label from the VADER compound score already on the post
+        return sentiment_label(post.get('compound', 0.0))
+
+    sentiment_response = comprehend.detect_sentiment(Text=title, LanguageCode='en')
+    return sentiment_response.get('Sentiment', 'NEUTRAL')
@@ -0,0 +1,216 @@
+import io
+import json
+import struct
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+# Per-day key phrase frequency sketches, so "top phrases over the last N days"
+# is a merge of at most N small objects instead of a pass over every post.
+# Each day (UTC, by post creation time) at _state/sketches/phrases/<day>.bin
+# holds two mergeable summaries of the phrases of the posts created that day:
+#   Space-Saving - the k heaviest phrases with upper-bound counts
+#   Count-Min    - an upper-bound count for any phrase, heavy or not
+# Both only ever overestimate, so the smaller of the two is the estimate.
+#
+# Writers add their counts to a day with a conditional read-merge-write, the
+# same way the ledger is updated, so concurrent runs never lose each other's
+# counts.
+
+STATE_PREFIX = '_state/'
+FORMAT_VERSION = 1
+SAVE_RETRIES = 5
+
+DAY_FORMAT = '%Y-%m-%d'
+TOP_K = 500
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+
+
+def sketch_day(created_utc):
+    return datetime.fromtimestamp(float(created_utc), tz=timezone.utc).strftime(DAY_FORMAT)
+
+
+def sketch_key(day):
+    return f"{STATE_PREFIX}sketches/phrases/{day}.bin"
+
+
+class CountMinSketch:
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, counts=None):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else [0] * (width * depth)
+
+    def _cells(self, item):
+        # Double hashing: one cell per row from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first, second = struct.unpack('<QQ', digest)
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, item, count=1):
+        for cell in self._cells(item):
+            self.counts[cell] += count
+
+    def estimate(self, item):
+        return min(self.counts[cell] for cell in self._cells(item))
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+
+class SpaceSaving:
+    # phrase -> [count, error]; count - error is a guaranteed lower bound
+    def __init__(self, k=TOP_K, counters=None):
+        self.k = k
+        self.counters = counters if counters is not None else {}
+
+    def floor(self):
+        # Upper bound on the count of any phrase not being tracked
+        return min(c[0] for c in self.counters.values()) if len(self.counters) >= self.k else 0
+
+    def merge(self, other):
+        # Mergeable summaries: a phrase missing on one side may have had up to
+        # that side's floor there, so it is charged as count and error
+        own_floor, other_floor = self.floor(), other.floor()
+        merged = {}
+        for phrase in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(phrase, [own_floor, own_floor])
+            other_count, other_error = other.counters.get(phrase, [other_floor, other_floor])
+            merged[phrase] = [count + other_count, error + other_error]
+        top = sorted(merged, key=lambda phrase: merged[phrase][0], reverse=True)[:self.k]
+        self.counters = {phrase: merged[phrase] for phrase in top}
+
+    def top(self, n):
+        return sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)[:n]
+
+
+class PhraseSketch:
+    def __init__(self, k=TOP_K, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.heavy = SpaceSaving(k)
+        self.cms = CountMinSketch(width, depth)
+        self.total = 0  # Phrase mentions counted
+        self.posts = 0
+
+    @classmethod
+    def from_counts(cls, counts, posts, k=TOP_K):
+        # Exact counts (e.g. one run's) as a sketch; the top k carry no error
+        sketch = cls(k)
+        for phrase, count in counts.items():
+            sketch.cms.add(phrase, count)
+        sketch.heavy.counters = {phrase: [count, 0] for phrase, count in counts.most_common(k)}
+        sketch.total = sum(counts.values())
+        sketch.posts = posts
+        return sketch
+
+    def merge(self, other):
+        self.heavy.merge(other.heavy)
+        self.cms.merge(other.cms)
+        self.total += other.total
+        self.posts += other.posts
+
+    def estimate(self, phrase):
+        if phrase in self.heavy.counters:
+            return min(self.heavy.counters[phrase][0], self.cms.estimate(phrase))
+        return self.cms.estimate(phrase)
+
+    def top(self, n):
+        # [(phrase, estimated count)] heaviest first
+        ranked = [(phrase, self.estimate(phrase)) for phrase, _ in self.heavy.top(len(self.heavy.counters))]
+        return sorted(ranked, key=lambda entry: entry[1], reverse=True)[:n]
+
+    def encode(self):
+        header = {
+            'format': FORMAT_VERSION,
+            'k': self.heavy.k,
+            'width': self.cms.width,
+            'depth': self.cms.depth,
+            'total': self.total,
+            'posts': self.posts,
+            'heavy': self.heavy.counters,
+        }
+        body = io.BytesIO()
+        encoded = json.dumps(header).encode('utf-8')
+        body.write(struct.pack('<I', len(encoded)))
+        body.write(encoded)
+        body.write(struct.pack(f"<{len(self.cms.counts)}I", *self.cms.counts))
+        return body.getvalue()
+
+    @classmethod
+    def decode(cls, data):
+        header_length = struct.unpack('<I', data[:4])[0]
+        header = json.loads(data[4:4 + header_length])
+        sketch = cls(header['k'], header['width'], header['depth'])
+        cells = header['width'] * header['depth']
+        sketch.cms.counts = list(struct.unpack(f"<{cells}I", data[4 + header_length:4 + header_length + 4 * cells]))
+        sketch.heavy.counters = header['heavy']
+        sketch.total = header['total']
+        sketch.posts = header['posts']
+        return sketch
+
+
+def load_day(s3, bucket, day):
+    # (sketch, etag) for one day, or (None, None) if nothing was counted yet
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=sketch_key(day))
+        return PhraseSketch.decode(obj['Body'].read()), obj['ETag']
+    except s3.exceptions.NoSuchKey:
+        return None, None
+
+
+def load_merged(s3, bucket, days, workers=16):
+    # One sketch covering all the given days
+    merged = PhraseSketch()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(days)))) as pool:
+        for sketch, _ in pool.map(lambda day: load_day(s3, bucket, day), days):
+            if sketch is not None:
+                merged.merge(sketch)
+    return merged
+
+
+def save_day(s3, bucket, day, sketch, replace=False):
+    # Adds sketch to the stored day (or overwrites it when replace is set)
+    for _ in range(SAVE_RETRIES):
+        stored, etag = load_day(s3, bucket, day)
+        if stored is not None and not replace:
+            stored.merge(sketch)
+        else:
+            stored = sketch
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            s3.put_object(Bucket=bucket, Key=sketch_key(day), Body=stored.encode(), **condition)
+            return
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+            print(f"Phrase sketch {sketch_key(day)} changed underneath us, retrying")
+    raise RuntimeError(f"Could not save phrase sketch {sketch_key(day)} after {SAVE_RETRIES} attempts")
+
+
+class DailyPhraseCounts:
+    # Exact phrase counts gathered during one run, per day, folded into the
+    # stored sketches at the end. Safe to share between worker threads.
+    def __init__(self):
+        self.counts = {}  # day -> Counter of phrases
+        self.posts = Counter()  # day -> posts counted
+        self._lock = threading.Lock()
+
+    def add_post(self, created_utc, phrases):
+        day = sketch_day(created_utc)
+        with self._lock:
+            self.counts.setdefault(day, Counter()).update(phrases)
+            self.posts[day] += 1
+
+    def save(self, s3, bucket, replace=False, on_saved=None):
+        # on_saved(day) runs once each day's sketch is stored
+        with self._lock:
+            counts, posts = self.counts, self.posts
+            self.counts, self.posts = {}, Counter()
+        for day in sorted(counts):
+            save_day(s3, bucket, day, PhraseSketch.from_counts(counts[day], posts[day]), replace)
+            if on_saved:
+                on_saved(day)
+        return len(counts)
@@ -0,0 +1,112 @@
+import queue
+import threading
+import types
+
+# Minimal staged pipeline: each stage has its own worker pool and a bounded
+# queue in front of it, so slow network calls in one stage overlap with work in
+# the others. A stage function takes one item and returns the item for the next
+# stage, or None to drop it. A stage that splits its input (e.g. one file into
+# several batches) can be a generator; its items are handed on as they are
+# produced, so the bounded queue downstream also bounds what it holds.
+
+_STOP = object()
+
+
+class ByteBudget:
+    # Global bound on bytes held in flight across all stages
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size):
+        with self._cond:
+            # A single item larger than the limit may still run on its own
+            while self.used and self.used + size > self.limit:
+                self._cond.wait()
+            self.used += size
+
+    def release(self, size):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=8):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._running = workers
+
+    def _count(self, ok):
+        with self._lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.errors += 1
+
+    def _finish_worker(self):
+        # The last worker out tells the next stage there is nothing more coming
+        with self._lock:
+            self._running -= 1
+            return self._running == 0
+
+
+def _run_worker(stage, next_stage, on_drop):
+    while True:
+        item = stage.queue.get()
+        if item is _STOP:
+            break
+        try:
+            result = stage.func(item)
+            if isinstance(result, types.GeneratorType):
+                for produced in result:
+                    if next_stage is not None:
+                        next_stage.queue.put(produced)
+                result = None
+            stage._count(True)
+        except Exception as e:
+            print(f"Error in {stage.name} stage: {str(e)}")
+            stage._count(False)
+            if on_drop:
+                on_drop(item)
+            continue
+        if result is not None and next_stage is not None:
+            next_stage.queue.put(result)
+
+    if stage._finish_worker() and next_stage is not None:
+        for _ in range(next_stage.workers):
+            next_stage.queue.put(_STOP)
+
+
+def run_pipeline(source, stages, should_stop=None, on_drop=None):
+    # Feeds items from source into the first stage until it is exhausted or
+    # should_stop() says to stop admitting work, then drains every stage.
+    # Returns the number of source items that were admitted.
+    threads = []
+    for index, stage in enumerate(stages):
+        next_stage = stages[index + 1] if index + 1 < len(stages) else None
+        for _ in range(stage.workers):
+            thread = threading.Thread(target=_run_worker, args=(stage, next_stage, on_drop), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    admitted = 0
+    for item in source:
+        if should_stop and should_stop():
+            break
+        stages[0].queue.put(item)
+        admitted += 1
+
+    for _ in range(stages[0].workers):
+        stages[0].queue.put(_STOP)
+    for thread in threads:
+        thread.join()
+
+    return admitted
@@ -0,0 +1,95 @@
+from decimal import Decimal
+from datetime import datetime, timezone
+
+# Hourly per-subreddit rollups in SubredditHourlyRollups, kept up to date at
+# write time so the dashboards read a few hundred rows instead of every post.
+#   subreddit (partition key), hour (sort key, epoch seconds of the UTC hour)
+#   day                                      - UTC day, for the time range index
+#   posts, score_sum, comments_sum           - ADD counters
+#   positive_sum, neutral_sum, negative_sum, compound_sum
+#   top_score / top_score_post               - highest scoring post of the hour
+#   top_comments / top_comments_post         - most commented post of the hour
+#
+# Counters are only ever ADDed to: a new post adds itself, a changed post adds
+# the difference from the RedditPosts item it replaces. The ADD and the post
+# write are one transaction, so either both land or neither does: a retried
+# file re-applies a lost delta and never counts anything twice.
+
+ROLLUP_INDEX = 'day-hour-index'
+DAY_FORMAT = '%Y-%m-%d'
+
+# RedditPosts attribute -> rollup counter
+SUMMED_FIELDS = {
+    'score': 'score_sum',
+    'num_comments': 'comments_sum',
+    'positive_sentiment': 'positive_sum',
+    'neutral_sentiment': 'neutral_sum',
+    'negative_sentiment': 'negative_sum',
+    'compound_sentiment': 'compound_sum',
+}
+
+# Post attributes kept for the top post of each hour
+LEADER_FIELDS = ('title', 'score', 'num_comments', 'compound_sentiment', 'url')
+
+
+def hour_bucket(created_utc):
+    return int(Decimal(str(created_utc))) // 3600 * 3600
+
+
+def rollup_key(item):
+    return {'subreddit': item['subreddit'], 'hour': hour_bucket(item['created_utc'])}
+
+
+def rollup_args(item, old):
+    # UpdateItem arguments adding item to its hour, given the RedditPosts item
+    # it replaces ({} for a new post)
+    hour = hour_bucket(item['created_utc'])
+    new_post = not old
+    names = {'#day': 'day'}
+    values = {':day': datetime.fromtimestamp(hour, tz=timezone.utc).strftime(DAY_FORMAT)}
+    additions = []
+
+    if new_post:
+        names['#posts'] = 'posts'
+        values[':posts'] = 1
+        additions.append('#posts :posts')
+    for index, (field, counter) in enumerate(SUMMED_FIELDS.items()):
+        delta = Decimal(str(item[field])) - (0 if new_post else Decimal(str(old.get(field, item[field]))))
+        if not new_post and delta == 0:
+            continue
+        names[f"#s{index}"] = counter
+        values[f":s{index}"] = delta
+        additions.append(f"#s{index} :s{index}")
+
+    expression = 'SET #day = if_not_exists(#day, :day)'
+    if additions:
+        expression += ' ADD ' + ', '.join(additions)
+    return {
+        'Key': rollup_key(item),
+        'UpdateExpression': expression,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+    }
+
+
+def leader_args(item, field, name):
+    # Replaces the hour's top post for field only if item beats it
+    return {
+        'Key': rollup_key(item),
+        'UpdateExpression': 'SET #top = :value, #post = :post',
+        'ConditionExpression': 'attribute_not_exists(#top) OR #top < :value OR #post.#title = :title',
+        'ExpressionAttributeNames': {'#top': f"top_{name}", '#post': f"top_{name}_post", '#title': 'title'},
+        'ExpressionAttributeValues': {
+            ':value': item[field],
+            ':title': item['title'],
+            ':post': {key: item[key] for key in LEADER_FIELDS},
+        },
+    }
+
+
+def record_leaders(table, item):
+    for field, name in (('score', 'score'), ('num_comments', 'comments')):
+        try:
+            table.update_item(**leader_args(item, field, name))
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass  # Another post of this hour is ahead
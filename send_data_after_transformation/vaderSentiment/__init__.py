@@ -0,0 +1 @@
+#!/usr/bin/python
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'visualization'))
+
+import pandas as pd
+import data_layer
+import query_planner
+
+DAY = 24 * 3600
+
+
+class LoadTest(unittest.TestCase):
+    def setUp(self):
+        layer = mock.Mock()
+        layer.planner_state.return_value = {
+            "mirror_enabled": False, "mirror_ready": False, "posts_loaded": True,
+            "rollups_loaded": False, "archive_covered": False,
+        }
+        posts = pd.DataFrame({"title": [f"p{i}" for i in range(48)], "subreddit": "cats"})
+        for patch in (
+            mock.patch.object(data_layer, "get_data_layer", return_value=layer),
+            mock.patch.object(data_layer, "MIRROR_ENABLED", False),
+            mock.patch.object(data_layer.st, "session_state", {}),
+            mock.patch.dict(data_layer.LOADERS, {("posts", "index"): lambda seconds, filters: posts}),
+            mock.patch.dict(query_planner._rates, {"posts": 100.0}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_posts_load_updates_the_rate(self):
+        # load_posts passes {"subreddit": None}, which is no filter
+        data_layer.load_posts(DAY)
+        self.assertAlmostEqual(query_planner._rates["posts"], 100 + query_planner.RATE_SMOOTHING * (2 - 100))
+
+    def test_filtered_load_leaves_the_rate(self):
+        data_layer.load_posts(DAY, subreddit="cats")
+        self.assertEqual(query_planner._rates["posts"], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
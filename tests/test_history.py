@@ -0,0 +1,35 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'send_data_after_transformation'))
+
+from history import decode_trajectory, snapshot_args
+
+
+def post(ts, score, comments):
+    return {'title': 'A', 'subreddit': 's', 'created_utc': 1700000000, 'updated_at': ts, 'score': score, 'num_comments': comments}
+
+
+class SnapshotArgsTest(unittest.TestCase):
+    def test_new_post_starts_the_history(self):
+        args = snapshot_args('abc', post(1000, 5, 1), {})
+        self.assertIn('#base_score = if_not_exists(#base_score, :score)', args['UpdateExpression'])
+        self.assertNotIn(':d_score', args['ExpressionAttributeValues'])
+
+    def test_only_the_score_changed(self):
+        # The stored item has no num_comments
+        args = snapshot_args('abc', post(1300, 12, 1), {'updated_at': 1000, 'score': 5})
+        values = args['ExpressionAttributeValues']
+        self.assertEqual(values[':d_ts'], [300])
+        self.assertEqual(values[':d_score'], [7])
+        self.assertEqual(values[':d_comments'], [0])
+        self.assertEqual(values[':old_comments'], 1)
+
+    def test_trajectory_from_deltas(self):
+        item = {'base_ts': 1000, 'base_score': 5, 'base_comments': 1, 'd_ts': [300], 'd_score': [7], 'd_comments': [0]}
+        self.assertEqual(decode_trajectory(item), [(1000, 5, 1), (1300, 12, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'visualization'))
+
+import sqlite_mirror
+from stream_view import StreamConsumer
+
+STREAM_ARN = "arn:aws:dynamodb:us-east-2:123456789012:table/RedditPosts/stream/2025-01-01T00:00:00.000"
+TTL = {"type": "Service", "principalId": "dynamodb.amazonaws.com"}
+
+
+def record(event, sequence_number, title, score=None, identity=None):
+    change = {
+        "SequenceNumber": str(sequence_number),
+        "Keys": {"title": {"S": title}, "created_utc": {"N": "1735689600"}},
+    }
+    if score is not None:
+        change["NewImage"] = dict(change["Keys"], subreddit={"S": "cats"}, score={"N": str(score)})
+    result = {"eventName": event, "dynamodb": change}
+    if identity:
+        result["userIdentity"] = identity
+    return result
+
+
+class FakeStreams:
+    # Replays recorded shards; a closed shard ends its iterator after the last record
+    def __init__(self, shards):
+        self.shards = shards  # shard id -> {"parent", "closed", "records"}
+        self.iterator_requests = []
+
+    def describe_stream(self, StreamArn, **kwargs):
+        shards = [{"ShardId": shard_id, **({"ParentShardId": shard["parent"]} if shard["parent"] else {})}
+                  for shard_id, shard in self.shards.items()]
+        return {"StreamDescription": {"StreamArn": StreamArn, "Shards": shards}}
+
+    def get_shard_iterator(self, StreamArn, ShardId, ShardIteratorType, SequenceNumber=None):
+        self.iterator_requests.append((ShardId, ShardIteratorType, SequenceNumber))
+        position = 0
+        if ShardIteratorType == "AFTER_SEQUENCE_NUMBER":
+            numbers = [r["dynamodb"]["SequenceNumber"] for r in self.shards[ShardId]["records"]]
+            position = numbers.index(SequenceNumber) + 1
+        return {"ShardIterator": f"{ShardId}|{position}"}
+
+    def get_records(self, ShardIterator, Limit):
+        shard_id, position = ShardIterator.split("|")
+        shard, position = self.shards[shard_id], int(position)
+        records = shard["records"][position:position + Limit]
+        position += len(records)
+        done = shard["closed"] and position >= len(shard["records"])
+        return {"Records": records, **({} if done else {"NextShardIterator": f"{shard_id}|{position}"})}
+
+
+class StreamConsumerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "mirror.db")
+        self.synced = []
+        self.streams = FakeStreams({
+            "shard-parent": {"parent": None, "closed": True, "records": [
+                record("INSERT", 100, "A", 1),
+                record("INSERT", 101, "B", 2),
+                record("MODIFY", 102, "A", 5),
+            ]},
+            "shard-child": {"parent": "shard-parent", "closed": False, "records": [
+                record("REMOVE", 200, "B"),
+                record("INSERT", 201, "C", 3),
+                record("REMOVE", 202, "A", identity=TTL),
+            ]},
+        })
+
+    def consumer(self):
+        consumer = StreamConsumer(self.path, tables=(sqlite_mirror.POSTS_TABLE,), streams=self.streams,
+                                  stream_arns={sqlite_mirror.POSTS_TABLE: STREAM_ARN},
+                                  initial_sync=self.synced.append)
+        self.addCleanup(consumer.conn.close)
+        return consumer
+
+    def posts(self, consumer):
+        return consumer.conn.execute("SELECT title, score FROM posts ORDER BY title").fetchall()
+
+    def checkpoints(self, consumer):
+        return consumer.conn.execute(
+            "SELECT shard_id, sequence_number, finished FROM stream_shards ORDER BY shard_id"
+        ).fetchall()
+
+    def test_replays_parent_then_child(self):
+        consumer = self.consumer()
+        self.assertEqual(consumer.poll(), 6)
+        self.assertEqual(self.synced, [self.path])
+        # B was deleted; A expired to the cold tier, so the view keeps its last image
+        self.assertEqual(self.posts(consumer), [("A", 5.0), ("C", 3.0)])
+        self.assertEqual(self.checkpoints(consumer), [("shard-child", "202", 0), ("shard-parent", "102", 1)])
+
+    def test_restart_resumes_after_the_checkpoint(self):
+        self.consumer().poll()
+        self.streams.shards["shard-child"]["records"].append(record("MODIFY", 203, "C", 9))
+        self.streams.iterator_requests.clear()
+
+        consumer = self.consumer()
+        self.assertEqual(consumer.poll(), 1)
+        self.assertEqual(self.synced, [self.path])  # No second initial sync
+        self.assertEqual(self.streams.iterator_requests, [("shard-child", "AFTER_SEQUENCE_NUMBER", "202")])
+        self.assertEqual(self.posts(consumer), [("A", 5.0), ("C", 9.0)])
+        self.assertEqual(self.checkpoints(consumer), [("shard-child", "203", 0), ("shard-parent", "102", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
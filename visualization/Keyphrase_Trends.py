@@ -1,37 +1,16 @@
 import streamlit as st
-import boto3
 import pandas as pd
 from collections import Counter
-from decimal import Decimal
+from data_layer import load_top_phrases, load_phrase_posts, show_data_status, show_query_plans
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 
 # Page setup
 st.set_page_config(page_title="Key Phrase Trends", layout="wide")
 st.title("🔑 Key Phrase Trends")
+show_data_status()
 
-# Connect to DynamoDB (NoSQL Sever) to extract data
-dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
-table = dynamodb.Table("KeyPhraseIdentificationTableV2")
-
-@st.cache_data(ttl=300)
-def fetch_keyphrase_data():
-    response = table.scan()
-    items = response.get("Items", [])
-    for item in items:
-        for key, value in item.items():
-            if isinstance(value, Decimal):
-                item[key] = float(value)
-    return pd.DataFrame(items)
-
-# Load data
-df = fetch_keyphrase_data()
-if df.empty:
-    st.warning("No data available.")
-    st.stop()
-
-# Convert to datetime
-df["created_utc"] = pd.to_datetime(df["created_utc"], unit="s")
+CANDIDATE_PHRASES = 200  # Heaviest phrases offered in the picker
 
 # Timeframe filter and Phrase selection inline
 st.markdown("<style>.stColumns { align-items: end; }</style>", unsafe_allow_html=True)
@@ -45,20 +24,18 @@ with col1:
         "Last 90 Days": pd.Timedelta(days=90)
     }
     selected_time = st.selectbox("Select Time Range", list(time_options.keys()), index=1)
-now = pd.Timestamp.utcnow().replace(tzinfo=None)
-df = df[df["created_utc"] >= now - time_options[selected_time]]
+seconds = time_options[selected_time].total_seconds()
 
-st.markdown(f"**{len(df)} records** in selected time range.")
+# Load estimated phrase counts
+candidates, post_count = load_top_phrases(seconds, CANDIDATE_PHRASES)
+if not candidates:
+    st.warning("No data available.")
+    st.stop()
 
-# Extract and count phrases
-phrases = []
-for row in df["key_phrases"]:
-    if isinstance(row, list):
-        phrases.extend(row)
+st.markdown(f"**{post_count} records** in selected time range.")
 
-phrase_counts = Counter(phrases)
-top_phrases = [phrase for phrase, _ in phrase_counts.most_common(5)]
-phrase_counts_dict = dict(Counter(phrases))
+top_phrases = [phrase for phrase, _ in candidates[:5]]
+phrase_counts_dict = dict(candidates)
 
 # Map display labels
 display_to_actual = {f"{p} ({phrase_counts_dict[p]})": p for p in sorted(phrase_counts_dict)}
@@ -75,6 +52,15 @@ if not selected_phrases:
     st.info("Please select at least one key phrase to display.")
     st.stop()
 
+# Exact counts, from just the posts mentioning the selected phrases
+df = load_phrase_posts(seconds, tuple(sorted(selected_phrases)))
+if df.empty:
+    st.info("No posts found for the selected key phrases.")
+    st.stop()
+
+# Convert to datetime
+df["created_utc"] = pd.to_datetime(df["created_utc"], unit="s")
+
 # Prepare and filter data
 df["count"] = 1
 df_expanded = df.explode("key_phrases")
@@ -98,4 +84,6 @@ st.pyplot(fig)
 
 # Table posts
 st.subheader("📝 Posts Containing Selected Key Phrases")
-st.dataframe(df_filtered[["title", "key_phrases", "sentiment", "created_utc"]].sort_values("created_utc", ascending=False))
\ No newline at end of file
+st.dataframe(df_filtered[["title", "key_phrases", "sentiment", "created_utc"]].sort_values("created_utc", ascending=False))
+
+show_query_plans()
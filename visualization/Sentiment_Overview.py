@@ -1,66 +1,45 @@
 import streamlit as st
-import boto3
 import pandas as pd
 import matplotlib.pyplot as plt
-from decimal import Decimal
+from data_layer import load_posts, subreddit_stats, show_data_status, show_query_plans
 
 # Set Streamlit page config
 st.set_page_config(page_title="Reddit Sentiment Dashboard", layout="wide")
 
 # Title
 st.title("📊 Reddit Sentiment Dashboard (DynamoDB)")
+show_data_status()
 
-# Initialize DynamoDB resource
-dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
-table = dynamodb.Table("RedditPosts")
+# === Time Range Filter ===
+time_options = {
+    "Last 4 Hours": pd.Timedelta(hours=4),
+    "Last 24 Hours": pd.Timedelta(days=1),
+    "Last 7 Days": pd.Timedelta(days=7),
+    "Last 30 Days": pd.Timedelta(days=30),
+    "All Time": None
+}
 
-# Fetch all items from the table
-@st.cache_data(ttl=300)
-def fetch_data():
-    response = table.scan()
-    items = response.get("Items", [])
+default_index = list(time_options.keys()).index("Last 7 Days")
+selected_timeframe = st.selectbox("Select Time Range", list(time_options.keys()), index=default_index)
 
-    # Convert Decimal to float
-    for item in items:
-        for key, value in item.items():
-            if isinstance(value, Decimal):
-                item[key] = float(value)
-
-    return pd.DataFrame(items)
-
-# Load data
-df = fetch_data()
+# Load data: per-subreddit counts and sentiment averages (see data_layer.py)
+window = time_options[selected_timeframe]
+seconds = window.total_seconds() if window is not None else None
+stats = subreddit_stats(seconds)
 
 # Check if there's data
-if df.empty:
+if stats.empty:
     st.warning("No data found in the table.")
 else:
-    # Convert created_utc to datetime
-    df["created_utc"] = pd.to_datetime(df["created_utc"], unit="s")
-
-    # === Time Range Filter ===
-    time_options = {
-        "Last 4 Hours": pd.Timedelta(hours=4),
-        "Last 24 Hours": pd.Timedelta(days=1),
-        "Last 7 Days": pd.Timedelta(days=7),
-        "Last 30 Days": pd.Timedelta(days=30),
-        "All Time": None
-    }
-
-    default_index = list(time_options.keys()).index("Last 7 Days")
-    selected_timeframe = st.selectbox("Select Time Range", list(time_options.keys()), index=default_index)
-
-    now = pd.Timestamp.utcnow().replace(tzinfo=None)
-    if time_options[selected_timeframe] is not None:
-        df = df[df["created_utc"] >= now - time_options[selected_timeframe]]
-
-    st.markdown(f"**{len(df)} posts** in selected time range.")
+    total_posts = int(stats["posts"].sum())
+    st.markdown(f"**{total_posts} posts** in selected time range.")
 
     # Sentiment Overview Chart
     st.subheader("Sentiment Overview")
 
     fig, ax = plt.subplots(figsize=(10, 5))
-    sentiment_means = df[["positive_sentiment", "neutral_sentiment", "negative_sentiment"]].mean()
+    sentiment_columns = ["positive_sentiment", "neutral_sentiment", "negative_sentiment"]
+    sentiment_means = stats[sentiment_columns].mul(stats["posts"], axis=0).sum() / total_posts
     sentiment_means.index = ["Positive", "Neutral", "Negative"]
     sentiment_means.plot(kind="bar", ax=ax, color=["green", "royalblue", "red"])
     ax.set_title("Average Sentiment Scores")
@@ -68,14 +47,14 @@ else:
     ax.set_xticklabels(ax.get_xticklabels(), rotation=20)
     st.pyplot(fig)
 
-    subreddits = sorted(df["subreddit"].unique())
+    subreddits = sorted(stats.index)
     subreddits.insert(0, "All")  # Add "All" to the top
 
     selected_sub = st.selectbox("Choose a Subreddit", subreddits, index=0)
 
-    if selected_sub != "All":
-        filtered_df = df[df["subreddit"] == selected_sub]
-    else:
-        filtered_df = df
+    # Individual posts, only needed for the post table
+    filtered_df = load_posts(seconds, None if selected_sub == "All" else selected_sub)
     st.markdown(f"**{len(filtered_df)} posts from r/{selected_sub}**")
     st.dataframe(filtered_df[["title", "score", "num_comments", "compound_sentiment"]])
+
+show_query_plans()
@@ -1,8 +1,5 @@
 import streamlit as st
-import boto3
-import pandas as pd
-from decimal import Decimal
-from collections import Counter
+from data_layer import load_top_phrases, subreddit_stats, top_posts, show_data_status, show_query_plans
 import requests
 import time
 import os
@@ -53,60 +50,27 @@ title_map = {
 }
 
 st.subheader(title_map[timeframe])
+show_data_status()
 
-# Connect to DynamoDB (NoSQL Sever) to extract data
-dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
-post_table = dynamodb.Table("RedditPosts")
-phrase_table = dynamodb.Table("KeyPhraseIdentificationTableV2")
-
-@st.cache_data(ttl=300)
-def fetch_data():
-    post_resp = post_table.scan()
-    phrase_resp = phrase_table.scan()
-
-    post_items = post_resp.get("Items", [])
-    phrase_items = phrase_resp.get("Items", [])
-
-    for item in post_items:
-        for k, v in item.items():
-            if isinstance(v, Decimal):
-                item[k] = float(v)
-    for item in phrase_items:
-        for k, v in item.items():
-            if isinstance(v, Decimal):
-                item[k] = float(v)
-
-    post_df = pd.DataFrame(post_items)
-    phrase_df = pd.DataFrame(phrase_items)
-
-    if not post_df.empty:
-        post_df["created_utc"] = pd.to_datetime(post_df["created_utc"], unit="s")
-    if not phrase_df.empty:
-        phrase_df["created_utc"] = pd.to_datetime(phrase_df["created_utc"], unit="s")
-
-    return post_df, phrase_df
-
-# Load data
-post_df, phrase_df = fetch_data()
-if post_df.empty or phrase_df.empty:
+days = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90}[timeframe]
+
+# Load data: per-subreddit figures and the top key phrases (see data_layer.py)
+seconds = days * 86400
+stats_by_subreddit = subreddit_stats(seconds)
+phrase_counts, _ = load_top_phrases(seconds, 10)
+if stats_by_subreddit.empty or not phrase_counts:
     st.warning("Not enough data available to summarize.")
     st.stop()
 
-days = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90}[timeframe]
 summary_type = {7: "weekly", 30: "monthly", 90: "quarterly"}.get(days, "summary")
 period_noun = {"weekly": "this week", "monthly": "this month", "quarterly": "this quarter"}[summary_type]
 
-cutoff = (pd.Timestamp.utcnow() - pd.Timedelta(days=days)).replace(tzinfo=None)
-
-filtered_posts = post_df[post_df["created_utc"] >= cutoff]
-filtered_phrases = phrase_df[phrase_df["created_utc"] >= cutoff]
-
 # Top subreddits
-top_subs = filtered_posts["subreddit"].value_counts().head(5).to_dict()
+top_subs = stats_by_subreddit["posts"].sort_values(ascending=False).head(5).to_dict()
 top_subs_str = ", ".join([f"r/{sub} ({count} posts)" for sub, count in top_subs.items()])
 
 # Sentiment breakdown
-sentiment_summary = filtered_posts.groupby("subreddit")[["positive_sentiment", "neutral_sentiment", "negative_sentiment"]].mean()
+sentiment_summary = stats_by_subreddit[["positive_sentiment", "neutral_sentiment", "negative_sentiment"]]
 sentiment_lines = [
     f"r/{sub}: \ud83d\udc4d {row['positive_sentiment']:.2f}, \ud83d\ude10 {row['neutral_sentiment']:.2f}, \ud83d\udc4e {row['negative_sentiment']:.2f}"
     for sub, row in sentiment_summary.iterrows()
@@ -114,20 +78,20 @@ sentiment_lines = [
 sentiment_str = "\n".join(sentiment_lines)
 
 # Top key phrases
-all_phrases = []
-for row in filtered_phrases["key_phrases"]:
-    if isinstance(row, list):
-        all_phrases.extend(row)
-phrase_counts = Counter(all_phrases)
-top_phrases = [f"{p} ({c})" for p, c in phrase_counts.most_common(10)]
+top_phrases = [f"{p} ({c})" for p, c in phrase_counts]
 top_phrases_str = ", ".join(top_phrases)
 
-# Top post by comments
-top_comment_post = filtered_posts.loc[filtered_posts["num_comments"].idxmax()]
+# Top posts by comments and by score
+top_by_comments = top_posts(seconds, "num_comments", 1)
+top_by_score = top_posts(seconds, "score", 1)
+if top_by_comments.empty or top_by_score.empty:
+    st.info("No posts found for this time range.")
+    st.stop()
+
+top_comment_post = top_by_comments.iloc[0]
 top_comment_line = f"The post with the most comments was from r/{top_comment_post['subreddit']}, discussing {top_comment_post['title']}, which garnered {int(top_comment_post['num_comments'])} comments."
 
-# Top post by score
-top_score_post = filtered_posts.loc[filtered_posts["score"].idxmax()]
+top_score_post = top_by_score.iloc[0]
 top_score_line = f"A post from r/{top_score_post['subreddit']} about {top_score_post['title']} reached {int(top_score_post['score'])} upvotes."
 
 # Prompt for GPT4
@@ -182,3 +146,5 @@ if st.button("🔁 Regenerate Summary"):
     st.rerun()
 
 st.markdown("✨ Powered by [OpenAI GPT-4o-mini](https://platform.openai.com/)")
+
+show_query_plans()
@@ -0,0 +1,124 @@
+import os
+import time
+import boto3
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from colarchive import ColumnarArchive
+from dynamo_loader import REGION, day_buckets
+
+# Reads scored posts back out of the columnar archives the compact Lambda
+# writes (archive/columnar/<day>/reddit_sentiment_<period>.rcol, with
+# COLUMNAR_ARCHIVES on). Each archive is opened with a suffix GET for its
+# footer, chunks outside the time range are skipped, and only the needed
+# columns are fetched with byte-range GETs.
+#
+# Archives hold every processed snapshot of a post, filed under the hour it
+# was processed, so a post shows up in several of them and only after it was
+# created. The newest snapshot of each post wins.
+#
+# The cold tier (archive/cold/posts/<day>/, written by the compact Lambda) is
+# different: one partition per day of post creation, holding the final
+# RedditPosts items that were then expired from the table. with_cold() adds it
+# under whatever DynamoDB returned for ranges that reach past the hot horizon.
+
+BUCKET_NAME = "reddit-sentiment-dashboard-2025"
+COLUMNAR_PREFIX = "archive/columnar/"
+COLD_PREFIX = "archive/cold/posts/"
+READ_WORKERS = int(os.environ.get("ARCHIVE_READ_WORKERS", "16"))
+
+# Must match the compact Lambda's COLD_AFTER_DAYS; shorter ranges never read the cold tier
+COLD_AFTER_SECONDS = int(os.environ.get("COLD_AFTER_DAYS", "120")) * 86400
+
+# Posts keep being processed again for this long after they are created
+SNAPSHOT_DAYS = int(os.environ.get("DATA_RECHECK_HOURS", "48")) // 24 + 1
+
+# Archive column -> RedditPosts attribute
+ARCHIVE_COLUMNS = {
+    "title": "title",
+    "created_utc": "created_utc",
+    "subreddit": "subreddit",
+    "score": "score",
+    "num_comments": "num_comments",
+    "url": "url",
+    "pos": "positive_sentiment",
+    "neu": "neutral_sentiment",
+    "neg": "negative_sentiment",
+    "compound": "compound_sentiment",
+}
+
+s3 = boto3.client("s3", region_name=REGION)
+
+
+def list_keys(prefix):
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"].endswith(".rcol"))
+    return keys
+
+
+def archived_days():
+    # Days with at least one columnar archive, from a delimited listing
+    days = set()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=COLUMNAR_PREFIX, Delimiter="/"):
+        days.update(prefix["Prefix"][len(COLUMNAR_PREFIX):-1] for prefix in page.get("CommonPrefixes", []))
+    return days
+
+
+def archive_keys(start_utc=None, end_utc=None):
+    # Archives that can hold posts created in the range, oldest first
+    if start_utc is None:
+        return sorted(list_keys(COLUMNAR_PREFIX))
+    days = day_buckets(start_utc, end_utc + SNAPSHOT_DAYS * 86400)
+    with ThreadPoolExecutor(max_workers=max(1, min(READ_WORKERS, len(days)))) as pool:
+        parts = pool.map(lambda day: list_keys(f"{COLUMNAR_PREFIX}{day}/"), days)
+        return sorted(key for part in parts for key in part)
+
+
+def read_archive(key, columns, start_utc, end_utc):
+    archive = ColumnarArchive.open_s3(s3, BUCKET_NAME, key)
+    wanted = [column for column in columns if column in archive.columns]
+    return pd.DataFrame(archive.read(wanted, start_utc, end_utc))
+
+
+def load_archived(columns, start_utc=None, end_utc=None, keys=None):
+    # Posts created in [start_utc, end_utc], renamed to the RedditPosts attributes
+    wanted = [source for source, name in ARCHIVE_COLUMNS.items() if name in columns or source == "title"]
+    keys = keys if keys is not None else archive_keys(start_utc, end_utc)
+    if not keys:
+        return pd.DataFrame(columns=columns)
+    with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(keys))) as pool:
+        frames = list(pool.map(lambda key: read_archive(key, wanted, start_utc, end_utc), keys))
+    frame = pd.concat(frames, ignore_index=True).rename(columns=ARCHIVE_COLUMNS)
+    # Keys sort by processing time, so the last copy of a post is its newest
+    frame = frame.drop_duplicates(["title", "created_utc"], keep="last")
+    print(f"🗄️ Archive: {len(frame):,} posts from {len(keys):,} file(s)")
+    return frame.reindex(columns=columns).reset_index(drop=True)
+
+
+def load_cold(columns, start_utc=None):
+    # Expired posts created from start_utc on (None: all of them)
+    keys = list_keys(COLD_PREFIX)
+    if start_utc is not None:
+        first = day_buckets(start_utc, start_utc)[0]
+        keys = [key for key in keys if key[len(COLD_PREFIX):len(COLD_PREFIX) + 10] >= first]
+    if not keys:
+        return pd.DataFrame(columns=columns)
+    with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(keys))) as pool:
+        frames = list(pool.map(lambda key: read_archive(key, columns, start_utc, None), keys))
+    print(f"🧊 Cold tier: {sum(len(f) for f in frames):,} posts from {len(keys):,} partition(s)")
+    return pd.concat(frames, ignore_index=True).reindex(columns=columns)
+
+
+def reaches_cold(start_utc):
+    return start_utc is None or start_utc < time.time() - COLD_AFTER_SECONDS
+
+
+def with_cold(hot, columns, start_utc=None):
+    # hot plus the cold tier's posts in range; a post still in the table wins
+    if not reaches_cold(start_utc):
+        return hot
+    cold = load_cold(columns, start_utc)
+    if cold.empty:
+        return hot
+    frame = pd.concat([cold, hot], ignore_index=True) if not hot.empty else cold
+    return frame.drop_duplicates(["title", "created_utc"], keep="last").reset_index(drop=True)
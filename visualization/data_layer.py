@@ -0,0 +1,543 @@
+import os
+import time
+import threading
+import boto3
+import pandas as pd
+import streamlit as st
+from functools import reduce
+from collections import OrderedDict, deque
+from boto3.dynamodb.conditions import Attr
+from dynamo_loader import (REGION, TIME_INDEX, ROLLUP_TABLE, ROLLUP_INDEX, ROLLUP_COLUMNS,
+                           load_table, load_range, day_buckets)
+from phrase_sketch import load_merged
+import sqlite_mirror
+import stream_view
+import archive_loader
+import query_planner
+
+# Data access for every dashboard page. One process-wide store (shared by all
+# sessions through st.cache_resource) can keep RedditPosts and the hourly
+# rollups in memory as pandas frames. The first read loads a table in full; after that
+# a refresh only queries the time index from the newest created_utc it holds
+# (the watermark) minus a re-check window, and swaps that slice of the frame
+# for what came back. Posts keep getting new scores and comment counts for a
+# while after they are created; the re-check window is how long that lasts.
+#
+# Every cached value sits behind a single-flight stale-while-revalidate
+# Refresher: once a value is older than DATA_REFRESH_SECONDS the next read
+# starts one background refresh and every session keeps getting the last good
+# value until it lands. Only the very first load of a value makes callers wait.
+#
+# Pages ask for data with load(metric, time_range, filters), and
+# query_planner.py picks the cheapest source for it: SQL on the local SQLite
+# mirror (DASHBOARD_MIRROR, the default; the same kind of background refresh
+# keeps it in sync), the hourly rollups and phrase sketches, a time index
+# Query or the in-memory snapshots, or the columnar archives
+# (DASHBOARD_ARCHIVE). Every plan is logged with its latency. Posts that were
+# moved out of RedditPosts to the cold tier are added back to any posts load
+# whose range reaches back that far (see archive_loader.with_cold). With DASHBOARD_STREAM
+# set the mirror follows the tables' DynamoDB Streams instead (see
+# stream_view.py), polled every STREAM_POLL_SECONDS rather than re-read.
+
+BUCKET_NAME = "reddit-sentiment-dashboard-2025"
+
+POSTS_TABLE = "RedditPosts"
+POST_COLUMNS = ["title", "created_utc", "subreddit", "score", "num_comments",
+                "positive_sentiment", "neutral_sentiment", "negative_sentiment", "compound_sentiment"]
+PHRASES_TABLE = "KeyPhraseIdentificationTableV2"
+PHRASE_COLUMNS = ["title", "created_utc", "key_phrases", "sentiment"]
+
+REFRESH_SECONDS = int(os.environ.get("DATA_REFRESH_SECONDS", "300"))
+RECHECK_SECONDS = int(os.environ.get("DATA_RECHECK_HOURS", "48")) * 3600
+RETRY_SECONDS = 30  # Wait after a failed refresh before trying again
+MAX_KEYED_VALUES = 64  # Per-argument values (phrase queries etc.) kept around
+MAX_PLANS = 200  # Recent query plans kept for status
+MIRROR_ENABLED = os.environ.get("DASHBOARD_MIRROR", "true").lower() == "true"
+ARCHIVE_ENABLED = os.environ.get("DASHBOARD_ARCHIVE", "false").lower() == "true"
+STREAM_ENABLED = MIRROR_ENABLED and os.environ.get("DASHBOARD_STREAM", "false").lower() == "true"
+
+SENTIMENTS = ["positive_sentiment", "neutral_sentiment", "negative_sentiment", "compound_sentiment"]
+
+
+class Refresher:
+    # Single-flight stale-while-revalidate around load(previous value)
+    def __init__(self, name, load, max_age=REFRESH_SECONDS):
+        self.name = name
+        self.load = load
+        self.max_age = max_age
+        self.value = None
+        self.loaded = False
+        self.refreshed_at = None
+        self.duration = None
+        self.error = None
+        self.failed_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+
+    def age(self):
+        return time.time() - self.refreshed_at if self.refreshed_at is not None else None
+
+    def get(self):
+        with self._lock:
+            if self.loaded:
+                if self.age() >= self.max_age:
+                    self._start()
+                return self.value
+            # Nothing to serve yet: join the load in flight (or start it)
+            self._start(force=True)
+            while self._thread is not None:
+                self._done.wait()
+            if not self.loaded:
+                raise RuntimeError(f"Could not load {self.name}: {self.error}")
+            return self.value
+
+    def refresh(self, wait=False):
+        # Manual refresh; returns at once unless wait is set
+        with self._lock:
+            self._start(force=True)
+            while wait and self._thread is not None:
+                self._done.wait()
+
+    def status(self):
+        return {
+            "name": self.name,
+            "age_seconds": self.age(),
+            "duration_seconds": self.duration,
+            "refreshing": self._thread is not None,
+            "error": str(self.error) if self.error else None,
+        }
+
+    def _start(self, force=False):
+        # Caller holds the lock; at most one refresh runs at a time
+        if self._thread is not None:
+            return
+        if not force and self.failed_at is not None and time.time() - self.failed_at < RETRY_SECONDS:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"refresh-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        started = time.monotonic()
+        try:
+            value, error = self.load(self.value), None
+        except Exception as e:
+            value, error = None, e
+            print(f"⚠️ Refreshing {self.name} failed, still serving the previous data: {str(e)}")
+        with self._lock:
+            if error is None:
+                self.value, self.loaded, self.refreshed_at, self.failed_at = value, True, time.time(), None
+            else:
+                self.failed_at = time.time()
+            self.error = error
+            self.duration = time.monotonic() - started
+            self._thread = None
+            self._done.notify_all()
+
+
+class TableSnapshot:
+    # In-memory copy of one table, refreshed from its (day, time_column) index
+    def __init__(self, table_name, columns, time_column, index, cold=False):
+        self.table_name = table_name
+        self.columns = columns
+        self.time_column = time_column
+        self.index = index
+        self.cold = cold  # Also holds the posts moved to the cold tier
+        self.refresher = Refresher(table_name, self.load)
+
+    def load(self, frame):
+        # The next version of the frame, given the current one (None at first)
+        if frame is None or frame.empty:
+            frame = load_range(self.table_name, self.columns)
+            if self.cold:
+                frame = archive_loader.with_cold(frame, self.columns)
+            print(f"📥 {self.table_name}: loaded {len(frame):,} rows")
+            return frame
+
+        # Replace everything from the re-check start on; rows before it are settled
+        since = float(frame[self.time_column].max()) - RECHECK_SECONDS
+        fresh = load_range(self.table_name, self.columns, since, index=self.index, range_key=self.time_column)
+        settled = frame[frame[self.time_column] < since]
+        frame = pd.concat([settled, fresh], ignore_index=True) if not fresh.empty else settled
+        print(f"🔄 {self.table_name}: {len(fresh):,} rows since {since:.0f}, {len(frame):,} total")
+        return frame
+
+    def read(self, start_utc=None, end_utc=None):
+        frame = self.refresher.get()
+        if start_utc is not None:
+            frame = frame[frame[self.time_column] >= start_utc]
+        if end_utc is not None:
+            frame = frame[frame[self.time_column] <= end_utc]
+        return frame.copy()
+
+
+class DataLayer:
+    def __init__(self):
+        self.posts = TableSnapshot(POSTS_TABLE, POST_COLUMNS, "created_utc", TIME_INDEX, cold=True)
+        self.rollups = TableSnapshot(ROLLUP_TABLE, ROLLUP_COLUMNS, "hour", ROLLUP_INDEX)
+        if STREAM_ENABLED:
+            self.mirror = Refresher("stream view", stream_view.follow, stream_view.POLL_SECONDS)
+        else:
+            self.mirror = Refresher("sqlite mirror", lambda _: sqlite_mirror.sync())
+        self.keyed = OrderedDict()  # (name, args) -> Refresher, least recently used first
+        self.plans = deque(maxlen=MAX_PLANS)
+        self._lock = threading.Lock()
+
+    def cached(self, name, args, load):
+        # A Refresher per distinct call; load(args) ignores the previous value
+        key = (name, args)
+        with self._lock:
+            refresher = self.keyed.get(key)
+            if refresher is None:
+                refresher = Refresher(f"{name}{args}", lambda _: load(*args))
+                self.keyed[key] = refresher
+            self.keyed.move_to_end(key)
+            while len(self.keyed) > MAX_KEYED_VALUES:
+                self.keyed.popitem(last=False)
+        return refresher.get()
+
+    def archive_covers(self, seconds):
+        # Archives exist for every day of the range's settled part. They only
+        # start once the compact stage writes them, so All Time never counts.
+        start, cut = range_start(seconds), time.time() - query_planner.ARCHIVE_LAG_SECONDS
+        if start is None or start >= cut:
+            return False
+        return set(day_buckets(start, cut)) <= self.cached("archive_days", (), archive_loader.archived_days)
+
+    def planner_state(self, seconds=None):
+        return {
+            "mirror_enabled": MIRROR_ENABLED,
+            "mirror_ready": MIRROR_ENABLED and self.mirror.loaded,
+            "posts_loaded": self.posts.refresher.loaded,
+            "rollups_loaded": self.rollups.refresher.loaded,
+            "archive_covered": ARCHIVE_ENABLED and self.archive_covers(seconds),
+        }
+
+    def record_plan(self, plan):
+        self.plans.append(plan)
+        window = "all time" if plan["seconds"] is None else f"last {plan['seconds'] / 3600:g}h"
+        print(f"🧭 {plan['metric']} ({window}): {plan['source']} - {plan['detail']}, "
+              f"{plan['rows']:,} row(s) in {plan['latency_ms']:.0f} ms")
+
+    def refreshers(self):
+        with self._lock:
+            return [self.mirror, self.posts.refresher, self.rollups.refresher] + list(self.keyed.values())
+
+    def status(self):
+        # Age, last refresh duration, in-flight flag and last error per value
+        return [refresher.status() for refresher in self.refreshers() if refresher.loaded or refresher.error]
+
+    def refresh_all(self, wait=False):
+        for refresher in self.refreshers():
+            if refresher.loaded:
+                refresher.refresh(wait)
+
+
+@st.cache_resource
+def get_data_layer():
+    # One per server process, shared by every session and page
+    return DataLayer()
+
+
+def range_start(seconds):
+    # Start of a "last N seconds" range; None means all time
+    return time.time() - seconds if seconds is not None else None
+
+
+_connections = threading.local()
+
+
+def query(sql, params=()):
+    # SQL against the mirror; the first call waits for the initial sync and
+    # later ones kick off a background sync once it is stale
+    get_data_layer().mirror.get()
+    if not hasattr(_connections, "conn"):
+        _connections.conn = sqlite_mirror.connect()
+    return pd.read_sql_query(sql, _connections.conn, params=params)
+
+
+def since_clause(seconds, column="created_utc"):
+    start = range_start(seconds)
+    if start is None:
+        return "1 = 1", []
+    return f"{column} >= ?", [start]
+
+
+def subreddit_clause(filters, where, params):
+    if filters.get("subreddit") is not None:
+        return where + " AND subreddit = ?", params + [filters["subreddit"]]
+    if filters.get("subreddits") is not None:
+        subreddits = list(filters["subreddits"])
+        return where + f" AND subreddit IN ({', '.join('?' * len(subreddits))})", params + subreddits
+    return where, params
+
+
+def filter_subreddits(frame, filters):
+    if filters.get("subreddit") is not None:
+        return frame[frame["subreddit"] == filters["subreddit"]]
+    if filters.get("subreddits") is not None:
+        return frame[frame["subreddit"].isin(filters["subreddits"])]
+    return frame
+
+
+def load_rollups(seconds=None):
+    # Rollup rows overlapping the range (the first hour counts in full). All
+    # Time reads the in-memory snapshot; other ranges Query just their days
+    # unless the snapshot is already loaded.
+    layer = get_data_layer()
+    start = range_start(seconds)
+    start = int(start) // 3600 * 3600 if start is not None else None
+    if start is None or layer.rollups.refresher.loaded:
+        return layer.rollups.read(start)
+    return layer.cached("rollups", (seconds,), lambda s: load_range(
+        ROLLUP_TABLE, ROLLUP_COLUMNS, int(range_start(s)) // 3600 * 3600, index=ROLLUP_INDEX, range_key="hour"
+    )).copy()
+
+
+def indexed_posts(seconds=None):
+    # Same rule as load_rollups, for RedditPosts
+    layer = get_data_layer()
+    if seconds is None or layer.posts.refresher.loaded:
+        return layer.posts.read(range_start(seconds))
+    return layer.cached("posts", (seconds,), lambda s: archive_loader.with_cold(
+        load_range(POSTS_TABLE, POST_COLUMNS, range_start(s)), POST_COLUMNS, range_start(s))).copy()
+
+
+def archived_posts(seconds=None):
+    # Settled posts from the columnar archives, the last ARCHIVE_LAG_SECONDS from the time index
+    def load(seconds):
+        cut = time.time() - query_planner.ARCHIVE_LAG_SECONDS
+        recent = load_range(POSTS_TABLE, POST_COLUMNS, cut)
+        frames = [f for f in (archive_loader.load_archived(POST_COLUMNS, range_start(seconds), cut), recent)
+                  if not f.empty]
+        frame = pd.concat(frames, ignore_index=True) if frames else recent
+        frame = frame.drop_duplicates(["title", "created_utc"], keep="last")
+        return archive_loader.with_cold(frame, POST_COLUMNS, range_start(seconds))
+    return get_data_layer().cached("archived_posts", (seconds,), load).copy()
+
+
+def posts_summary(posts):
+    # Per-subreddit post count, score and comment totals and mean sentiment
+    if posts.empty:
+        return pd.DataFrame(columns=["posts", "score", "num_comments"] + SENTIMENTS)
+    grouped = posts.groupby("subreddit")
+    summary = pd.DataFrame({
+        "posts": grouped.size(),
+        "score": grouped["score"].sum(),
+        "num_comments": grouped["num_comments"].sum(),
+    })
+    return summary.join(grouped[SENTIMENTS].mean())
+
+
+def posts_top(posts, field="score", limit=10):
+    order = "num_comments" if field == "num_comments" else "score"
+    columns = [c for c in ["subreddit", "title", "score", "num_comments", "compound_sentiment", "url"] if c in posts]
+    return posts.sort_values(order, ascending=False).head(limit)[columns].reset_index(drop=True)
+
+
+def rollup_summary(rollups):
+    # Per-subreddit post count, score and comment totals and mean sentiment
+    totals = rollups.groupby("subreddit")[["posts", "score_sum", "comments_sum", "positive_sum",
+                                           "neutral_sum", "negative_sum", "compound_sum"]].sum()
+    totals = totals[totals["posts"] > 0]
+    summary = pd.DataFrame({
+        "posts": totals["posts"].astype(int),
+        "score": totals["score_sum"],
+        "num_comments": totals["comments_sum"],
+    })
+    for sentiment in ("positive", "neutral", "negative", "compound"):
+        summary[f"{sentiment}_sentiment"] = totals[f"{sentiment}_sum"] / totals["posts"]
+    return summary
+
+
+def rollup_top_posts(rollups, field="score", limit=10):
+    # Best posts in the range from each hour's leader; a second strong post in
+    # the same hour and subreddit is not tracked
+    column = "top_comments_post" if field == "num_comments" else "top_score_post"
+    leaders = [dict(post, subreddit=subreddit)
+               for subreddit, post in zip(rollups["subreddit"], rollups[column]) if isinstance(post, dict)]
+    if not leaders:
+        return pd.DataFrame(columns=["subreddit", "title", "score", "num_comments", "compound_sentiment", "url"])
+    posts = pd.DataFrame(leaders).sort_values(field, ascending=False)
+    return posts.drop_duplicates("title").head(limit).reset_index(drop=True)
+
+
+def top_phrases(seconds, limit):
+    # Merges one small sketch per day in the range (whole days, so the first
+    # day counts in full); returns ([(phrase, estimated count)], posts)
+    now = time.time()
+    start = now - (seconds if seconds is not None else query_planner.ALL_TIME_HOURS * 3600)
+    sketch = load_merged(boto3.client("s3", region_name=REGION), BUCKET_NAME, day_buckets(start, now))
+    return sketch.top(limit), sketch.posts
+
+
+def phrase_posts(seconds, phrases):
+    # Only posts in the range that mention one of the given phrases
+    condition = reduce(lambda a, b: a | b, (Attr("key_phrases").contains(p) for p in phrases))
+    if seconds is not None:
+        condition = Attr("created_utc").gte(int(range_start(seconds))) & condition
+    return load_table(PHRASES_TABLE, PHRASE_COLUMNS, FilterExpression=condition)
+
+
+def mirror_posts(seconds, filters):
+    where, params = subreddit_clause(filters, *since_clause(seconds))
+    return query(f"SELECT * FROM posts WHERE {where} ORDER BY created_utc DESC", params)
+
+
+def mirror_stats(seconds, filters):
+    where, params = subreddit_clause(filters, *since_clause(seconds))
+    averages = ", ".join(f"AVG({column}) AS {column}" for column in SENTIMENTS)
+    return query(
+        f"SELECT subreddit, COUNT(*) AS posts, SUM(score) AS score, SUM(num_comments) AS num_comments, {averages} "
+        f"FROM posts WHERE {where} GROUP BY subreddit", params
+    ).set_index("subreddit")
+
+
+def mirror_top_posts(seconds, filters, field="score", limit=10):
+    order = "num_comments" if field == "num_comments" else "score"
+    where, params = subreddit_clause(filters, *since_clause(seconds))
+    return query(
+        f"SELECT subreddit, title, score, num_comments, compound_sentiment, url FROM posts "
+        f"WHERE {where} ORDER BY {order} DESC LIMIT ?", params + [limit]
+    )
+
+
+def mirror_top_phrases(seconds, limit):
+    where, params = since_clause(seconds)
+    counts = query(
+        f"SELECT phrase, COUNT(*) AS mentions FROM phrase_terms WHERE {where} "
+        f"GROUP BY phrase ORDER BY mentions DESC LIMIT ?", params + [limit]
+    )
+    posts = query(f"SELECT COUNT(*) AS posts FROM phrases WHERE {where}", params)["posts"].iloc[0]
+    return list(zip(counts["phrase"], counts["mentions"])), int(posts)
+
+
+def mirror_phrase_posts(seconds, phrases):
+    where, params = since_clause(seconds, "t.created_utc")
+    return query(
+        f"SELECT p.title, t.phrase AS key_phrases, p.sentiment, t.created_utc FROM phrase_terms t "
+        f"JOIN phrases p ON p.post_id = t.post_id AND p.created_utc = t.created_utc "
+        f"WHERE {where} AND t.phrase IN ({', '.join('?' * len(phrases))})", params + list(phrases)
+    )
+
+
+# (metric, source) -> loader(seconds, filters, **options); see query_planner.py
+LOADERS = {
+    ("posts", "mirror"): mirror_posts,
+    ("posts", "index"): lambda seconds, filters: filter_subreddits(indexed_posts(seconds), filters)
+        .sort_values("created_utc", ascending=False),
+    ("posts", "archive"): lambda seconds, filters: filter_subreddits(archived_posts(seconds), filters)
+        .sort_values("created_utc", ascending=False),
+
+    ("subreddit_stats", "mirror"): mirror_stats,
+    ("subreddit_stats", "rollups"): lambda seconds, filters: rollup_summary(
+        filter_subreddits(load_rollups(seconds), filters)),
+    ("subreddit_stats", "index"): lambda seconds, filters: posts_summary(
+        filter_subreddits(indexed_posts(seconds), filters)),
+    ("subreddit_stats", "archive"): lambda seconds, filters: posts_summary(
+        filter_subreddits(archived_posts(seconds), filters)),
+
+    ("top_posts", "mirror"): mirror_top_posts,
+    ("top_posts", "rollups"): lambda seconds, filters, field="score", limit=10: rollup_top_posts(
+        filter_subreddits(load_rollups(seconds), filters), field, limit),
+    ("top_posts", "index"): lambda seconds, filters, field="score", limit=10: posts_top(
+        filter_subreddits(indexed_posts(seconds), filters), field, limit),
+    ("top_posts", "archive"): lambda seconds, filters, field="score", limit=10: posts_top(
+        filter_subreddits(archived_posts(seconds), filters), field, limit),
+
+    ("top_phrases", "mirror"): lambda seconds, filters, limit=10: mirror_top_phrases(seconds, limit),
+    ("top_phrases", "rollups"): lambda seconds, filters, limit=10: get_data_layer().cached(
+        "top_phrases", (seconds, limit), top_phrases),
+
+    ("phrase_posts", "mirror"): lambda seconds, filters: mirror_phrase_posts(seconds, filters["phrases"]),
+    ("phrase_posts", "scan"): lambda seconds, filters: get_data_layer().cached(
+        "phrase_posts", (seconds, tuple(filters["phrases"])), phrase_posts).copy(),
+}
+
+
+def load(metric, time_range=None, filters=None, **options):
+    # The one entry point for page data: time_range is "last N seconds" (None
+    # for all time), filters may hold subreddit, subreddits or phrases. The
+    # planner picks the source; the plan and its latency are recorded.
+    filters = filters or {}
+    layer = get_data_layer()
+    plan = query_planner.choose(metric, time_range, layer.planner_state(time_range))
+    if plan["source"] in ("index", "archive") and archive_loader.reaches_cold(range_start(time_range)):
+        plan["detail"] += ", plus the cold tier"
+    if plan["source"] != "mirror" and MIRROR_ENABLED and not layer.mirror.loaded:
+        layer.mirror.refresh()  # Sync in the background; later queries can use it
+
+    started = time.monotonic()
+    result = LOADERS[(metric, plan["source"])](time_range, filters, **options)
+    plan["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+    plan["rows"] = len(result[0]) if isinstance(result, tuple) else len(result)
+    if (metric == "posts" and not any(value is not None for value in filters.values())
+            and plan["source"] in ("mirror", "index")):
+        query_planner.observe(plan["rows"], time_range)
+    layer.record_plan(plan)
+    st.session_state.setdefault("query_plans", []).append(plan)
+    return result
+
+
+def load_posts(seconds=None, subreddit=None):
+    # Posts in the range, newest first
+    return load("posts", seconds, {"subreddit": subreddit})
+
+
+def subreddit_stats(seconds=None):
+    # Per-subreddit post count, score and comment totals and mean sentiment
+    return load("subreddit_stats", seconds)
+
+
+def top_posts(seconds=None, field="score", limit=10, subreddits=None):
+    # Highest scoring (or most commented) posts in the range
+    return load("top_posts", seconds, {"subreddits": subreddits}, field=field, limit=limit)
+
+
+def load_top_phrases(seconds, limit):
+    # ([(phrase, count)], posts) for the heaviest phrases in the range; exact
+    # from the mirror, estimated from the sketches otherwise
+    return load("top_phrases", seconds, limit=limit)
+
+
+def load_phrase_posts(seconds, phrases):
+    # One row per (post, selected phrase) mention: title, key_phrases, sentiment, created_utc
+    return load("phrase_posts", seconds, {"phrases": list(phrases)})
+
+
+def show_data_status():
+    # Freshness caption plus a manual refresh button, for the top of a page
+    st.session_state["query_plans"] = []  # Collected again by this run's loads
+    status = get_data_layer().status()
+    ages = [s["age_seconds"] for s in status if s["age_seconds"] is not None]
+    durations = [s["duration_seconds"] for s in status if s["duration_seconds"] is not None]
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        if ages:
+            refreshing = any(s["refreshing"] for s in status)
+            st.caption(f"Data refreshed {max(ages):.0f}s ago (last refresh took {max(durations):.1f}s)"
+                       + (", refreshing now…" if refreshing else ""))
+        for s in status:
+            if s["error"]:
+                st.caption(f"⚠️ Last refresh of {s['name']} failed: {s['error']}")
+    with col2:
+        if st.button("🔄 Refresh data"):
+            get_data_layer().refresh_all()
+            st.toast("Refreshing in the background; the page updates on the next rerun.")
+
+
+def show_query_plans():
+    # Where this page's data came from, for the bottom of a page
+    plans = st.session_state.get("query_plans", [])
+    if not plans:
+        return
+    with st.expander(f"🧭 Query plans ({sum(p['latency_ms'] for p in plans):.0f} ms)"):
+        st.dataframe(pd.DataFrame([{
+            "metric": plan["metric"],
+            "range": "All Time" if plan["seconds"] is None else f"{plan['seconds'] / 3600:g}h",
+            "source": plan["source"],
+            "plan": plan["detail"],
+            "est. items": plan["cost"],
+            "rows": plan["rows"],
+            "latency (ms)": plan["latency_ms"],
+        } for plan in plans]))
@@ -0,0 +1,171 @@
+import os
+import time
+import boto3
+import pandas as pd
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+# Shared DynamoDB loader for the dashboard pages. A single table.scan() call
+# returns at most 1 MB, so the table is read as a parallel segmented scan:
+# TotalSegments workers each scan their own slice and follow LastEvaluatedKey
+# until it runs out. Only the columns a page asks for are fetched.
+#
+# Time-bounded loads skip the scan: RedditPosts items carry a UTC "day" bucket
+# and a GSI on (day, created_utc), so a range becomes one Query per day it
+# touches, run in parallel.
+#
+# Per-subreddit aggregates come from SubredditHourlyRollups, which the send
+# stage keeps current with ADD counters; its (day, hour) index works the same way.
+
+REGION = "us-east-2"
+
+# Parallel scan workers; more segments than cores helps since scans wait on I/O
+SCAN_SEGMENTS = int(os.environ.get("SCAN_SEGMENTS", str((os.cpu_count() or 2) * 4)))
+
+BATCH_GET_SIZE = 100  # DynamoDB's limit per BatchGetItem
+
+# Must match what the send stage writes (see items.py there)
+TIME_BUCKET_FORMAT = "%Y-%m-%d"
+TIME_INDEX = "day-created_utc-index"
+
+ROLLUP_TABLE = "SubredditHourlyRollups"
+ROLLUP_INDEX = "day-hour-index"
+ROLLUP_COLUMNS = ["subreddit", "hour", "posts", "score_sum", "comments_sum",
+                  "positive_sum", "neutral_sum", "negative_sum", "compound_sum",
+                  "top_score_post", "top_comments_post"]
+
+
+def to_python(value):
+    # DynamoDB numbers come back as Decimal; pandas wants floats
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [to_python(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_python(v) for k, v in value.items()}
+    return value
+
+
+def projection_args(columns):
+    # Placeholders keep DynamoDB reserved words out of the expression
+    names = {f"#c{i}": column for i, column in enumerate(columns)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+
+def scan_segment(table_name, segment, total_segments, columns=None, **scan_args):
+    # boto3 resources are not thread safe, so each segment gets its own
+    table = boto3.session.Session().resource("dynamodb", region_name=REGION).Table(table_name)
+    kwargs = dict(scan_args, Segment=segment, TotalSegments=total_segments)
+    if columns:
+        kwargs.update(projection_args(columns))
+
+    items = []
+    while True:
+        response = table.scan(**kwargs)
+        items.extend({k: to_python(v) for k, v in item.items()} for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_table(table_name, columns=None, segments=SCAN_SEGMENTS, **scan_args):
+    # Every item in the table (or matching a FilterExpression in scan_args)
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        parts = pool.map(lambda segment: scan_segment(table_name, segment, segments, columns, **scan_args), range(segments))
+        return [item for part in parts for item in part]
+
+
+def get_chunk(table_name, keys, columns=None):
+    dynamodb = boto3.session.Session().resource("dynamodb", region_name=REGION)
+    request = {"Keys": keys}
+    if columns:
+        request.update(projection_args(columns))
+
+    items = []
+    pending = {table_name: request}
+    while pending:
+        response = dynamodb.batch_get_item(RequestItems=pending)
+        items.extend({k: to_python(v) for k, v in item.items()} for item in response["Responses"].get(table_name, []))
+        pending = response.get("UnprocessedKeys") or {}
+    return items
+
+
+def get_items(table_name, keys, columns=None):
+    # The items with these primary keys (missing ones are skipped), in parallel
+    # BatchGetItem calls of BATCH_GET_SIZE keys
+    chunks = [keys[start:start + BATCH_GET_SIZE] for start in range(0, len(keys), BATCH_GET_SIZE)]
+    if not chunks:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(chunks), SCAN_SEGMENTS)) as pool:
+        parts = pool.map(lambda chunk: get_chunk(table_name, chunk, columns), chunks)
+        return [item for part in parts for item in part]
+
+
+def to_frame(items, columns=None):
+    if not items:
+        return pd.DataFrame(columns=columns or [])
+    return pd.DataFrame(items, columns=columns)
+
+
+def load_table(table_name, columns=None, segments=SCAN_SEGMENTS, **scan_args):
+    return to_frame(scan_table(table_name, columns, segments, **scan_args), columns)
+
+
+def day_buckets(start_utc, end_utc):
+    # Every day bucket between two epoch timestamps, inclusive
+    day = datetime.fromtimestamp(start_utc, tz=timezone.utc).date()
+    last = datetime.fromtimestamp(end_utc, tz=timezone.utc).date()
+    buckets = []
+    while day <= last:
+        buckets.append(day.strftime(TIME_BUCKET_FORMAT))
+        day += timedelta(days=1)
+    return buckets
+
+
+def query_bucket(table_name, day, start_utc, end_utc, columns=None, index=TIME_INDEX, range_key="created_utc"):
+    table = boto3.session.Session().resource("dynamodb", region_name=REGION).Table(table_name)
+    kwargs = {
+        "IndexName": index,
+        "KeyConditionExpression": Key("day").eq(day) & Key(range_key).between(
+            Decimal(str(start_utc)), Decimal(str(end_utc))
+        ),
+    }
+    if columns:
+        kwargs.update(projection_args(columns))
+
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend({k: to_python(v) for k, v in item.items()} for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def query_range(table_name, start_utc, end_utc=None, columns=None, index=TIME_INDEX, range_key="created_utc"):
+    # Items created in [start_utc, end_utc] via parallel Queries on the time index
+    end_utc = end_utc if end_utc is not None else time.time()
+    buckets = day_buckets(start_utc, end_utc)
+    with ThreadPoolExecutor(max_workers=min(len(buckets), SCAN_SEGMENTS)) as pool:
+        parts = pool.map(
+            lambda day: query_bucket(table_name, day, start_utc, end_utc, columns, index, range_key), buckets
+        )
+        return [item for part in parts for item in part]
+
+
+def load_range(table_name, columns=None, start_utc=None, end_utc=None, index=TIME_INDEX, range_key="created_utc"):
+    # No start means "All Time", which has to scan anyway
+    if start_utc is None:
+        return load_table(table_name, columns)
+    try:
+        return to_frame(query_range(table_name, start_utc, end_utc, columns, index, range_key), columns)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("ValidationException", "ResourceNotFoundException"):
+            raise
+        # The time index hasn't been created yet (see backfill/migrate_time_bucket.py)
+        end_utc = end_utc if end_utc is not None else time.time()
+        condition = Attr(range_key).between(Decimal(str(start_utc)), Decimal(str(end_utc)))
+        return load_table(table_name, columns, FilterExpression=condition)
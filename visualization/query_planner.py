@@ -0,0 +1,107 @@
+import os
+import threading
+
+# Picks where each dashboard query is answered from. The same metric can come
+# from several places whose cost differs by orders of magnitude:
+#   mirror  - SQL against the local SQLite copy; free once it has synced
+#   rollups - SubredditHourlyRollups (per-day sketches for key phrases): one
+#             row per subreddit and hour, so only ranges of a day or more
+#   index   - time-bucket Query of RedditPosts for the days in range, or the
+#             in-memory snapshot for All Time / once it is loaded
+#   archive - columnar archives in S3 for the settled part of the range plus a
+#             time-bucket Query for the recent tail; only when there are
+#             archives for every day of that settled part
+#   scan    - filtered scan of the key phrase table, which has no time index
+#
+# A plan's cost is the number of DynamoDB items it is expected to read. An
+# archived row is a small fraction of that (a few columns out of a byte range),
+# but every hourly archive also takes a couple of GETs, counted as
+# ARCHIVE_GET_COST items each. Posts per hour starts from
+# PLANNER_POSTS_PER_HOUR and follows what loads actually return. The cheapest
+# eligible source wins; ties go to the one listed first.
+
+HOUR = 3600
+ALL_TIME_HOURS = int(os.environ.get("PLANNER_ALL_TIME_DAYS", "365")) * 24
+ROLLUPS_PER_HOUR = float(os.environ.get("PLANNER_ROLLUPS_PER_HOUR", "25"))
+ROLLUP_MIN_SECONDS = 24 * HOUR  # Shorter ranges would count their first hour in full
+ARCHIVE_ROW_COST = 0.02
+ARCHIVE_GET_COST = 20
+ARCHIVE_GETS_PER_HOUR = 2  # Footer plus the coalesced column ranges
+ARCHIVE_LAG_SECONDS = int(os.environ.get("ARCHIVE_LAG_HOURS", "48")) * HOUR
+RATE_SMOOTHING = 0.3
+
+# Metric -> the sources that can answer it, in order of preference on a tie
+SOURCES = {
+    "posts": ("mirror", "index", "archive"),
+    "subreddit_stats": ("mirror", "rollups", "index", "archive"),
+    "top_posts": ("mirror", "rollups", "index", "archive"),
+    "top_phrases": ("mirror", "rollups"),
+    "phrase_posts": ("mirror", "scan"),
+}
+
+_rates = {"posts": float(os.environ.get("PLANNER_POSTS_PER_HOUR", "100"))}
+_lock = threading.Lock()
+
+
+def observe(rows, seconds):
+    # Feed back how many posts a bounded range actually held
+    if not seconds:
+        return
+    with _lock:
+        _rates["posts"] += RATE_SMOOTHING * (rows / (seconds / HOUR) - _rates["posts"])
+
+
+def candidates(metric, seconds, state):
+    # [{"source", "cost", "detail"}] for every source able to answer the metric.
+    # state: mirror_enabled, mirror_ready, posts_loaded, rollups_loaded, archive_covered
+    hours = ALL_TIME_HOURS if seconds is None else seconds / HOUR
+    days = int(hours // 24) + 1
+    posts = hours * _rates["posts"]
+    options = []
+    for source in SOURCES[metric]:
+        if source == "mirror":
+            if not state["mirror_enabled"]:
+                continue
+            if state["mirror_ready"]:
+                cost, detail = 0, "SQL on the local mirror"
+            else:
+                cost, detail = ALL_TIME_HOURS * _rates["posts"], "SQL on the local mirror after its first sync"
+        elif source == "rollups" and metric == "top_phrases":
+            cost, detail = days, f"merge {days} daily phrase sketch(es)"
+        elif source == "rollups":
+            if seconds is not None and seconds < ROLLUP_MIN_SECONDS:
+                continue
+            if state["rollups_loaded"]:
+                cost, detail = 0, "hourly rollups in memory"
+            else:
+                cost, detail = hours * ROLLUPS_PER_HOUR, f"hourly rollups for {days} day(s)"
+        elif source == "index":
+            if state["posts_loaded"]:
+                cost, detail = 0, "posts snapshot in memory"
+            elif seconds is None:
+                cost, detail = posts, "full scan into the posts snapshot"
+            else:
+                cost, detail = posts, f"time index Query of {days} day(s)"
+        elif source == "archive":
+            if not state["archive_covered"] or (seconds is not None and seconds <= ARCHIVE_LAG_SECONDS):
+                continue
+            recent_hours = ARCHIVE_LAG_SECONDS / HOUR
+            archived_hours = max(hours - recent_hours, 0)
+            cost = (archived_hours * (_rates["posts"] * ARCHIVE_ROW_COST + ARCHIVE_GETS_PER_HOUR * ARCHIVE_GET_COST)
+                    + recent_hours * _rates["posts"])
+            detail = f"columnar archives plus a time index Query of the last {ARCHIVE_LAG_SECONDS // HOUR}h"
+        elif source == "scan":
+            cost, detail = ALL_TIME_HOURS * _rates["posts"], "filtered scan of the key phrase table"
+        options.append({"source": source, "cost": round(cost), "detail": detail})
+    return options
+
+
+def choose(metric, seconds, state):
+    if metric not in SOURCES:
+        raise ValueError(f"Unknown metric: {metric}")
+    options = candidates(metric, seconds, state)
+    if not options:
+        raise ValueError(f"No source can answer {metric} for this range")
+    best = min(options, key=lambda option: option["cost"])
+    return dict(best, metric=metric, seconds=seconds,
+                alternatives={option["source"]: option["cost"] for option in options})
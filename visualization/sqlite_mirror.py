@@ -0,0 +1,196 @@
+import os
+import time
+import sqlite3
+import argparse
+from dynamo_loader import get_items, load_range, scan_table
+from archive_loader import with_cold
+
+# Local SQLite copy of RedditPosts and KeyPhraseIdentificationTableV2 for the
+# dashboard, so pages answer time ranges, group-bys and top-N with SQL instead
+# of DynamoDB reads, and the data survives a restart. The database runs in WAL
+# mode, so pages keep reading while a sync writes.
+#
+# Syncs are incremental: everything from each table's watermark (newest
+# created_utc mirrored) minus a re-check window is fetched again and replaces
+# that window in one transaction. Posts come through the time index. The key
+# phrase table has no time index, but its items are keyed by the post they
+# belong to, so its window is a BatchGetItem of the mirrored posts in it; only
+# the first sync scans it. Rows are never dropped for leaving the table, so
+# posts expired to the cold tier stay.
+
+MIRROR_PATH = os.environ.get("MIRROR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "mirror.db"))
+RECHECK_SECONDS = int(os.environ.get("DATA_RECHECK_HOURS", "48")) * 3600
+
+POSTS_TABLE = "RedditPosts"
+PHRASES_TABLE = "KeyPhraseIdentificationTableV2"
+POST_COLUMNS = ["title", "created_utc", "subreddit", "score", "num_comments", "url",
+                "positive_sentiment", "neutral_sentiment", "negative_sentiment", "compound_sentiment"]
+PHRASE_COLUMNS = ["post_id", "created_utc", "title", "sentiment", "key_phrases"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    title TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    subreddit TEXT,
+    score REAL,
+    num_comments REAL,
+    url TEXT,
+    positive_sentiment REAL,
+    neutral_sentiment REAL,
+    negative_sentiment REAL,
+    compound_sentiment REAL,
+    PRIMARY KEY (title, created_utc)
+);
+CREATE INDEX IF NOT EXISTS posts_created_utc ON posts (created_utc);
+CREATE INDEX IF NOT EXISTS posts_subreddit ON posts (subreddit, created_utc);
+
+CREATE TABLE IF NOT EXISTS phrases (
+    post_id TEXT NOT NULL,
+    created_utc INTEGER NOT NULL,
+    title TEXT,
+    sentiment TEXT,
+    PRIMARY KEY (post_id, created_utc)
+);
+CREATE INDEX IF NOT EXISTS phrases_created_utc ON phrases (created_utc);
+
+-- One row per (post, phrase) mention, for counting
+CREATE TABLE IF NOT EXISTS phrase_terms (
+    post_id TEXT NOT NULL,
+    created_utc INTEGER NOT NULL,
+    phrase TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phrase_terms_created_utc ON phrase_terms (created_utc);
+CREATE INDEX IF NOT EXISTS phrase_terms_phrase ON phrase_terms (phrase, created_utc);
+CREATE INDEX IF NOT EXISTS phrase_terms_post ON phrase_terms (post_id, created_utc);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark REAL,
+    synced_at REAL
+);
+"""
+
+
+def connect(path=MIRROR_PATH):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def initialize(conn):
+    conn.executescript(SCHEMA)
+
+
+def watermark(conn, table_name):
+    row = conn.execute("SELECT watermark FROM sync_state WHERE table_name = ?", (table_name,)).fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def set_watermark(conn, table_name, value):
+    conn.execute(
+        "INSERT INTO sync_state (table_name, watermark, synced_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (table_name) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at",
+        (table_name, value, time.time())
+    )
+
+
+def _value(value):
+    # NaN (a missing attribute in the frame) becomes NULL
+    return None if isinstance(value, float) and value != value else value
+
+
+def upsert_posts(conn, items):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO posts ({', '.join(POST_COLUMNS)}) VALUES ({', '.join('?' * len(POST_COLUMNS))})",
+        [tuple(_value(item.get(column)) for column in POST_COLUMNS) for item in items]
+    )
+
+
+def delete_post(conn, title, created_utc):
+    conn.execute("DELETE FROM posts WHERE title = ? AND created_utc = ?", (title, float(created_utc)))
+
+
+def upsert_phrases(conn, items):
+    # A post's phrase mentions are replaced along with the post
+    keys = [(item["post_id"], int(item["created_utc"])) for item in items]
+    conn.executemany("DELETE FROM phrase_terms WHERE post_id = ? AND created_utc = ?", keys)
+    conn.executemany(
+        "INSERT OR REPLACE INTO phrases (post_id, created_utc, title, sentiment) VALUES (?, ?, ?, ?)",
+        [(item["post_id"], int(item["created_utc"]), item.get("title"), item.get("sentiment")) for item in items]
+    )
+    conn.executemany(
+        "INSERT INTO phrase_terms (post_id, created_utc, phrase) VALUES (?, ?, ?)",
+        [(item["post_id"], int(item["created_utc"]), phrase)
+         for item in items if isinstance(item.get("key_phrases"), list) for phrase in item["key_phrases"]]
+    )
+
+
+def delete_phrases(conn, post_id, created_utc):
+    conn.execute("DELETE FROM phrases WHERE post_id = ? AND created_utc = ?", (post_id, int(created_utc)))
+    conn.execute("DELETE FROM phrase_terms WHERE post_id = ? AND created_utc = ?", (post_id, int(created_utc)))
+
+
+def sync_posts(conn):
+    mark = watermark(conn, POSTS_TABLE)
+    since = mark - RECHECK_SECONDS if mark is not None else None
+    frame = load_range(POSTS_TABLE, POST_COLUMNS, since)
+    if since is None:
+        # Posts already moved to the cold tier only reach a new mirror this way
+        frame = with_cold(frame, POST_COLUMNS)
+
+    with conn:
+        if since is not None:
+            conn.execute("DELETE FROM posts WHERE created_utc >= ?", (since,))
+        upsert_posts(conn, frame.to_dict("records"))
+        newest = conn.execute("SELECT MAX(created_utc) FROM posts").fetchone()[0]
+        set_watermark(conn, POSTS_TABLE, newest)
+    return len(frame)
+
+
+def sync_phrases(conn):
+    mark = watermark(conn, PHRASES_TABLE)
+    since = int(mark - RECHECK_SECONDS) if mark is not None else None
+    if since is None:
+        items = scan_table(PHRASES_TABLE, PHRASE_COLUMNS)
+    else:
+        # Key phrase items are keyed by the post's stripped title and whole-second created_utc
+        posts = conn.execute("SELECT title, created_utc FROM posts WHERE created_utc >= ?", (since,)).fetchall()
+        keys = {(title.strip(), int(created_utc)) for title, created_utc in posts if title.strip()}
+        items = get_items(PHRASES_TABLE, [{"post_id": post_id, "created_utc": created_utc} for post_id, created_utc in keys],
+                          PHRASE_COLUMNS)
+
+    with conn:
+        if since is not None:
+            conn.execute("DELETE FROM phrases WHERE created_utc >= ?", (since,))
+            conn.execute("DELETE FROM phrase_terms WHERE created_utc >= ?", (since,))
+        upsert_phrases(conn, items)
+        newest = conn.execute("SELECT MAX(created_utc) FROM phrases").fetchone()[0]
+        set_watermark(conn, PHRASES_TABLE, newest)
+    return len(items)
+
+
+def sync(path=MIRROR_PATH):
+    # One incremental pass over both tables; returns rows fetched per table
+    conn = connect(path)
+    try:
+        initialize(conn)
+        counts = {POSTS_TABLE: sync_posts(conn), PHRASES_TABLE: sync_phrases(conn)}
+    finally:
+        conn.close()
+    print("🗄️ Mirror sync: " + ", ".join(f"{table} {count:,} row(s)" for table, count in counts.items()))
+    return counts
+
+
+if __name__ == "__main__":
+    # python sqlite_mirror.py --every 300   (or once, e.g. from cron)
+    parser = argparse.ArgumentParser(description="Mirror the dashboard's DynamoDB tables into SQLite")
+    parser.add_argument("--path", default=MIRROR_PATH)
+    parser.add_argument("--every", type=int, help="Keep syncing every this many seconds")
+    args = parser.parse_args()
+
+    while True:
+        sync(args.path)
+        if not args.every:
+            break
+        time.sleep(args.every)
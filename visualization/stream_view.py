@@ -0,0 +1,270 @@
+import os
+import time
+import argparse
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from dynamo_loader import REGION, to_python
+import sqlite_mirror
+
+# Keeps the SQLite mirror current by tailing the DynamoDB Streams of RedditPosts
+# and KeyPhraseIdentificationTableV2 instead of re-reading a time window: every
+# INSERT and MODIFY is upserted into the mirror and every REMOVE deleted (except
+# TTL expiries, which only move a post to the cold tier), so the pages see a
+# change within one poll and unchanged items are never read again.
+#
+# Progress is checkpointed per shard in the mirror itself (the last sequence
+# number applied, written in the same transaction as the rows), so a restart
+# picks up right after the last applied record. Shard iterators expire after 15
+# minutes and are only held in memory. A stream keeps 24 hours of records: the
+# first run, and any run whose checkpoint has been trimmed away, does a normal
+# mirror sync first and then reads the stream from its oldest record. Replaying
+# records the sync already covered is harmless, since every change is written
+# as the item's full new image.
+#
+# The streams client and the initial sync are passed in, so anything with
+# describe_stream, get_shard_iterator and get_records (e.g. a fake replaying
+# recorded records) can stand in for DynamoDB Streams without a table scan.
+
+POLL_SECONDS = int(os.environ.get("STREAM_POLL_SECONDS", "5"))
+RECORDS_LIMIT = 1000  # Per get_records call
+MAX_PAGES = 20  # get_records calls per shard per poll
+
+STREAM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stream_shards (
+    stream_arn TEXT NOT NULL,
+    shard_id TEXT NOT NULL,
+    sequence_number TEXT,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL,
+    PRIMARY KEY (stream_arn, shard_id)
+);
+"""
+
+_deserializer = TypeDeserializer()
+
+
+def enable_stream(table_name, client=None):
+    # Turns on the table's stream (new images are all the view needs); returns its ARN
+    client = client or boto3.client("dynamodb", region_name=REGION)
+    description = client.describe_table(TableName=table_name)["Table"]
+    specification = description.get("StreamSpecification", {})
+    if specification.get("StreamEnabled"):
+        if specification.get("StreamViewType") not in ("NEW_IMAGE", "NEW_AND_OLD_IMAGES"):
+            raise RuntimeError(f"The stream on {table_name} does not carry new images")
+        return description["LatestStreamArn"]
+    print(f"🛠️ Enabling the stream on {table_name}")
+    response = client.update_table(
+        TableName=table_name,
+        StreamSpecification={"StreamEnabled": True, "StreamViewType": "NEW_IMAGE"},
+    )
+    return response["TableDescription"]["LatestStreamArn"]
+
+
+def image(attributes):
+    # Stream images are in the low-level wire format
+    return {name: to_python(_deserializer.deserialize(value)) for name, value in attributes.items()}
+
+
+def expired(record):
+    # TTL deletions come from the DynamoDB service itself
+    identity = record.get("userIdentity") or {}
+    return identity.get("type") == "Service" and identity.get("principalId") == "dynamodb.amazonaws.com"
+
+
+def apply_record(conn, table_name, record):
+    change = record["dynamodb"]
+    if record["eventName"] == "REMOVE":
+        if expired(record):
+            return  # Moved to the cold tier; the view keeps it
+        keys = image(change["Keys"])
+        if table_name == sqlite_mirror.POSTS_TABLE:
+            sqlite_mirror.delete_post(conn, keys["title"], keys["created_utc"])
+        else:
+            sqlite_mirror.delete_phrases(conn, keys["post_id"], keys["created_utc"])
+        return
+    item = image(change["NewImage"])
+    if table_name == sqlite_mirror.POSTS_TABLE:
+        sqlite_mirror.upsert_posts(conn, [item])
+    else:
+        sqlite_mirror.upsert_phrases(conn, [item])
+
+
+def apply_records(conn, table_name, records, after=None):
+    # Applies the records past sequence number after; returns how many
+    applied = 0
+    for record in records:
+        if after is not None and int(record["dynamodb"]["SequenceNumber"]) <= int(after):
+            continue  # Already in the view
+        apply_record(conn, table_name, record)
+        applied += 1
+    return applied
+
+
+def ordered_shards(shards):
+    # Parents before children, so each item's changes are applied in order
+    pending = {shard["ShardId"]: shard for shard in shards}
+    ordered = []
+    while pending:
+        ready = [shard for shard in pending.values() if shard.get("ParentShardId") not in pending]
+        for shard in ready:
+            ordered.append(shard)
+            del pending[shard["ShardId"]]
+    return ordered
+
+
+class StreamConsumer:
+    def __init__(self, path=sqlite_mirror.MIRROR_PATH, tables=(sqlite_mirror.POSTS_TABLE, sqlite_mirror.PHRASES_TABLE),
+                 streams=None, stream_arns=None, initial_sync=sqlite_mirror.sync):
+        self.path = path
+        self.tables = tables
+        self.streams = streams or boto3.client("dynamodbstreams", region_name=REGION)
+        self.stream_arns = dict(stream_arns or {})  # table name -> stream ARN
+        self.initial_sync = initial_sync  # Called with the mirror path
+        self.iterators = {}  # (stream ARN, shard id) -> next shard iterator
+        self.conn = sqlite_mirror.connect(path)
+        sqlite_mirror.initialize(self.conn)
+        self.conn.executescript(STREAM_SCHEMA)
+
+    def stream_arn(self, table_name):
+        if table_name not in self.stream_arns:
+            description = boto3.client("dynamodb", region_name=REGION).describe_table(TableName=table_name)["Table"]
+            if "LatestStreamArn" not in description:
+                raise RuntimeError(f"{table_name} has no stream; run stream_view.py --enable first")
+            self.stream_arns[table_name] = description["LatestStreamArn"]
+        return self.stream_arns[table_name]
+
+    def shards(self, stream_arn):
+        shards, kwargs = [], {"StreamArn": stream_arn}
+        while True:
+            description = self.streams.describe_stream(**kwargs)["StreamDescription"]
+            shards.extend(description.get("Shards", []))
+            if not description.get("LastEvaluatedShardId"):
+                return ordered_shards(shards)
+            kwargs["ExclusiveStartShardId"] = description["LastEvaluatedShardId"]
+
+    def checkpoint(self, stream_arn, shard_id):
+        # (last applied sequence number, finished) or None for an unseen shard
+        return self.conn.execute(
+            "SELECT sequence_number, finished FROM stream_shards WHERE stream_arn = ? AND shard_id = ?",
+            (stream_arn, shard_id)
+        ).fetchone()
+
+    def save_checkpoint(self, stream_arn, shard_id, sequence_number, finished):
+        self.conn.execute(
+            "INSERT INTO stream_shards (stream_arn, shard_id, sequence_number, finished, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (stream_arn, shard_id) DO UPDATE SET "
+            "sequence_number = excluded.sequence_number, finished = excluded.finished, updated_at = excluded.updated_at",
+            (stream_arn, shard_id, sequence_number, int(finished), time.time())
+        )
+
+    def start_iterator(self, stream_arn, shard_id, sequence_number):
+        kwargs = {"StreamArn": stream_arn, "ShardId": shard_id}
+        if sequence_number is not None:
+            kwargs.update(ShardIteratorType="AFTER_SEQUENCE_NUMBER", SequenceNumber=sequence_number)
+        else:
+            kwargs["ShardIteratorType"] = "TRIM_HORIZON"
+        return self.streams.get_shard_iterator(**kwargs)["ShardIterator"]
+
+    def read_shard(self, table_name, stream_arn, shard):
+        shard_id = shard["ShardId"]
+        parent = self.checkpoint(stream_arn, shard["ParentShardId"]) if shard.get("ParentShardId") else None
+        if parent is not None and not parent[1]:
+            return 0  # The parent still has records to apply first
+
+        sequence_number, finished = self.checkpoint(stream_arn, shard_id) or (None, False)
+        if finished:
+            return 0
+        iterator = self.iterators.pop((stream_arn, shard_id), None)
+        applied = 0
+        for _ in range(MAX_PAGES):
+            if iterator is None:
+                iterator = self.start_iterator(stream_arn, shard_id, sequence_number)
+            try:
+                response = self.streams.get_records(ShardIterator=iterator, Limit=RECORDS_LIMIT)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "ExpiredIteratorException":
+                    raise
+                iterator = None  # Start again from the checkpoint
+                continue
+
+            records = response.get("Records", [])
+            iterator = response.get("NextShardIterator")
+            with self.conn:
+                # Re-read inside the transaction: another consumer may have moved on
+                current = self.checkpoint(stream_arn, shard_id)
+                after = current[0] if current else None
+                applied += apply_records(self.conn, table_name, records, after)
+                if records and (after is None or int(records[-1]["dynamodb"]["SequenceNumber"]) > int(after)):
+                    after = records[-1]["dynamodb"]["SequenceNumber"]
+                self.save_checkpoint(stream_arn, shard_id, after, iterator is None)
+            sequence_number = after
+            if iterator is None or not records:
+                break
+
+        if iterator is not None:
+            self.iterators[(stream_arn, shard_id)] = iterator
+        return applied
+
+    def unsynced(self):
+        # Tables whose stream has no checkpoints yet, i.e. only its last 24 hours
+        return [table_name for table_name in self.tables if not self.conn.execute(
+            "SELECT COUNT(*) FROM stream_shards WHERE stream_arn = ?", (self.stream_arn(table_name),)
+        ).fetchone()[0]]
+
+    def resync(self, table_names):
+        # Fill the mirror the usual way, then read these streams from their oldest record
+        self.initial_sync(self.path)
+        with self.conn:
+            for table_name in table_names:
+                stream_arn = self.stream_arn(table_name)
+                self.conn.execute("DELETE FROM stream_shards WHERE stream_arn = ?", (stream_arn,))
+                for key in [key for key in self.iterators if key[0] == stream_arn]:
+                    del self.iterators[key]
+
+    def poll(self):
+        # One pass over every shard of every stream; returns records applied
+        unsynced = self.unsynced()
+        if unsynced:
+            self.resync(unsynced)
+        applied = 0
+        for table_name in self.tables:
+            stream_arn = self.stream_arn(table_name)
+            for shard in self.shards(stream_arn):
+                try:
+                    applied += self.read_shard(table_name, stream_arn, shard)
+                except ClientError as e:
+                    if e.response.get("Error", {}).get("Code") != "TrimmedDataAccessException":
+                        raise
+                    print(f"⚠️ {table_name} stream checkpoint is past the retention window, re-syncing")
+                    self.resync([table_name])
+                    applied += self.read_shard(table_name, stream_arn, shard)
+        if applied:
+            print(f"📡 Stream view: applied {applied:,} change(s)")
+        return applied
+
+
+def follow(consumer=None):
+    # Refresher load for the data layer: keeps one consumer and polls it
+    consumer = consumer or StreamConsumer()
+    consumer.poll()
+    return consumer
+
+
+if __name__ == "__main__":
+    # python stream_view.py --enable     (once)
+    # python stream_view.py              (keeps the mirror current)
+    parser = argparse.ArgumentParser(description="Apply the DynamoDB Streams of the dashboard tables to the SQLite mirror")
+    parser.add_argument("--path", default=sqlite_mirror.MIRROR_PATH)
+    parser.add_argument("--every", type=int, default=POLL_SECONDS, help="Seconds between polls")
+    parser.add_argument("--enable", action="store_true", help="Turn on the table streams and exit")
+    args = parser.parse_args()
+
+    if args.enable:
+        for name in (sqlite_mirror.POSTS_TABLE, sqlite_mirror.PHRASES_TABLE):
+            print(f"✅ {name}: {enable_stream(name)}")
+    else:
+        consumer = StreamConsumer(args.path)
+        while True:
+            consumer.poll()
+            time.sleep(args.every)